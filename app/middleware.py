@@ -0,0 +1,160 @@
+import functools
+import inspect
+import json
+import logging
+import time
+from typing import Any, Callable, Optional
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.services.config import env_bool, env_float
+from app.services.metrics import MetricsRegistry, RouteMetrics, get_metrics
+from app.services.timing import current_timing, finish_timing, start_timing
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Records latency per (method, route template, status) and the number of
+    requests in flight. Plain ASGI, so streaming responses pass through
+    untouched; their latency runs until the last body chunk is sent.
+    Requests that match no route are recorded under route="unmatched" to
+    keep label values bounded.
+    """
+
+    def __init__(self, app: ASGIApp, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.metrics = RouteMetrics(registry or get_metrics())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        self.metrics.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight.dec()
+            route = scope.get("route")
+            self.metrics.latency.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), status),
+                time.perf_counter() - started
+            )
+
+
+class TimingMiddleware:
+    """
+    Times the phases of each request and reports them in a Server-Timing
+    header: `read` (receiving the body), `validate`, `endpoint` and
+    `serialize` from TimedRoute, and the upstream phases recorded by
+    KlingClient (`queue`, `auth`, `media`, `upstream`, `decode`,
+    `retry_wait`). The header is sent with the response start, so
+    streamed bodies are not included in its `total`.
+
+    Requests slower than `slow_ms` (including any streamed body) are
+    logged as one JSON record with their phases.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: Optional[bool] = None, slow_ms: Optional[float] = None):
+        self.app = app
+        self.enabled = enabled if enabled is not None else env_bool("KLING_SERVER_TIMING", True)
+        # 0 disables slow request records
+        self.slow_ms = slow_ms if slow_ms is not None else env_float("KLING_SLOW_REQUEST_MS", 2000.0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        timing = start_timing()
+        status = 500
+
+        async def timed_receive() -> Message:
+            started = time.perf_counter()
+            message = await receive()
+            if message["type"] == "http.request":
+                timing.add("read", time.perf_counter() - started)
+            return message
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.server_timing(time.perf_counter() - timing.started))
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, send_with_timing)
+        finally:
+            finish_timing(timing)
+            total_ms = (time.perf_counter() - timing.started) * 1000
+            if self.slow_ms and total_ms >= self.slow_ms:
+                route = scope.get("route")
+                record = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "total_ms": round(total_ms, 1),
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in timing.ordered().items()},
+                }
+                logger.warning("Slow request: %s", json.dumps(record), extra={"timing": record})
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # functools.wraps keeps the signature FastAPI reads dependencies from
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        timing = current_timing()
+        if timing is None:
+            return await endpoint(*args, **kwargs)
+        timing.endpoint_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing.endpoint_finished = time.perf_counter()
+            timing.add("endpoint", timing.endpoint_finished - timing.endpoint_started)
+
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """
+    Route class (`APIRouter(route_class=TimedRoute)`) that splits the time
+    FastAPI spends around an endpoint into `validate` (dependencies and
+    request model validation, minus reading the body) and `serialize`
+    (response model validation and rendering).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timing = current_timing()
+            if timing is None:
+                return await handler(request)
+            started = time.perf_counter()
+            read_before = timing.phases.get("read", 0.0)
+            response = await handler(request)
+            if timing.endpoint_started is not None and timing.endpoint_finished is not None:
+                read = timing.phases.get("read", 0.0) - read_before
+                timing.add("validate", max(0.0, timing.endpoint_started - started - read))
+                timing.add("serialize", time.perf_counter() - timing.endpoint_finished)
+            return response
+
+        return timed_handler
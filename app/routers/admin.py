@@ -0,0 +1,153 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Path
+from app.schemas.admin import LimitUpdate
+from app.services.callback_store import CallbackIngestor, get_callback_ingestor
+from app.services.downloader import ResultDownloader, get_result_downloader
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.media_store import MediaStore, get_media_store
+from app.services.payload_log import PayloadLogger, get_payload_logger
+from app.services.poller import TaskPoller, get_task_poller
+from app.services.task_cache import TaskStatusCache, get_task_cache
+from app.services.task_index import TaskIndex, get_task_index
+from app.services.task_events import TaskEventHub, get_task_event_hub
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
+
+@router.get("/pool")
+async def get_pool_stats(client: KlingClient = Depends(get_kling_client)):
+    """
+    Upstream connection pool usage, for sizing workers and pool limits.
+    """
+    return client.pool_stats()
+
+@router.get("/tokens")
+async def get_token_stats(client: KlingClient = Depends(get_kling_client)):
+    """
+    JWT cache hit/miss counters.
+    """
+    return client.token_stats()
+
+@router.get("/retries")
+async def get_retry_stats(client: KlingClient = Depends(get_kling_client)):
+    """
+    Upstream retry and give-up counters.
+    """
+    return client.retry_stats()
+
+@router.get("/limits")
+async def get_limits(client: KlingClient = Depends(get_kling_client)):
+    """
+    Local QPS/concurrency limits per endpoint family, with live usage.
+    """
+    return client.governor.snapshot()
+
+@router.put("/limits/{family}")
+async def update_limits(
+    update: LimitUpdate,
+    family: str = Path(..., description="video_create, image_create, task_query or identify_face"),
+    client: KlingClient = Depends(get_kling_client)
+):
+    """
+    Adjusts the limits of one endpoint family at runtime.
+    """
+    if family not in client.governor.families:
+        raise HTTPException(status_code=404, detail=f"Unknown endpoint family: {family}")
+    return client.governor.configure(family, **update.model_dump(exclude_none=True))
+
+@router.get("/breakers")
+async def get_breakers(client: KlingClient = Depends(get_kling_client)):
+    """
+    Circuit breaker state per endpoint family, with the error and slow-call
+    rates of the current window.
+    """
+    return client.breakers.snapshot()
+
+@router.post("/breakers/{family}/reset")
+async def reset_breaker(
+    family: str = Path(..., description="video_create, image_create, task_query or identify_face"),
+    client: KlingClient = Depends(get_kling_client)
+):
+    """
+    Closes the circuit of one endpoint family, e.g. once an outage is known to be over.
+    """
+    if family not in client.breakers.families:
+        raise HTTPException(status_code=404, detail=f"Unknown endpoint family: {family}")
+    return client.breakers.reset(family)
+
+@router.get("/hedging")
+async def get_hedging_stats(client: KlingClient = Depends(get_kling_client)):
+    """
+    Current hedge delay and how many task queries were hedged and won by the hedge.
+    """
+    return client.hedger.stats()
+
+@router.get("/accounts")
+async def get_account_stats(client: KlingClient = Depends(get_kling_client)):
+    """
+    Per-account load, health and cooldown state of the credential pool.
+    """
+    return client.account_stats()
+
+@router.get("/task-cache")
+async def get_task_cache_stats(cache: TaskStatusCache = Depends(get_task_cache)):
+    """
+    Size, hit rate and eviction counters of the task status cache.
+    """
+    return cache.stats()
+
+@router.get("/task-index")
+async def get_task_index_stats(index: TaskIndex = Depends(get_task_index)):
+    """
+    Size and per-status counts of the local task index.
+    """
+    return await asyncio.to_thread(index.stats)
+
+@router.get("/poller")
+async def get_poller_stats(poller: TaskPoller = Depends(get_task_poller)):
+    """
+    Number of tracked tasks and refresh counters of the background poller.
+    """
+    return poller.stats()
+
+@router.get("/callbacks")
+async def get_callback_stats(ingestor: CallbackIngestor = Depends(get_callback_ingestor)):
+    """
+    Queue depth and write counters of the callback ingestion pipeline.
+    """
+    return ingestor.stats()
+
+@router.get("/events")
+async def get_event_stats(hub: TaskEventHub = Depends(get_task_event_hub)):
+    """
+    Subscriber and publish counters of the task event stream.
+    """
+    return hub.stats()
+
+@router.get("/idempotency")
+async def get_idempotency_stats(cache: IdempotencyCache = Depends(get_idempotency_cache)):
+    """
+    Replayed, coalesced and conflicting task submissions.
+    """
+    return cache.stats()
+
+@router.get("/media")
+async def get_media_stats(store: MediaStore = Depends(get_media_store)):
+    """
+    Hit ratio and upstream bytes saved by the content-addressed media store.
+    """
+    return store.stats()
+
+@router.get("/downloads")
+async def get_download_stats(downloader: ResultDownloader = Depends(get_result_downloader)):
+    """
+    Result media download progress, dedupe and resume counters.
+    """
+    return downloader.stats()
+
+@router.get("/payload-log")
+async def get_payload_log_stats(payload_logger: PayloadLogger = Depends(get_payload_logger)):
+    """
+    Payload log lines written and skipped by sampling.
+    """
+    return payload_logger.stats()
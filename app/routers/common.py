@@ -0,0 +1,269 @@
+import asyncio
+import json
+import math
+import time
+import httpx
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.datastructures import UploadFile
+from app.schemas.kling import TaskResponse
+from app.services.circuit_breaker import CircuitOpen
+from app.services.config import env_int
+from app.services.idempotency import (
+    IdempotencyCache, IdempotencyConflict, external_task_id_for, get_idempotency_cache, payload_fingerprint
+)
+from app.services.json_codec import dumps
+from app.services.payload_log import get_payload_logger
+from app.services.rate_limit import RateLimitExceeded
+from app.services.task_list import TaskListError
+from app.services.uploads import StreamingJSONBody, build_upload
+
+logger = logging.getLogger(__name__)
+
+# A KlingClient create method: submit(payload, deadline=...)
+Submit = Callable[..., Awaitable[Dict[str, Any]]]
+
+def upstream_http_exception(e: Exception) -> HTTPException:
+    """
+    Translates an error raised while calling Kling into the HTTPException
+    returned to our caller.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, httpx.HTTPStatusError):
+        detail = e.response.text
+        try:
+            detail_json = e.response.json()
+            detail = detail_json.get("message", detail)
+        except Exception:
+            pass
+        logger.error(f"Kling API Error (HTTP {e.response.status_code}): {detail}")
+        return HTTPException(status_code=e.response.status_code, detail=detail)
+    if isinstance(e, TaskListError):
+        logger.error(str(e))
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, IdempotencyConflict):
+        return HTTPException(status_code=422, detail=str(e))
+    if isinstance(e, RateLimitExceeded):
+        logger.warning(str(e))
+        return HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    if isinstance(e, CircuitOpen):
+        logger.warning(str(e))
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    logger.error(f"Unexpected error: {str(e)}")
+    return HTTPException(status_code=500, detail=str(e))
+
+def log_payload(event: str, label: Optional[str], payload: Any):
+    """Logs a payload sent to or received from Kling, bounded and sampled (see PayloadLogger)."""
+    if label:
+        get_payload_logger().log(logger, event, label, payload)
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+class Idempotency:
+    """Idempotency context of one create request: the shared cache, the
+    client's Idempotency-Key (if any) and the route it applies to."""
+
+    def __init__(self, cache: IdempotencyCache, scope: str, key: Optional[str] = None):
+        self.cache = cache
+        self.scope = scope
+        self.key = key
+
+async def idempotency(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    cache: IdempotencyCache = Depends(get_idempotency_cache)
+) -> Idempotency:
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    return Idempotency(cache, request.url.path, idempotency_key)
+
+async def request_deadline(x_request_timeout: Optional[str] = Header(None)) -> Optional[float]:
+    """
+    The caller's deadline as a time.monotonic() instant, from an
+    X-Request-Timeout header giving the milliseconds it is willing to wait.
+    Passed to the KlingClient calls made for the request, so queueing and
+    retries give up in time instead of answering a caller that has left.
+    """
+    if x_request_timeout is None:
+        return None
+    try:
+        timeout_ms = float(x_request_timeout)
+    except ValueError:
+        timeout_ms = math.nan
+    if not 0 < timeout_ms < math.inf:
+        raise HTTPException(status_code=400, detail="Invalid X-Request-Timeout, expected milliseconds")
+    return time.monotonic() + timeout_ms / 1000
+
+def _kling_task_response(response: Dict[str, Any], label: Optional[str] = None) -> TaskResponse:
+    log_payload("Received response from Kling", label, response)
+    if response.get("code") != 0:
+        raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
+    task_data = response.get("data", {})
+    return TaskResponse(
+        task_id=task_data.get("task_id", ""),
+        raw_data=task_data
+    )
+
+def _with_external_task_id(model: Type[BaseModel], data: Dict[str, Any], idempotency: Idempotency) -> Dict[str, Any]:
+    if "external_task_id" in model.model_fields and not data.get("external_task_id"):
+        return {**data, "external_task_id": external_task_id_for(idempotency.scope, idempotency.key)}
+    return data
+
+async def submit_task(request: BaseModel, submit: Submit, idempotency: Optional[Idempotency] = None,
+                      label: Optional[str] = None, deadline: Optional[float] = None) -> TaskResponse:
+    """
+    Submits one create request and wraps the Kling response in a TaskResponse.
+
+    With an `idempotency` context, identical submissions (same
+    Idempotency-Key, or same canonical payload when no key is given) share
+    one upstream call while it runs. Only submissions with an
+    Idempotency-Key are answered from the idempotency cache afterwards,
+    unless payload replay is enabled on the cache. Models with an `external_task_id` field get one filled in, so
+    the client's own upstream retries cannot create a second task either.
+    `deadline` (see request_deadline) bounds queueing and retries upstream.
+    """
+    data = request.model_dump(mode='json', exclude_none=True)
+    log_payload("Sending payload to Kling", label, data)
+
+    enabled = idempotency is not None and idempotency.cache.enabled
+
+    async def send() -> TaskResponse:
+        payload = _with_external_task_id(type(request), data, idempotency) if enabled else data
+        return _kling_task_response(await submit(payload, deadline=deadline), label)
+
+    try:
+        if not enabled:
+            return await send()
+        fingerprint = payload_fingerprint(data)
+        if idempotency.key:
+            key = (idempotency.scope, "key", idempotency.key)
+        else:
+            key = (idempotency.scope, "payload", fingerprint)
+        explicit = bool(idempotency.key)
+        return await idempotency.cache.run(
+            key, fingerprint, send, explicit=explicit, remember=explicit or idempotency.cache.replay_payloads
+        )
+    except Exception as e:
+        raise upstream_http_exception(e)
+
+UPLOAD_MAX_FILES = env_int("KLING_UPLOAD_MAX_FILES", 16)
+
+async def submit_upload(http_request: Request, model: Type[BaseModel], submit: Submit,
+                        idempotency: Optional[Idempotency] = None, label: Optional[str] = None,
+                        deadline: Optional[float] = None) -> TaskResponse:
+    """
+    Multipart variant of submit_task for requests carrying media.
+
+    The form has a `request` field with the JSON request minus its media,
+    plus one file part per media field, named by its path: `image`,
+    `image_tail`, `image_list` (repeatable) or `face_choose.0.sound_file`.
+    Files stay in Starlette's spooled temporary files and are base64-encoded
+    chunk by chunk straight into the upstream request body.
+
+    Only an explicit Idempotency-Key deduplicates uploads: their content is
+    never hashed, so equal payload fields say nothing about equal media.
+    """
+    form = await http_request.form(max_files=UPLOAD_MAX_FILES)
+    try:
+        raw = form.get("request") or "{}"
+        try:
+            fields = json.loads(raw) if isinstance(raw, str) else None
+        except ValueError:
+            fields = None
+        if not isinstance(fields, dict):
+            raise HTTPException(status_code=400, detail="Form field 'request' must be a JSON object")
+        files = [(name, value) for name, value in form.multi_items() if isinstance(value, UploadFile)]
+        fingerprint = payload_fingerprint({
+            "request": fields,
+            "files": [[name, file.filename, file.size] for name, file in files],
+        })
+        try:
+            fields, tokens = await build_upload(fields, files)
+            validated = model.model_validate(fields)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        data = validated.model_dump(mode='json', exclude_none=True)
+        log_payload("Sending upload to Kling", label, data)
+
+        enabled = idempotency is not None and idempotency.cache.enabled
+
+        async def send() -> TaskResponse:
+            payload = _with_external_task_id(model, data, idempotency) if enabled else data
+            return _kling_task_response(await submit(StreamingJSONBody(payload, tokens), deadline=deadline), label)
+
+        try:
+            if not enabled or not idempotency.key:
+                return await send()
+            key = (idempotency.scope, "key", idempotency.key)
+            return await idempotency.cache.run(key, fingerprint, send, explicit=True)
+        except Exception as e:
+            raise upstream_http_exception(e)
+    finally:
+        await form.close()
+
+BATCH_MAX_ITEMS = env_int("KLING_BATCH_MAX_ITEMS", 500)
+BATCH_CONCURRENCY = env_int("KLING_BATCH_CONCURRENCY", 8)
+
+async def _submit_batch_item(index: int, item: BaseModel, submit: Submit,
+                             idempotency: Optional[Idempotency], deadline: Optional[float]) -> Dict[str, Any]:
+    try:
+        result = await submit_task(item, submit, idempotency, deadline=deadline)
+        return {"index": index, "status_code": 200, "result": result.model_dump(mode='json')}
+    except HTTPException as error:
+        return {"index": index, "status_code": error.status_code, "detail": error.detail}
+
+def batch_response(items: List[BaseModel], submit: Submit, concurrency: Optional[int] = None,
+                   idempotency: Optional[Idempotency] = None, deadline: Optional[float] = None) -> StreamingResponse:
+    """
+    Submits already-validated request models with bounded concurrency and
+    streams one NDJSON line per item, in completion order, as
+    {"index", "status_code", "result" | "detail"}. Failures are reported
+    per item and never abort the rest of the batch.
+
+    Items are deduplicated by payload against the single-item route, so a
+    batch retried after a dropped connection does not resubmit what already
+    went through; a batch-wide Idempotency-Key does not apply per item.
+    A `deadline` applies to the whole batch: items still queued when it
+    passes fail fast instead of being submitted late.
+    """
+    if not items:
+        raise HTTPException(status_code=422, detail="Batch must contain at least one item")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+    workers_count = min(concurrency or BATCH_CONCURRENCY, len(items))
+    if idempotency is not None:
+        idempotency = Idempotency(idempotency.cache, idempotency.scope.removesuffix(":batch"))
+
+    async def lines():
+        pending = iter(enumerate(items))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for index, item in pending:
+                await results.put(await _submit_batch_item(index, item, submit, idempotency, deadline))
+
+        workers = [asyncio.create_task(worker()) for _ in range(workers_count)]
+        try:
+            for _ in range(len(items)):
+                yield dumps(await results.get()) + b"\n"
+        finally:
+            # The client may disconnect mid-stream; don't leave submissions running
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
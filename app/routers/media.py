@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi.responses import FileResponse
+from app.services.downloader import ResultDownloader, get_result_downloader
+from app.services.media_store import MediaStore, get_media_store, sniff_content_type
+
+router = APIRouter(tags=["Media"])
+
+@router.get("/media/{digest}")
+def get_media(
+    digest: str = Path(..., description="sha256 of the media bytes"),
+    store: MediaStore = Depends(get_media_store)
+):
+    """
+    Serves media stored by the content-addressed media store, for Kling
+    to fetch the images referenced by submitted tasks. Blobs never change,
+    so they may be cached forever.
+    """
+    path = store.path_for(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    try:
+        with open(path, "rb") as f:
+            head = f.read(16)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return FileResponse(
+        path,
+        media_type=sniff_content_type(head),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+@router.get("/downloads/{name}")
+def get_download(
+    name: str = Path(..., description="Local name of a downloaded result file"),
+    downloader: ResultDownloader = Depends(get_result_downloader)
+):
+    """
+    Serves a task result (video or image) downloaded from Kling's CDN.
+    Task status responses link here through `local_url`.
+    """
+    path = downloader.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Download not found")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
@@ -1,45 +1,242 @@
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, Path
-from app.schemas.kling import TaskResponse
+import asyncio
+import time
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.schemas.kling import TaskListPage, TaskResponse
+from app.services.config import env_float
+from app.services.downloader import ResultDownloader, get_result_downloader
+from app.services.json_codec import dumps, trusted_response
 from app.services.kling_client import KlingClient, get_kling_client
+from app.services.poller import TaskPoller, get_task_poller
+from app.services.task_cache import TERMINAL_STATUSES, TaskStatusCache, get_task_cache
+from app.services.task_index import TaskIndex, get_task_index
+from app.services.task_events import Subscription, TaskEventHub, get_task_event_hub
+from app.services.task_list import LISTABLE_ENDPOINTS, MAX_PAGE_SIZE, merge_task_lists
+from app.routers.common import request_deadline, upstream_http_exception
+from app.middleware import TimedRoute
 
-router = APIRouter(prefix="/api/v1/tasks", tags=["Task Query"])
+router = APIRouter(prefix="/api/v1/tasks", tags=["Task Query"], route_class=TimedRoute)
+
+HEARTBEAT_INTERVAL = env_float("KLING_EVENTS_HEARTBEAT", 15.0)
+MAX_WAIT_TIMEOUT = env_float("KLING_WAIT_MAX_TIMEOUT", 120.0)
+
+def _task_response(task_data: dict):
+    return trusted_response(TaskResponse, {
+        "task_id": task_data.get("task_id", ""),
+        "message": task_data.get("task_status", "unknown"),
+        "raw_data": task_data
+    })
+
+def _all_finished(sub: Subscription, finished: set) -> bool:
+    return sub.task_ids is not None and finished >= sub.task_ids
+
+@router.get("", response_model=TaskListPage)
+async def list_tasks(
+    status: Optional[str] = Query(None, description="e.g. submitted, processing, succeed, failed"),
+    model_name: Optional[str] = Query(None),
+    mode: Optional[str] = Query(None, description="std or pro"),
+    endpoint: Optional[str] = Query(None, description="e.g. videos/text2video"),
+    family: Optional[str] = Query(None, description="e.g. video_create, image_create"),
+    account: Optional[str] = Query(None),
+    created_after: Optional[int] = Query(None, description="ms since epoch, inclusive"),
+    created_before: Optional[int] = Query(None, description="ms since epoch, exclusive"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+    index: TaskIndex = Depends(get_task_index)
+):
+    """
+    Lists tasks known to this service, newest first, from the local task
+    index (never calls Kling). Filters combine with AND; follow `next_cursor`
+    for further pages.
+    """
+    filters = {
+        "status": status, "model_name": model_name, "mode": mode, "family": family, "account": account,
+        "endpoint": "/" + endpoint.strip("/") if endpoint else None,
+    }
+    try:
+        tasks, next_cursor = await asyncio.to_thread(index.query, filters, created_after, created_before, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return trusted_response(TaskListPage, {"items": [task.to_dict() for task in tasks], "next_cursor": next_cursor})
+
+@router.get("/events")
+async def stream_task_events(
+    task_id: Optional[List[str]] = Query(None, description="Task IDs to watch; omit to receive all tasks"),
+    hub: TaskEventHub = Depends(get_task_event_hub)
+):
+    """
+    Server-Sent Events stream of task status transitions.
+    Sends the last known state of each watched task first, a `: ping`
+    comment every heartbeat, and closes once all watched tasks have finished.
+    """
+    sub = hub.subscribe(task_id)
+
+    async def frames():
+        finished = set()
+        try:
+            yield b"retry: 3000\n\n"
+            while not _all_finished(sub, finished):
+                events = await sub.next(HEARTBEAT_INTERVAL)
+                if not events:
+                    yield b": ping\n\n"
+                    continue
+                for event in events:
+                    if event.terminal:
+                        finished.add(event.task_id)
+                    yield event.sse
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/export")
+async def export_tasks(
+    endpoint: Optional[List[str]] = Query(None, description="Listings to export, e.g. videos/text2video; omit for all"),
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    account: Optional[str] = Query(None, description="Account to list (default: the primary one)"),
+    client: KlingClient = Depends(get_kling_client)
+):
+    """
+    Streams every task of the selected listings as NDJSON, one
+    {"endpoint_base", "task"} line per task, pages prefetched concurrently.
+    A listing that fails mid-way ends with an {"endpoint_base", "status_code",
+    "detail"} line while the others continue.
+    """
+    if endpoint:
+        endpoint_bases = ["/" + e.strip("/") for e in endpoint]
+        unknown = [e for e in endpoint_bases if e not in LISTABLE_ENDPOINTS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Cannot list {', '.join(unknown)}")
+    else:
+        endpoint_bases = list(LISTABLE_ENDPOINTS)
+    if account is not None and account not in client.accounts.by_name:
+        raise HTTPException(status_code=400, detail=f"Unknown account {account!r}")
+
+    async def lines():
+        async for endpoint_base, item in merge_task_lists(client, endpoint_bases, page_size=page_size, account=account):
+            if isinstance(item, Exception):
+                error = upstream_http_exception(item)
+                line = {"endpoint_base": endpoint_base, "status_code": error.status_code, "detail": error.detail}
+            else:
+                line = {"endpoint_base": endpoint_base, "task": item}
+            yield dumps(line) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.websocket("/events/ws")
+async def task_events_ws(websocket: WebSocket, hub: TaskEventHub = Depends(get_task_event_hub)):
+    """
+    WebSocket variant of /events: one JSON text message per status transition,
+    `{"type": "ping"}` every heartbeat. Watch tasks with ?task_id=...
+    """
+    await websocket.accept()
+    sub = hub.subscribe(websocket.query_params.getlist("task_id") or None)
+    finished = set()
+    try:
+        while not _all_finished(sub, finished):
+            events = await sub.next(HEARTBEAT_INTERVAL)
+            if not events:
+                await websocket.send_text('{"type":"ping"}')
+                continue
+            for event in events:
+                if event.terminal:
+                    finished.add(event.task_id)
+                await websocket.send_text(event.json)
+        await websocket.close()
+    except (WebSocketDisconnect, asyncio.CancelledError):
+        pass
+    finally:
+        hub.unsubscribe(sub)
 
 @router.get("/{category}/{task_type}/{task_id}", response_model=TaskResponse)
 async def get_task_status(
     category: str = Path(..., description="e.g. videos or images"),
     task_type: str = Path(..., description="e.g. text2video, generations"),
     task_id: str = Path(..., description="The task ID"),
-    client: KlingClient = Depends(get_kling_client)
+    client: KlingClient = Depends(get_kling_client),
+    cache: TaskStatusCache = Depends(get_task_cache),
+    downloader: ResultDownloader = Depends(get_result_downloader),
+    deadline: Optional[float] = Depends(request_deadline)
 ):
     """
     Unified task query interface.
     Path matches Kling API structure: /{category}/{task_type}/{task_id}
     Example: /videos/text2video/{id}
+    Served from the task status cache; concurrent polls of one task share a single upstream call.
+    Result assets already downloaded locally carry a `local_url`.
     """
     try:
         # Construct endpoint. e.g. /videos/text2video
         endpoint_base = f"/{category}/{task_type}"
-        response = await client.get_task(endpoint_base, task_id)
+        response = await cache.get_or_fetch(
+            (category, task_type, task_id),
+            lambda: client.get_task(endpoint_base, task_id, deadline=deadline)
+        )
         
         if response.get("code") != 0:
             raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
             
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            message=task_data.get("task_status", "unknown"),
-            raw_data=task_data
-        )
+        return _task_response(downloader.annotate(response.get("data", {})))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise upstream_http_exception(e)
+
+@router.get("/{category}/{task_type}/{task_id}/wait", response_model=TaskResponse)
+async def wait_for_task(
+    category: str = Path(..., description="e.g. videos or images"),
+    task_type: str = Path(..., description="e.g. text2video, generations"),
+    task_id: str = Path(..., description="The task ID"),
+    timeout: float = Query(30.0, ge=0, description="Seconds to wait for succeed/failed"),
+    client: KlingClient = Depends(get_kling_client),
+    cache: TaskStatusCache = Depends(get_task_cache),
+    poller: TaskPoller = Depends(get_task_poller),
+    hub: TaskEventHub = Depends(get_task_event_hub),
+    downloader: ResultDownloader = Depends(get_result_downloader),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    """
+    Long-poll: returns as soon as the task has finished, or its current
+    state once `timeout` expires (capped by KLING_WAIT_MAX_TIMEOUT and by
+    an X-Request-Timeout header).
+    The request is woken by a callback or a background poller refresh;
+    waiting itself never calls Kling.
+    """
+    try:
+        endpoint_base = f"/{category}/{task_type}"
+        key = (category, task_type, task_id)
+
+        async def fetch():
+            response = await cache.get_or_fetch(
+                key, lambda: client.get_task(endpoint_base, task_id, deadline=deadline)
+            )
+            if response.get("code") != 0:
+                raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
+            return response.get("data", {})
+
+        task_data = await fetch()
+        if task_data.get("task_status") in TERMINAL_STATUSES:
+            return _task_response(downloader.annotate(task_data))
+
+        wait = min(timeout, MAX_WAIT_TIMEOUT)
+        if deadline is not None:
+            wait = min(wait, max(0.0, deadline - time.monotonic()))
+        # Make sure somebody refreshes the task while we are parked: one scheduler for
+        # all waiters. With KLING_POLLER_ENABLED=false it is started here, on demand,
+        # and then only refreshes the tasks someone waits for.
+        await poller.start()
+        poller.track(endpoint_base, task_data)
+        event = await hub.wait_for_terminal(task_id, wait)
+        if event is not None:
+            return _task_response(downloader.annotate(event.data))
+        latest = cache.get(key, allow_stale=True)
+        return _task_response(downloader.annotate(latest.get("data", task_data) if latest else task_data))
     except HTTPException:
         raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-        except Exception:
-            pass
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_http_exception(e)
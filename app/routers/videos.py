@@ -1,147 +1,130 @@
-import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Request
 from app.schemas.kling import (
     Text2VideoRequest, Image2VideoRequest, MultiImage2VideoRequest, 
     MotionControlRequest, VideoExtendRequest, TaskResponse
 )
 from app.services.kling_client import KlingClient, get_kling_client
+from app.routers.common import Idempotency, batch_response, idempotency, request_deadline, submit_task, submit_upload
+from app.middleware import TimedRoute
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/v1/videos", tags=["Video Generation"])
+router = APIRouter(prefix="/api/v1/videos", tags=["Video Generation"], route_class=TimedRoute)
 
 @router.post("/text2video", response_model=TaskResponse)
-async def create_text2video(request: Text2VideoRequest, client: KlingClient = Depends(get_kling_client)):
-    try:
-        data = request.model_dump(mode='json', exclude_none=True)
-        # Log the outgoing payload for debugging
-        logger.info(f"Sending payload to Kling: {data}")
-        
-        response = await client.create_text2video(data)
-        
-        # Log response for debugging
-        logger.info(f"Received response from Kling: {response}")
-
-        if response.get("code") != 0:
-            raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            raw_data=task_data
-        )
-    except HTTPException:
-        raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-            # Log the error detail
-            logger.error(f"Kling API Error (HTTP {e.response.status_code}): {detail}")
-        except Exception:
-            logger.error(f"Kling API Error (HTTP {e.response.status_code}): {detail}")
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def create_text2video(
+    request: Text2VideoRequest,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_task(request, client.create_text2video, idem, label="Text2Video", deadline=deadline)
 
 @router.post("/image2video", response_model=TaskResponse)
-async def create_image2video(request: Image2VideoRequest, client: KlingClient = Depends(get_kling_client)):
-    try:
-        data = request.model_dump(mode='json', exclude_none=True)
-        response = await client.create_image2video(data)
-        if response.get("code") != 0:
-            raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            raw_data=task_data
-        )
-    except HTTPException:
-        raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-        except Exception:
-            pass
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def create_image2video(
+    request: Image2VideoRequest,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_task(request, client.create_image2video, idem, deadline=deadline)
 
 @router.post("/multi-image2video", response_model=TaskResponse)
-async def create_multi_image(request: MultiImage2VideoRequest, client: KlingClient = Depends(get_kling_client)):
-    try:
-        data = request.model_dump(mode='json', exclude_none=True)
-        response = await client.create_multi_image2video(data)
-        if response.get("code") != 0:
-            raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            raw_data=task_data
-        )
-    except HTTPException:
-        raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-        except Exception:
-            pass
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def create_multi_image(
+    request: MultiImage2VideoRequest,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_task(request, client.create_multi_image2video, idem, deadline=deadline)
 
 @router.post("/motion-control", response_model=TaskResponse)
-async def create_motion_ctrl(request: MotionControlRequest, client: KlingClient = Depends(get_kling_client)):
-    try:
-        data = request.model_dump(mode='json', exclude_none=True)
-        response = await client.create_motion_control(data)
-        if response.get("code") != 0:
-            raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            raw_data=task_data
-        )
-    except HTTPException:
-        raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-        except Exception:
-            pass
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def create_motion_ctrl(
+    request: MotionControlRequest,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_task(request, client.create_motion_control, idem, deadline=deadline)
 
 @router.post("/video-extend", response_model=TaskResponse)
-async def extend_video(request: VideoExtendRequest, client: KlingClient = Depends(get_kling_client)):
-    try:
-        data = request.model_dump(mode='json', exclude_none=True)
-        response = await client.extend_video(data)
-        if response.get("code") != 0:
-            raise HTTPException(status_code=400, detail=response.get("message", "Unknown error"))
-        task_data = response.get("data", {})
-        return TaskResponse(
-            task_id=task_data.get("task_id", ""),
-            raw_data=task_data
-        )
-    except HTTPException:
-        raise
-    except httpx.HTTPStatusError as e:
-        detail = e.response.text
-        try:
-            detail_json = e.response.json()
-            detail = detail_json.get("message", detail)
-        except Exception:
-            pass
-        raise HTTPException(status_code=e.response.status_code, detail=detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def extend_video(
+    request: VideoExtendRequest,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_task(request, client.extend_video, idem, deadline=deadline)
+
+# --- Multipart uploads ---
+# Media is sent as file parts instead of base64 strings; see submit_upload.
+
+@router.post("/image2video:upload", response_model=TaskResponse)
+async def create_image2video_upload(
+    http_request: Request,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_upload(http_request, Image2VideoRequest, client.create_image2video, idem, deadline=deadline)
+
+@router.post("/multi-image2video:upload", response_model=TaskResponse)
+async def create_multi_image_upload(
+    http_request: Request,
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return await submit_upload(http_request, MultiImage2VideoRequest, client.create_multi_image2video, idem,
+                               deadline=deadline)
+
+# --- Batch submission ---
+# Each body is a JSON list of the single-item request. Results are streamed
+# back as NDJSON, one line per item, as soon as that item is submitted.
+
+@router.post("/text2video:batch")
+async def create_text2video_batch(
+    requests: List[Text2VideoRequest],
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return batch_response(requests, client.create_text2video, idempotency=idem, deadline=deadline)
+
+@router.post("/image2video:batch")
+async def create_image2video_batch(
+    requests: List[Image2VideoRequest],
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return batch_response(requests, client.create_image2video, idempotency=idem, deadline=deadline)
+
+@router.post("/multi-image2video:batch")
+async def create_multi_image_batch(
+    requests: List[MultiImage2VideoRequest],
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return batch_response(requests, client.create_multi_image2video, idempotency=idem, deadline=deadline)
+
+@router.post("/motion-control:batch")
+async def create_motion_ctrl_batch(
+    requests: List[MotionControlRequest],
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return batch_response(requests, client.create_motion_control, idempotency=idem, deadline=deadline)
+
+@router.post("/video-extend:batch")
+async def extend_video_batch(
+    requests: List[VideoExtendRequest],
+    client: KlingClient = Depends(get_kling_client),
+    idem: Idempotency = Depends(idempotency),
+    deadline: Optional[float] = Depends(request_deadline)
+):
+    return batch_response(requests, client.extend_video, idempotency=idem, deadline=deadline)
@@ -0,0 +1,7 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class LimitUpdate(BaseModel):
+    qps: Optional[float] = Field(None, ge=0, description="Requests per second, 0 = unlimited")
+    burst: Optional[int] = Field(None, ge=1)
+    concurrency: Optional[int] = Field(None, ge=0, description="Concurrent requests, 0 = unlimited")
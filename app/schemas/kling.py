@@ -44,10 +44,11 @@ class TaskStatus(str, Enum):
 
 def clean_base64_field(v: Optional[str]) -> Optional[str]:
     if v and isinstance(v, str) and v.startswith('data:'):
-        # Find the comma separator
-        parts = v.split(',', 1)
-        if len(parts) == 2:
-            return parts[1]
+        # Strip the data URL header; slicing copies only the payload once,
+        # where split() would build a list holding a second copy.
+        comma = v.find(',')
+        if comma != -1:
+            return v[comma + 1:]
     return v
 
 # --- Complex Objects ---
@@ -222,3 +223,19 @@ class TaskResponse(BaseModel):
     task_id: str
     message: str = "success"
     raw_data: Dict[str, Any] # Contains original 'data' field from Kling API
+
+class IndexedTaskItem(BaseModel):
+    task_id: str
+    endpoint: Optional[str] = None
+    family: Optional[str] = None
+    status: Optional[str] = None
+    model_name: Optional[str] = None
+    mode: Optional[str] = None
+    account: Optional[str] = None
+    created_at: int # ms since epoch, as reported by Kling
+    updated_at: int
+    data: Dict[str, Any] # Latest known 'data' of the task
+
+class TaskListPage(BaseModel):
+    items: List[IndexedTaskItem]
+    next_cursor: Optional[str] = None # Pass as `cursor` to get the next page
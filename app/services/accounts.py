@@ -0,0 +1,225 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from app.services.config import env_float, env_int
+from app.services.rate_limit import RateLimitExceeded
+from app.services.token_cache import TokenCache
+
+# Kling business codes meaning "this account cannot take more work right now":
+# arrears, resource pack exhausted, rate too high, concurrency/QPS over quota.
+QUOTA_ERROR_CODES = frozenset({1101, 1102, 1302, 1303})
+
+STRATEGIES = ("least_in_flight", "weighted", "health")
+
+
+class Account:
+    """
+    One Kling credential (AK/SK pair or static API token) plus its live load
+    and health, as seen by this process.
+    """
+
+    def __init__(self, name: str, access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 api_token: Optional[str] = None, weight: float = 1.0, token_cache: Optional[TokenCache] = None):
+        self.name = name
+        self.weight = weight
+        self.api_token = api_token
+        self.token_cache = token_cache
+        if self.token_cache is None and access_key and secret_key:
+            self.token_cache = TokenCache(access_key, secret_key)
+
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.health = 1.0  # EWMA of call outcomes, 1.0 = all recent calls succeeded
+        self.requests = 0
+        self.failures = 0
+        self.quota_errors = 0
+        self._current_weight = 0.0  # smooth weighted round-robin state
+
+    def token(self) -> str:
+        if self.token_cache is not None:
+            return self.token_cache.get()
+        return self.api_token or ""
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "health": round(self.health, 3),
+            "cooling_down_for": max(0.0, round(self.cooldown_until - now, 1)),
+            "requests": self.requests,
+            "failures": self.failures,
+            "quota_errors": self.quota_errors,
+        }
+
+
+class AccountPool:
+    """
+    Spreads task submissions over several Kling accounts and remembers which
+    account created each task, so later queries are signed by the same one.
+    Tasks that fell out of the in-memory map (restart, another worker,
+    eviction) are looked up with `task_account_lookup`, a blocking
+    task_id -> account name function such as TaskIndex.account_of.
+    Identify-face sessions are remembered the same way, so the lip-sync
+    task using one is submitted by the account that owns it.
+
+    Accounts whose submissions hit quota errors are taken out of rotation
+    for `cooldown` seconds (or the upstream Retry-After, when given), as
+    long as another account can take over.
+    """
+
+    def __init__(self, accounts: List[Account], strategy: str = "least_in_flight", cooldown: float = 60.0,
+                 max_tracked_tasks: int = 100_000, health_decay: float = 0.2):
+        if not accounts:
+            raise ValueError("AccountPool needs at least one account")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown account strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.accounts = accounts
+        self.by_name = {account.name: account for account in accounts}
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.health_decay = health_decay
+        self.max_tracked_tasks = max_tracked_tasks
+        # task_id (or "session:" + session_id) -> account name, least recently used first
+        self._task_accounts: "OrderedDict[str, str]" = OrderedDict()
+        self.task_account_lookup: Optional[Callable[[str], Optional[str]]] = None
+
+    @classmethod
+    def from_env(cls, access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 api_token: Optional[str] = None, **token_options) -> "AccountPool":
+        """
+        Reads KLING_ACCOUNTS, a JSON list such as
+        [{"name": "a", "access_key": "...", "secret_key": "...", "weight": 2}],
+        falling back to the single AK/SK or static token.
+        """
+        accounts = []
+        raw = os.getenv("KLING_ACCOUNTS")
+        if raw:
+            for index, entry in enumerate(json.loads(raw)):
+                token_cache = None
+                if entry.get("access_key") and entry.get("secret_key"):
+                    token_cache = TokenCache(entry["access_key"], entry["secret_key"], **token_options)
+                accounts.append(Account(
+                    name=entry.get("name") or f"account-{index}",
+                    api_token=entry.get("api_token"),
+                    weight=float(entry.get("weight", 1.0)),
+                    token_cache=token_cache,
+                ))
+        else:
+            token_cache = TokenCache(access_key, secret_key, **token_options) if access_key and secret_key else None
+            accounts.append(Account(name="default", api_token=api_token, token_cache=token_cache))
+        return cls(
+            accounts,
+            strategy=os.getenv("KLING_ACCOUNT_STRATEGY", "least_in_flight"),
+            cooldown=env_float("KLING_ACCOUNT_COOLDOWN", 60.0),
+            max_tracked_tasks=env_int("KLING_ACCOUNT_TASK_MAP_SIZE", 100_000),
+        )
+
+    @property
+    def primary(self) -> Account:
+        return self.accounts[0]
+
+    def select(self, exclude: Optional[Account] = None) -> Account:
+        """
+        Picks the account for a new submission.
+        Raises RateLimitExceeded when every account is cooling down.
+        """
+        now = time.monotonic()
+        candidates = [a for a in self.accounts if a.available(now) and a is not exclude]
+        if not candidates:
+            candidates = [a for a in self.accounts if a.available(now)]
+        if not candidates:
+            retry_after = min(a.cooldown_until for a in self.accounts) - now
+            raise RateLimitExceeded("accounts", max(retry_after, 0.0))
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.strategy == "weighted":
+            # Smooth weighted round-robin (as in nginx): deterministic and evenly interleaved
+            total = 0.0
+            for account in candidates:
+                account._current_weight += account.weight
+                total += account.weight
+            chosen = max(candidates, key=lambda a: a._current_weight)
+            chosen._current_weight -= total
+            return chosen
+        if self.strategy == "health":
+            return max(candidates, key=lambda a: a.health * a.weight / (1 + a.in_flight))
+        return min(candidates, key=lambda a: (a.in_flight / a.weight, -a.weight))
+
+    def _remembered(self, key: str) -> Optional[Account]:
+        name = self._task_accounts.get(key)
+        if name is None:
+            return None
+        self._task_accounts.move_to_end(key)
+        return self.by_name.get(name)
+
+    def _remember(self, key: str, account: Account):
+        if len(self.accounts) == 1:
+            return
+        self._task_accounts[key] = account.name
+        self._task_accounts.move_to_end(key)
+        while len(self._task_accounts) > self.max_tracked_tasks:
+            self._task_accounts.popitem(last=False)
+
+    def known_task_account(self, task_id: str) -> Optional[Account]:
+        """The account that created `task_id` according to the in-memory map, or None."""
+        return self._remembered(task_id)
+
+    def lookup_task_account(self, task_id: str) -> Optional[Account]:
+        """
+        The account that created `task_id` according to `task_account_lookup`
+        (blocking), remembered for the next queries; None if unknown there too.
+        """
+        if len(self.accounts) == 1 or self.task_account_lookup is None:
+            return None
+        account = self.by_name.get(self.task_account_lookup(task_id) or "")
+        if account is not None:
+            self._remember(task_id, account)
+        return account
+
+    def for_task(self, task_id: str) -> Account:
+        """The account that created `task_id`, or the primary one if unknown."""
+        return self.known_task_account(task_id) or self.primary
+
+    def remember_task(self, task_id: str, account: Account):
+        self._remember(task_id, account)
+
+    def for_session(self, session_id: str) -> Optional[Account]:
+        """The account that answered the identify-face call of `session_id`, if known."""
+        return self._remembered("session:" + session_id)
+
+    def remember_session(self, session_id: str, account: Account):
+        self._remember("session:" + session_id, account)
+
+    def record_success(self, account: Account):
+        account.requests += 1
+        account.health += (1.0 - account.health) * self.health_decay
+
+    def record_failure(self, account: Account):
+        account.requests += 1
+        account.failures += 1
+        account.health -= account.health * self.health_decay
+
+    def record_quota_error(self, account: Account, retry_after: Optional[float] = None, cooldown: bool = True):
+        """
+        Counts a quota error and, when `cooldown` is set, takes the account
+        out of rotation. A single account is never cooled down: there is no
+        other account to hand its work to, so Kling decides instead.
+        """
+        account.quota_errors += 1
+        self.record_failure(account)
+        if cooldown and len(self.accounts) > 1:
+            account.cooldown_until = time.monotonic() + (retry_after if retry_after is not None else self.cooldown)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "tracked_tasks": len(self._task_accounts),
+            "accounts": {account.name: account.snapshot(now) for account in self.accounts},
+        }
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALLBACK_DB = os.path.join("data", "callbacks.db")
+
+
+def normalize_callback(payload: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Extracts (task_id, task_status) from a callback body. Kling sends
+    `task_status`; older docs and manual tests use `status`.
+    """
+    task_id = payload.get("task_id")
+    status = payload.get("task_status") or payload.get("status")
+    if not task_id or not isinstance(task_id, str):
+        raise ValueError("Callback payload has no task_id")
+    return task_id, str(status or "unknown")
+
+
+class CallbackStore:
+    """
+    SQLite (WAL mode) table of received callbacks, one row per
+    (task_id, task_status). Redelivered callbacks only bump `deliveries`.
+    Used from the ingestor's writer only; all methods are blocking.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        if self._conn is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_callbacks (
+                task_id TEXT NOT NULL,
+                task_status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                updated_at INTEGER,
+                received_at REAL NOT NULL,
+                deliveries INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (task_id, task_status)
+            )
+        """)
+        self._conn.commit()
+
+    def write_batch(self, rows: List[Tuple[str, str, str, Optional[int], float]]):
+        self.open()
+        with self._conn:
+            self._conn.executemany("""
+                INSERT INTO task_callbacks (task_id, task_status, payload, updated_at, received_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (task_id, task_status) DO UPDATE SET deliveries = deliveries + 1
+            """, rows)
+
+    def get(self, task_id: str) -> List[Dict[str, Any]]:
+        """All stored states of a task, oldest first."""
+        self.open()
+        cursor = self._conn.execute(
+            "SELECT task_status, payload, received_at, deliveries FROM task_callbacks "
+            "WHERE task_id = ? ORDER BY received_at",
+            (task_id,)
+        )
+        return [
+            {"task_status": status, "payload": json.loads(payload), "received_at": received_at,
+             "deliveries": deliveries}
+            for status, payload, received_at, deliveries in cursor
+        ]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CallbackIngestor:
+    """
+    Decouples POST /callback from storage: the handler only enqueues
+    (never awaits I/O), and a single writer drains the bounded queue into
+    the CallbackStore in batches, off the event loop.
+
+    Callbacks were already acknowledged to Kling when they are written, so
+    a batch that fails to write is retried with backoff until it succeeds;
+    meanwhile new callbacks fill the queue and are shed once it is full.
+    """
+
+    def __init__(self, store: CallbackStore, queue_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 dedupe_window: int = 10_000, retry_delay: Optional[float] = None,
+                 max_retry_delay: Optional[float] = None):
+        self.store = store
+        self.queue_size = queue_size if queue_size is not None else env_int("KLING_CALLBACK_QUEUE_SIZE", 10_000)
+        self.batch_size = batch_size if batch_size is not None else env_int("KLING_CALLBACK_BATCH_SIZE", 500)
+        self.dedupe_window = dedupe_window
+        self.retry_delay = retry_delay if retry_delay is not None else env_float("KLING_CALLBACK_RETRY_DELAY", 0.5)
+        self.max_retry_delay = max_retry_delay if max_retry_delay is not None \
+            else env_float("KLING_CALLBACK_RETRY_MAX_DELAY", 30.0)
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._recent: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        # Called as listener(payload) for every accepted, non-duplicate callback
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: Optional[float] = None):
+        """
+        Flushes everything still queued, then stops the writer. Gives up
+        after `timeout` seconds (KLING_CALLBACK_STOP_TIMEOUT) if the store
+        keeps failing.
+        """
+        if self._writer is None:
+            return
+        timeout = timeout if timeout is not None else env_float("KLING_CALLBACK_STOP_TIMEOUT", 30.0)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Stopping with {self._queue.qsize()} callbacks (plus the batch being retried) unwritten")
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+        await asyncio.to_thread(self.store.close)
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """
+        Enqueues a callback payload. Returns False when the queue is full,
+        in which case the caller should ask Kling to redeliver later.
+        Raises ValueError for payloads without a task_id.
+        """
+        task_id, status = normalize_callback(payload)
+        self.start()
+        key = (task_id, status)
+        if key in self._recent:
+            # Kling retried a callback we already have; the upsert would be a no-op
+            self.duplicates += 1
+            return True
+        row = (task_id, status, json.dumps(payload, ensure_ascii=False), payload.get("updated_at"), time.time())
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        self._recent[key] = None
+        if len(self._recent) > self.dedupe_window:
+            self._recent.popitem(last=False)
+        for listener in self.listeners:
+            try:
+                listener(payload)
+            except Exception as e:
+                logger.error(f"Callback listener failed for {task_id}: {e!r}")
+        return True
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            delay = self.retry_delay
+            while True:
+                try:
+                    await asyncio.to_thread(self.store.write_batch, batch)
+                    break
+                except Exception as e:
+                    # Kling got its 200 already and will not redeliver; keep the batch until it is stored
+                    self.write_errors += 1
+                    logger.error(f"Failed to persist {len(batch)} callbacks, retrying in {delay:.1f}s: {e!r}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+            self.written += len(batch)
+            self.batches += 1
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "written": self.written,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+        }
+
+
+# Dependency injection helper
+_callback_ingestor: Optional[CallbackIngestor] = None
+
+def get_callback_ingestor() -> CallbackIngestor:
+    global _callback_ingestor
+    if _callback_ingestor is None:
+        _callback_ingestor = CallbackIngestor(CallbackStore(os.getenv("KLING_CALLBACK_DB", DEFAULT_CALLBACK_DB)))
+    return _callback_ingestor
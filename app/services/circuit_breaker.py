@@ -0,0 +1,278 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+import httpx
+from app.services.config import env_bool, env_float, env_int
+from app.services.endpoints import FAMILIES, IDENTIFY_FACE, IMAGE_CREATE, TASK_QUERY, VIDEO_CREATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for /metrics
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Seconds after which a call counts as slow, per family. Creates legitimately
+# take much longer than task queries.
+DEFAULT_SLOW_CALL = {
+    VIDEO_CREATE: 60.0,
+    IMAGE_CREATE: 60.0,
+    TASK_QUERY: 10.0,
+    IDENTIFY_FACE: 30.0,
+}
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling Kling while the circuit of a family is open.
+    """
+
+    def __init__(self, family: str, retry_after: float):
+        super().__init__(f"Kling {family} calls are failing, circuit open; retry in {retry_after:.1f}s")
+        self.family = family
+        self.retry_after = retry_after
+
+
+def is_failure(error: BaseException) -> bool:
+    """
+    Whether an error says Kling is unhealthy: 5xx responses and transport
+    errors. 4xx (including 429) mean Kling answered; a pool timeout is
+    local saturation, not an upstream failure.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError) and not isinstance(error, httpx.PoolTimeout)
+
+
+class CircuitBreaker:
+    """
+    Circuit of one endpoint family.
+
+    Closed: outcomes of the last `window` seconds are kept; once there are
+    at least `min_calls` of them and the share of failures reaches
+    `error_rate` (or the share of calls slower than `slow_call` reaches
+    `slow_rate`), the circuit opens.
+    Open: calls fail fast with CircuitOpen for `open_seconds`, doubled on
+    every failed probe up to `max_open_seconds`.
+    Half-open: up to `half_open_probes` calls go through; that many
+    successes close the circuit, a single failure opens it again.
+    """
+
+    def __init__(
+        self,
+        family: str,
+        window: float = 30.0,
+        min_calls: int = 20,
+        error_rate: float = 0.5,
+        slow_call: float = 10.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 10.0,
+        max_open_seconds: float = 120.0,
+        half_open_probes: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.family = family
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(max_open_seconds, open_seconds)
+        self.half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+
+        self.state = CLOSED
+        # (finished_at, failed, slow) of recent calls while closed
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._open_for = open_seconds
+        self.open_until = 0.0
+        # Bumped on every transition, so calls started in an earlier state are recognized
+        self._generation = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.trips = 0
+        self.rejected = 0
+
+    def _prune(self, now: float):
+        horizon = now - self.window
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            _, failed, slow = self._outcomes.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def _transition(self, state: str):
+        self.state = state
+        self._generation += 1
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _open(self, now: float, reason: str):
+        self._transition(OPEN)
+        self.open_until = now + self._open_for
+        self.trips += 1
+        logger.warning(f"Circuit for {self.family} opened for {self._open_for:.0f}s: {reason}")
+
+    def acquire(self) -> Tuple[int, bool]:
+        """
+        Admits one call, or raises CircuitOpen. Returns (generation, probe)
+        to hand back to `record` or `release`.
+        """
+        if self.state == OPEN:
+            now = self._clock()
+            if now < self.open_until:
+                self.rejected += 1
+                raise CircuitOpen(self.family, self.open_until - now)
+            self._transition(HALF_OPEN)
+            logger.info(f"Circuit for {self.family} half-open, probing")
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpen(self.family, 1.0)
+            self._probes_in_flight += 1
+            return self._generation, True
+        return self._generation, False
+
+    def release(self, admission: Tuple[int, bool]):
+        """Gives back an admission whose call ended without an outcome (e.g. cancelled)."""
+        generation, probe = admission
+        if probe and generation == self._generation:
+            self._probes_in_flight -= 1
+
+    def record(self, admission: Tuple[int, bool], failed: bool, elapsed: float):
+        generation, probe = admission
+        if generation != self._generation:
+            # Started before the last transition; its outcome describes an older state
+            return
+        now = self._clock()
+        slow = 0 < self.slow_call <= elapsed
+        if probe:
+            self._probes_in_flight -= 1
+            if failed or slow:
+                self._open_for = min(self._open_for * 2, self.max_open_seconds)
+                self._open(now, f"probe {'failed' if failed else f'took {elapsed:.1f}s'}")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CLOSED)
+                self._open_for = self.open_seconds
+                logger.info(f"Circuit for {self.family} closed")
+            return
+
+        self._outcomes.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        self._prune(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        if self._failures / calls >= self.error_rate:
+            self._open(now, f"{self._failures}/{calls} calls failed in {self.window:.0f}s")
+        elif self.slow_rate > 0 and self._slow / calls >= self.slow_rate:
+            self._open(now, f"{self._slow}/{calls} calls slower than {self.slow_call:.1f}s")
+
+    def reset(self):
+        self._transition(CLOSED)
+        self._open_for = self.open_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = self._clock()
+        self._prune(now)
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "retry_after": max(0.0, self.open_until - now) if self.state == OPEN else 0.0,
+            "window_calls": calls,
+            "window_error_rate": self._failures / calls if calls else 0.0,
+            "window_slow_rate": self._slow / calls if calls else 0.0,
+            "probes_in_flight": self._probes_in_flight,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "slow_call": self.slow_call,
+        }
+
+
+class CircuitCall:
+    """
+    `with breakers.call(family) as call:` around one attempt. `call.start()`
+    marks when the request is actually sent, so local queueing does not
+    count as upstream latency; an attempt that never started (or was
+    cancelled) records no outcome.
+    """
+
+    __slots__ = ("breaker", "admission", "started")
+
+    def __init__(self, breaker: Optional[CircuitBreaker]):
+        self.breaker = breaker
+        self.admission = None
+        self.started: Optional[float] = None
+
+    def __enter__(self):
+        if self.breaker is not None:
+            self.admission = self.breaker.acquire()
+        return self
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.admission is None:
+            return False
+        if self.started is None or not (exc is None or isinstance(exc, (httpx.HTTPStatusError, httpx.TransportError))):
+            self.breaker.release(self.admission)
+        else:
+            self.breaker.record(self.admission, exc is not None and is_failure(exc), time.perf_counter() - self.started)
+        return False
+
+
+class CircuitBreakers:
+    """
+    One circuit per endpoint family, so an outage of video creation does not
+    stop task queries (and the other way round).
+
+    Thresholds are read from KLING_BREAKER_* env vars; the slow-call limit
+    per family from KLING_BREAKER_<FAMILY>_SLOW_CALL.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, clock: Callable[[], float] = time.monotonic, **options):
+        self.enabled = enabled if enabled is not None else env_bool("KLING_BREAKER_ENABLED", True)
+        settings = {
+            "window": env_float("KLING_BREAKER_WINDOW", 30.0),
+            "min_calls": env_int("KLING_BREAKER_MIN_CALLS", 20),
+            "error_rate": env_float("KLING_BREAKER_ERROR_RATE", 0.5),
+            "slow_rate": env_float("KLING_BREAKER_SLOW_RATE", 0.8),
+            "open_seconds": env_float("KLING_BREAKER_OPEN_SECONDS", 10.0),
+            "max_open_seconds": env_float("KLING_BREAKER_MAX_OPEN_SECONDS", 120.0),
+            "half_open_probes": env_int("KLING_BREAKER_HALF_OPEN_PROBES", 3),
+        }
+        settings.update(options)
+        self.families: Dict[str, CircuitBreaker] = {}
+        for family in FAMILIES:
+            family_settings = dict(settings)
+            family_settings.setdefault(
+                "slow_call", env_float(f"KLING_BREAKER_{family.upper()}_SLOW_CALL", DEFAULT_SLOW_CALL[family])
+            )
+            self.families[family] = CircuitBreaker(family, clock=clock, **family_settings)
+
+    def call(self, family: str) -> CircuitCall:
+        return CircuitCall(self.families.get(family) if self.enabled else None)
+
+    def reset(self, family: str) -> Dict[str, Any]:
+        breaker = self.families[family]
+        breaker.reset()
+        return breaker.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "families": {family: breaker.snapshot() for family, breaker in self.families.items()},
+        }
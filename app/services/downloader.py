@@ -0,0 +1,368 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from app.services.config import env_bool, env_int
+from app.services.task_cache import task_status_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_DIR = os.path.join("data", "downloads")
+
+NAME_PATTERN = re.compile(r"^[0-9a-f]{40}(\.[a-z0-9]{1,8})?$")
+
+_MD5_ETAG = re.compile(r'^(W/)?"?([0-9a-fA-F]{32})"?$')
+
+
+class DownloadError(Exception):
+    """The downloaded file does not match what the server announced."""
+
+
+def result_urls(task_data: Dict[str, Any]) -> Iterator[str]:
+    """URLs of the generated media in a task's `task_result`."""
+    result = task_data.get("task_result") or {}
+    for kind in ("videos", "images"):
+        for asset in result.get(kind) or ():
+            if isinstance(asset, dict) and asset.get("url"):
+                yield asset["url"]
+
+
+def expected_md5(response: httpx.Response) -> Optional[str]:
+    """
+    MD5 of the whole file, from Content-MD5 (full responses only; on a 206
+    it covers just the range) or from an ETag that is a plain MD5, as on
+    S3/OSS-style CDNs.
+    """
+    content_md5 = response.headers.get("content-md5")
+    if content_md5 and response.status_code == 200:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            return None
+    match = _MD5_ETAG.match(response.headers.get("etag", ""))
+    return match.group(2).lower() if match else None
+
+
+def total_size(response: httpx.Response) -> Optional[int]:
+    """Size of the whole file, from Content-Range or a full response's Content-Length."""
+    content_range = response.headers.get("content-range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length")
+    if response.status_code == 200 and length and length.isdigit():
+        return int(length)
+    return None
+
+
+def _file_size(path: str) -> Optional[int]:
+    return os.path.getsize(path) if os.path.isfile(path) else None
+
+
+class Asset:
+    __slots__ = ("url", "name", "state", "size", "sha256", "attempts", "resumed", "error")
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self.state = "queued"  # queued, downloading, done, failed
+        self.size: Optional[int] = None
+        self.sha256: Optional[str] = None
+        self.attempts = 0
+        self.resumed = 0
+        self.error: Optional[str] = None
+
+
+class _PartialFile:
+    """A .part file plus running hashes of everything written to it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        if os.path.exists(path):
+            # Resuming: seed the hashes with what an earlier attempt wrote
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self._hash(chunk)
+        self._file = open(path, "ab")
+
+    def _hash(self, chunk: bytes):
+        self.md5.update(chunk)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+    def write(self, chunk: bytes):
+        self._hash(chunk)
+        self._file.write(chunk)
+
+    def truncate(self):
+        self._file.truncate(0)
+        self.md5, self.sha256, self.size = hashlib.md5(), hashlib.sha256(), 0
+
+    def close(self):
+        self._file.close()
+
+
+class ResultDownloader:
+    """
+    Copies the media of succeeded tasks from Kling's CDN to local storage,
+    so consumers fetch it from this service instead of each downloading it.
+
+    A fixed pool of workers streams each URL in chunks to a .part file.
+    Interrupted transfers resume with a Range request, and the result is
+    checked against the announced length and MD5 (Content-MD5 or an MD5
+    ETag) before it is renamed into place. Each URL is downloaded once;
+    files already on disk are reused across restarts.
+    """
+
+    def __init__(self, directory: str, enabled: Optional[bool] = None, concurrency: Optional[int] = None,
+                 max_attempts: Optional[int] = None, chunk_size: int = 1024 * 1024,
+                 public_url: Optional[str] = None, client: Optional[httpx.AsyncClient] = None,
+                 retry_delay: float = 1.0, max_tracked: int = 100_000):
+        self.directory = directory
+        self.enabled = enabled if enabled is not None else env_bool("KLING_DOWNLOADS_ENABLED", False)
+        self.concurrency = concurrency if concurrency is not None else env_int("KLING_DOWNLOAD_CONCURRENCY", 4)
+        self.max_attempts = max_attempts if max_attempts is not None else env_int("KLING_DOWNLOAD_MAX_ATTEMPTS", 5)
+        self.chunk_size = chunk_size
+        self.public_url = public_url.rstrip("/") if public_url else ""
+        self.retry_delay = retry_delay
+        self._client = client
+        self.max_tracked = max_tracked
+        self._assets: "OrderedDict[str, Asset]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        self.deduped = 0
+        self.completed = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultDownloader":
+        return cls(os.getenv("KLING_DOWNLOAD_DIR", DEFAULT_DOWNLOAD_DIR),
+                   public_url=os.getenv("KLING_DOWNLOAD_PUBLIC_URL"))
+
+    @staticmethod
+    def name_for(url: str) -> str:
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+        if not re.match(r"^\.[a-z0-9]{1,8}$", extension):
+            extension = ""
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + extension
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Path of a completed download, or None."""
+        if not NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def local_url(self, url: str) -> Optional[str]:
+        asset = self._assets.get(url)
+        if asset is None or asset.state != "done":
+            return None
+        return f"{self.public_url}/downloads/{asset.name}"
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._workers:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=60.0), follow_redirects=True)
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def join(self):
+        """Waits until everything queued so far has been downloaded (or given up)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    # --- Scheduling ---
+
+    def schedule(self, url: str) -> Asset:
+        """
+        Queues `url` for download unless it is already queued, downloading
+        or done. A failed asset is queued again for a fresh set of attempts.
+        Never touches the disk: workers check for an existing file first.
+        """
+        asset = self._assets.get(url)
+        if asset is not None and asset.state != "failed":
+            self.deduped += 1
+            return asset
+        if asset is not None:
+            asset.state, asset.attempts, asset.error = "queued", 0, None
+            self._assets.move_to_end(url)
+            self.start()
+            self._queue.put_nowait(asset)
+            return asset
+        asset = Asset(url, self.name_for(url))
+        self._assets[url] = asset
+        while len(self._assets) > self.max_tracked:
+            # Forget the oldest finished asset; its file stays on disk and is
+            # picked up again if the URL comes back
+            oldest = next(iter(self._assets.values()))
+            if oldest.state not in ("done", "failed"):
+                break
+            self._assets.popitem(last=False)
+        self.start()
+        self._queue.put_nowait(asset)
+        return asset
+
+    def schedule_task(self, task_data: Dict[str, Any]):
+        if self.enabled and task_data.get("task_status") == "succeed":
+            for url in result_urls(task_data):
+                self.schedule(url)
+
+    def on_response(self, key: Hashable, response: Dict[str, Any]):
+        """TaskStatusCache listener."""
+        if task_status_of(response) == "succeed":
+            self.schedule_task(response["data"])
+
+    def on_callback(self, payload: Dict[str, Any]):
+        """CallbackIngestor listener."""
+        status = payload.get("task_status") or payload.get("status")
+        if status == "succeed":
+            self.schedule_task({**payload, "task_status": status})
+
+    def annotate(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copy of `task_data` whose downloaded result assets carry a `local_url`.
+        Returned unchanged when nothing has been downloaded.
+        """
+        result = task_data.get("task_result")
+        if not self._assets or not isinstance(result, dict):
+            return task_data
+        annotated = dict(result)
+        changed = False
+        for kind in ("videos", "images"):
+            assets = result.get(kind)
+            if not isinstance(assets, list):
+                continue
+            copies = []
+            for asset in assets:
+                local_url = self.local_url(asset.get("url")) if isinstance(asset, dict) else None
+                if local_url:
+                    asset = {**asset, "local_url": local_url}
+                    changed = True
+                copies.append(asset)
+            annotated[kind] = copies
+        return {**task_data, "task_result": annotated} if changed else task_data
+
+    # --- Transfer ---
+
+    async def _worker(self):
+        while True:
+            asset = await self._queue.get()
+            try:
+                await self._download(asset)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                asset.state = "failed"
+                asset.error = repr(e)
+                self.failed += 1
+                logger.warning(f"Giving up on downloading {asset.url}: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    async def _download(self, asset: Asset):
+        final_path = os.path.join(self.directory, asset.name)
+        size = await asyncio.to_thread(_file_size, final_path)
+        if size is not None:
+            # Downloaded before, e.g. ahead of a restart
+            asset.state, asset.size = "done", size
+            return
+        asset.state = "downloading"
+        part_path = final_path + ".part"
+        while True:
+            asset.attempts += 1
+            try:
+                await self._transfer(asset, part_path)
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code >= 500
+                if not retryable or asset.attempts >= self.max_attempts:
+                    raise
+                logger.info(f"Download of {asset.url} interrupted ({e!r}); resuming")
+                await asyncio.sleep(self.retry_delay * asset.attempts)
+        await asyncio.to_thread(os.replace, part_path, final_path)
+        asset.state = "done"
+        self.completed += 1
+
+    async def _transfer(self, asset: Asset, part_path: str):
+        part = await asyncio.to_thread(_PartialFile, part_path)
+        try:
+            headers = {"Range": f"bytes={part.size}-"} if part.size else {}
+            async with self._client.stream("GET", asset.url, headers=headers) as response:
+                if response.status_code == 416 and part.size:
+                    # Asked for bytes past the end: an earlier attempt got the whole file
+                    if total_size(response) in (None, part.size):
+                        asset.size, asset.sha256 = part.size, part.sha256.hexdigest()
+                        return
+                    await asyncio.to_thread(part.truncate)
+                    raise httpx.RemoteProtocolError("Partial file is larger than the resource",
+                                                    request=response.request)
+                response.raise_for_status()
+                if response.status_code == 206:
+                    asset.resumed += 1
+                elif part.size:
+                    # The server ignored the Range header; start over
+                    await asyncio.to_thread(part.truncate)
+                total = total_size(response)
+                md5 = expected_md5(response)
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await asyncio.to_thread(part.write, chunk)
+                    self.bytes_downloaded += len(chunk)
+        finally:
+            await asyncio.to_thread(part.close)
+
+        if total is not None and part.size != total:
+            # The connection closed early; the next attempt resumes from here
+            raise httpx.RemoteProtocolError(f"Got {part.size} of {total} bytes", request=response.request)
+        if md5 is not None and part.md5.hexdigest() != md5:
+            await asyncio.to_thread(os.remove, part_path)
+            raise DownloadError(f"MD5 mismatch for {asset.url}")
+        asset.size, asset.sha256 = part.size, part.sha256.hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        states: Dict[str, int] = {}
+        for asset in self._assets.values():
+            states[asset.state] = states.get(asset.state, 0) + 1
+        return {
+            "enabled": self.enabled,
+            "assets": states,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "deduped": self.deduped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": sum(asset.resumed for asset in self._assets.values()),
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+
+# Dependency injection helper
+_result_downloader: Optional[ResultDownloader] = None
+
+def get_result_downloader() -> ResultDownloader:
+    global _result_downloader
+    if _result_downloader is None:
+        _result_downloader = ResultDownloader.from_env()
+    return _result_downloader
@@ -0,0 +1,51 @@
+# Endpoint families group Kling paths that share quotas and failure modes.
+VIDEO_CREATE = "video_create"
+IMAGE_CREATE = "image_create"
+TASK_QUERY = "task_query"
+IDENTIFY_FACE = "identify_face"
+
+FAMILIES = (VIDEO_CREATE, IMAGE_CREATE, TASK_QUERY, IDENTIFY_FACE)
+
+# Kling paths that create tasks; each also lists them (GET) and queries one (GET <path>/<task_id>)
+TASK_ENDPOINTS = (
+    "/videos/text2video",
+    "/videos/image2video",
+    "/videos/multi-image2video",
+    "/videos/motion-control",
+    "/videos/video-extend",
+    "/videos/advanced-lip-sync",
+    "/images/generations",
+    "/images/omni-image",
+)
+SUBMIT_ENDPOINTS = TASK_ENDPOINTS + ("/videos/identify-face",)
+OTHER_ROUTE = "other"
+
+
+def endpoint_family(method: str, endpoint: str) -> str:
+    """
+    Maps a request onto its family, e.g. ("POST", "/videos/text2video") -> "video_create".
+    """
+    if method.upper() == "GET":
+        return TASK_QUERY
+    if endpoint.startswith("/videos/identify-face"):
+        return IDENTIFY_FACE
+    if endpoint.startswith("/images/"):
+        return IMAGE_CREATE
+    return VIDEO_CREATE
+
+
+def endpoint_route(method: str, endpoint: str) -> str:
+    """
+    Endpoint as a metric label: a known Kling path with its task ID replaced
+    by a placeholder, e.g. ("GET", "/videos/text2video/abc") ->
+    "/videos/text2video/{task_id}". Anything else (task paths are built from
+    caller input) is "other", so label values stay bounded.
+    """
+    if method.upper() == "GET":
+        if endpoint in TASK_ENDPOINTS:
+            return endpoint
+        base = endpoint.rsplit("/", 1)[0]
+        if base in TASK_ENDPOINTS:
+            return base + "/{task_id}"
+        return OTHER_ROUTE
+    return endpoint if endpoint in SUBMIT_ENDPOINTS else OTHER_ROUTE
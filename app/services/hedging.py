@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from app.services.circuit_breaker import CircuitOpen
+from app.services.config import env_bool, env_float, env_int
+from app.services.rate_limit import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Raised before a request is sent: such attempts never reached Kling
+NOT_SENT = (RateLimitExceeded, CircuitOpen)
+
+
+class Hedger:
+    """
+    Hedged requests for idempotent calls: when the first attempt has not
+    answered within the `percentile` of recent latencies (clamped to
+    [`min_delay`, `max_delay`]), a second one is sent, to the next of
+    `base_urls` or, without any, to the same base URL on another
+    connection. Whichever answers first wins and the other is cancelled.
+
+    Every call earns `budget` of a hedge and every hedge spends a whole
+    one, so hedges never exceed `budget` times the calls made so far.
+    Until `min_samples` latencies are known the delay is `max_delay`.
+    Attempts refused locally (rate limit, open circuit) never reached
+    Kling: they are not observed, and a refused hedge is not counted and
+    gets its token back.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        percentile: Optional[float] = None,
+        min_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        budget: Optional[float] = None,
+        base_urls: Optional[List[str]] = None,
+        samples: Optional[int] = None,
+        min_samples: int = 20,
+    ):
+        self.enabled = enabled if enabled is not None else env_bool("KLING_HEDGE_ENABLED", False)
+        self.percentile = percentile if percentile is not None else env_float("KLING_HEDGE_PERCENTILE", 95.0)
+        self.min_delay = min_delay if min_delay is not None else env_float("KLING_HEDGE_MIN_DELAY", 0.05)
+        self.max_delay = max_delay if max_delay is not None else env_float("KLING_HEDGE_MAX_DELAY", 2.0)
+        self.budget = budget if budget is not None else env_float("KLING_HEDGE_BUDGET", 0.05)
+        self.base_urls = list(base_urls or [])
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=samples if samples is not None
+                                              else env_int("KLING_HEDGE_SAMPLES", 512))
+        # The percentile is recomputed every few observations, not on every call
+        self._delay = self.max_delay
+        self._stale = 0
+        self._tokens = 0.0
+        self._next_url = 0
+
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+        self.hedges_not_sent = 0
+
+    def observe(self, seconds: float):
+        self._latencies.append(seconds)
+        self._stale += 1
+        if self._stale >= 16 and len(self._latencies) >= self.min_samples:
+            self._stale = 0
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+            self._delay = min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def delay(self) -> float:
+        return self._delay
+
+    def _next_base_url(self) -> Optional[str]:
+        if not self.base_urls:
+            return None
+        url = self.base_urls[self._next_url % len(self.base_urls)]
+        self._next_url += 1
+        return url
+
+    async def _timed(self, call: Callable[[], Awaitable[T]]) -> T:
+        # Failed and cancelled attempts are observed too, up to where they ended: keeping only
+        # the winners would drop exactly the slow tail the delay is meant to track. Attempts
+        # refused locally never reached Kling and say nothing about its latency.
+        started = time.perf_counter()
+        try:
+            return await call()
+        except NOT_SENT:
+            started = None
+            raise
+        finally:
+            if started is not None:
+                self.observe(time.perf_counter() - started)
+
+    async def run(self, primary: Callable[[], Awaitable[T]],
+                  hedge: Callable[[Optional[str]], Awaitable[T]]) -> T:
+        """
+        Awaits `primary()`; if it is slower than the hedge delay and the
+        budget allows, also `hedge(base_url)`. The first successful result
+        is returned; when both fail, the primary's error is raised.
+        """
+        if not self.enabled:
+            return await primary()
+        self.calls += 1
+        self._tokens = min(self._tokens + self.budget, 1.0 + self.budget)
+
+        first = asyncio.ensure_future(self._timed(primary))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self._delay)
+            if done:
+                return first.result()
+            if self._tokens < 1.0:
+                self.budget_exhausted += 1
+                return await first
+            # Spent up front so concurrent calls cannot hedge on the same token
+            self._tokens -= 1.0
+            base_url = self._next_base_url()
+            second = asyncio.ensure_future(self._timed(lambda: hedge(base_url)))
+
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    if second in winners and first not in winners:
+                        self.hedge_wins += 1
+                    return (first if first in winners else second).result()
+            if second.exception() is not None:
+                logger.debug(f"Hedged request failed too: {second.exception()!r}")
+            return first.result()
+        finally:
+            # The loser (or both, if our caller was cancelled) is cancelled without waiting for it
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+            if second is not None:
+                if second.done() and not second.cancelled() and isinstance(second.exception(), NOT_SENT):
+                    self._tokens = min(self._tokens + 1.0, 1.0 + self.budget)
+                    self.hedges_not_sent += 1
+                else:
+                    self.hedges += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "delay": self._delay,
+            "samples": len(self._latencies),
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "hedges_not_sent": self.hedges_not_sent,
+            "base_urls": self.base_urls,
+        }
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from app.services.config import env_bool, env_float, env_int
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different request body."""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency-Key {key!r} was already used with a different request body")
+
+
+class _SubmitCancelled(Exception):
+    """Set on a shared submission whose leader was cancelled; followers retry."""
+
+
+def payload_fingerprint(data: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON form of a request payload."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def external_task_id_for(scope: str, idempotency_key: Optional[str]) -> str:
+    """
+    The external_task_id sent to Kling for one logical submission. Derived
+    from an explicit Idempotency-Key, so Kling itself rejects a replay even
+    after our window has passed or the process restarted; random otherwise,
+    so a legitimate resubmission of the same payload later is still accepted.
+    """
+    if idempotency_key:
+        return "idem-" + hashlib.sha256(f"{scope}\n{idempotency_key}".encode("utf-8")).hexdigest()[:32]
+    return "idem-" + uuid.uuid4().hex
+
+
+class IdempotencyCache:
+    """
+    Deduplicates task submissions. Concurrent submissions with the same key
+    share one upstream call, and the result of a successful one is returned
+    again for `window` seconds when the caller asks for it to be
+    remembered. Failures are shared with concurrent waiters but never
+    remembered, so a retry after an error submits again.
+
+    `replay_payloads` (off by default) also remembers submissions keyed by
+    their payload alone; otherwise only an explicit Idempotency-Key is
+    replayed, since repeating a prompt is a normal request for a new,
+    different generation.
+    """
+
+    def __init__(self, window: Optional[float] = None, max_entries: Optional[int] = None,
+                 enabled: Optional[bool] = None, replay_payloads: Optional[bool] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window if window is not None else env_float("KLING_IDEMPOTENCY_WINDOW", 600.0)
+        self.max_entries = max_entries if max_entries is not None else env_int("KLING_IDEMPOTENCY_MAX_ENTRIES", 10_000)
+        self.enabled = enabled if enabled is not None else env_bool("KLING_IDEMPOTENCY_ENABLED", True)
+        self.replay_payloads = replay_payloads if replay_payloads is not None \
+            else env_bool("KLING_IDEMPOTENCY_REPLAY_PAYLOADS", False)
+        self._clock = clock
+        # key -> (payload fingerprint, result, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[str, Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Tuple[str, asyncio.Future]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable, fingerprint: str, explicit: bool) -> Optional[Tuple[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_fingerprint, result, expires_at = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            return None
+        if explicit and stored_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict(key[-1])
+        self._entries.move_to_end(key)
+        return stored_fingerprint, result
+
+    async def run(self, key: Hashable, fingerprint: str, submit: Callable[[], Awaitable[T]],
+                  explicit: bool = False, remember: bool = True) -> T:
+        """
+        Returns the remembered result for `key` or runs `submit` once for all
+        concurrent callers. `explicit` keys come from an Idempotency-Key
+        header; reusing one with another payload raises IdempotencyConflict.
+        Without `remember`, only callers concurrent with the running
+        submission share its result.
+        """
+        if not self.enabled:
+            return await submit()
+
+        while True:
+            cached = self._lookup(key, fingerprint, explicit) if remember else None
+            if cached is not None:
+                self.hits += 1
+                return cached[1]
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            pending_fingerprint, future = pending
+            if explicit and pending_fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict(key[-1])
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _SubmitCancelled:
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result = await submit()
+        except BaseException as e:
+            future.set_exception(_SubmitCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            if remember:
+                self._entries[key] = (fingerprint, result, self._clock() + self.window)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "replay_payloads": self.replay_payloads,
+            "window": self.window,
+            "size": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+        }
+
+
+# Dependency injection helper
+_idempotency_cache: Optional[IdempotencyCache] = None
+
+def get_idempotency_cache() -> IdempotencyCache:
+    global _idempotency_cache
+    if _idempotency_cache is None:
+        _idempotency_cache = IdempotencyCache()
+    return _idempotency_cache
@@ -0,0 +1,54 @@
+import json
+from typing import Any, Type, Union
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from app.services.config import env_bool
+
+try:
+    import orjson
+except ImportError:  # optional dependency; the stdlib encoder is used instead
+    orjson = None
+
+# Off: stdlib json everywhere, and responses go through response_model validation
+FAST_JSON = env_bool("KLING_FAST_JSON", True)
+
+
+def fast_enabled() -> bool:
+    return FAST_JSON and orjson is not None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decodes a JSON document, straight from the bytes when orjson is available."""
+    if fast_enabled():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, as JSONResponse would render it."""
+    if fast_enabled():
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; let the stdlib decide
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_response(model: Type[BaseModel], content: dict) -> Any:
+    """
+    Response for a route declaring `response_model=model` whose content is
+    already plain JSON data of that shape (e.g. decoded from Kling). With
+    KLING_FAST_JSON the dict is rendered as is, skipping FastAPI's
+    validation and serialization round trip; otherwise it is validated into
+    `model` like any other return value.
+    """
+    if FAST_JSON:
+        return FastJSONResponse(content)
+    return model.model_validate(content)
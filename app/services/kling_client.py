@@ -1,8 +1,44 @@
+import asyncio
 import httpx
+import importlib.util
+import logging
 import os
 import time
-import jwt
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from app.services.accounts import QUOTA_ERROR_CODES, Account, AccountPool
+from app.services.circuit_breaker import STATE_VALUES, CircuitBreakers
+from app.services.config import env_bool, env_float, env_int, env_list
+from app.services.endpoints import endpoint_family, endpoint_route
+from app.services.hedging import Hedger
+from app.services.json_codec import loads
+from app.services.media_store import MediaStore, get_media_store
+from app.services.metrics import MetricsRegistry, UpstreamMetrics, get_metrics
+from app.services.rate_limit import Governor
+from app.services.retry import RetryPolicy, request_body
+from app.services.timing import phase, record_phase
+from app.services.token_cache import TokenCache
+from app.services.uploads import StreamingJSONBody
+
+logger = logging.getLogger(__name__)
+
+
+def _api_base_url(url: str) -> str:
+    """Kling base URL with the /v1 prefix our relative endpoints expect."""
+    url = url.rstrip("/")
+    return url if url.endswith("/v1") else f"{url}/v1"
+
+
+def _timeout_from_env(prefix: str, connect: float, read: float, write: float, pool: float) -> httpx.Timeout:
+    """
+    Builds an httpx.Timeout from {prefix}_CONNECT/_READ/_WRITE/_POOL env vars.
+    """
+    return httpx.Timeout(
+        connect=env_float(f"{prefix}_CONNECT", connect),
+        read=env_float(f"{prefix}_READ", read),
+        write=env_float(f"{prefix}_WRITE", write),
+        pool=env_float(f"{prefix}_POOL", pool),
+    )
+
 
 class KlingClient:
     # Default global BASE_URL. 
@@ -12,13 +48,39 @@ class KlingClient:
     # and endpoints are like /v1/videos/text2video.
     DEFAULT_BASE_URL = "https://api.klingai.com"
 
-    def __init__(self, access_key: Optional[str] = None, secret_key: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self, access_key: Optional[str] = None, secret_key: Optional[str] = None, base_url: Optional[str] = None,
+                 *,
+                 token_safety_margin: Optional[int] = None, token_refresh_ahead: Optional[int] = None,
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, http2: Optional[bool] = None,
+                 query_timeout: Optional[httpx.Timeout] = None, create_timeout: Optional[httpx.Timeout] = None,
+                 retry_policy: Optional[RetryPolicy] = None, governor: Optional[Governor] = None,
+                 accounts: Optional[AccountPool] = None, media_store: Optional[MediaStore] = None,
+                 metrics: Optional[MetricsRegistry] = None, breakers: Optional[CircuitBreakers] = None,
+                 hedger: Optional[Hedger] = None):
         self.ak = access_key or os.getenv("KLING_ACCESS_KEY")
         self.sk = secret_key or os.getenv("KLING_SECRET_KEY")
         
         # Fallback to single token if AK/SK not provided (though AK/SK is recommended)
         self.static_token = os.getenv("KLING_AI_API_TOKEN")
 
+        # Signed JWTs are valid for 30 min, so they are cached and refreshed
+        # ahead of expiry instead of being re-signed on every request.
+        token_options = {
+            "ttl": env_int("KLING_TOKEN_TTL", 1800),
+            "safety_margin": token_safety_margin if token_safety_margin is not None
+            else env_int("KLING_TOKEN_SAFETY_MARGIN", 60),
+            "refresh_ahead": token_refresh_ahead if token_refresh_ahead is not None
+            else env_int("KLING_TOKEN_REFRESH_AHEAD", 300),
+        }
+        # Credentials: an explicit pool, explicit AK/SK, or KLING_ACCOUNTS / env AK/SK
+        if accounts is not None:
+            self.accounts = accounts
+        elif access_key and secret_key:
+            self.accounts = AccountPool([Account("default", token_cache=TokenCache(self.ak, self.sk, **token_options))])
+        else:
+            self.accounts = AccountPool.from_env(self.ak, self.sk, self.static_token, **token_options)
+
         # Handle Base URL: ensure no trailing slash, and don't include /v1 yet if we want flexibility
         # But to match existing code logic, let's assume BASE_URL includes /v1 or we append it.
         # However, the user's demo uses `https://api-beijing.klingai.com` as base, and appends `/v1/...`
@@ -42,96 +104,410 @@ class KlingClient:
             "Content-Type": "application/json",
         }
         
+        # Connection pool. Task polls are cheap and frequent while create_* calls
+        # can take long, so both share one pool but get separate timeouts.
+        self.limits = httpx.Limits(
+            max_connections=max_connections if max_connections is not None
+            else env_int("KLING_POOL_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=max_keepalive_connections if max_keepalive_connections is not None
+            else env_int("KLING_POOL_MAX_KEEPALIVE", 20),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None
+            else env_float("KLING_POOL_KEEPALIVE_EXPIRY", 30.0),
+        )
+        self.query_timeout = query_timeout or _timeout_from_env(
+            "KLING_QUERY_TIMEOUT", connect=5.0, read=15.0, write=15.0, pool=5.0
+        )
+        self.create_timeout = create_timeout or _timeout_from_env(
+            "KLING_CREATE_TIMEOUT", connect=5.0, read=120.0, write=60.0, pool=10.0
+        )
+
+        self.http2 = http2 if http2 is not None else env_bool("KLING_HTTP2", False)
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("KLING_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+            self.http2 = False
+
         self.client = httpx.AsyncClient(
             base_url=self.base_url, 
             headers=self.headers, 
-            timeout=120.0
+            timeout=self.create_timeout,
+            limits=self.limits,
+            http2=self.http2,
         )
 
-    def _get_token(self) -> str:
+        # Called as listener(endpoint, data) for every task created through this
+        # client, e.g. to start tracking it in the background poller.
+        self.task_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        # Called as listener(endpoint, data, request_body, account_name) for the
+        # same tasks, for consumers that also need what was submitted and by whom.
+        self.submission_listeners: List[Callable[[str, Dict[str, Any], Dict[str, Any], str], None]] = []
+
+        # Local QPS/concurrency limits per endpoint family, checked before each attempt
+        self.governor = governor or Governor()
+
+        self.retry_policy = retry_policy or RetryPolicy()
+
+        # Fail fast per endpoint family while Kling is erroring or hanging
+        self.breakers = breakers or CircuitBreakers()
+
+        # Hedged task queries (off unless KLING_HEDGE_ENABLED), optionally to other regional base URLs
+        self.hedger = hedger or Hedger(base_urls=[_api_base_url(url) for url in env_list("KLING_HEDGE_BASE_URLS")])
+
+        # Replaces base64 media in submissions with URLs served by this service (when enabled)
+        self.media_store = media_store or get_media_store()
+        # Latency, status/code counts and payload sizes of every attempt (see metric_families)
+        self.metrics = UpstreamMetrics(metrics or get_metrics())
+        self._retries = 0
+        self._give_ups = 0
+
+        # Pool saturation bookkeeping (see pool_stats)
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._saturated_requests = 0
+        self._pool_timeouts = 0
+
+    @property
+    def token_cache(self) -> Optional[TokenCache]:
+        """JWT cache of the primary account (None when using a static token)."""
+        return self.accounts.primary.token_cache
+
+    def _get_token(self, account: Optional[Account] = None) -> str:
         """
-        Generates JWT token dynamically if AK/SK are present.
+        Returns the cached JWT if AK/SK are present.
         Otherwise returns static token.
         """
-        if self.ak and self.sk:
-            headers = {
-                "alg": "HS256",
-                "typ": "JWT"
-            }
-            payload = {
-                "iss": self.ak,
-                "exp": int(time.time()) + 1800,  # 30 min validity
-                "nbf": int(time.time()) - 5      # valid from 5s ago
-            }
-            token = jwt.encode(payload, self.sk, headers=headers)
-            # PyJWT 2.x returns str, but just in case
-            if isinstance(token, bytes):
-                token = token.decode('utf-8')
-            return token
-        return self.static_token or ""
+        return (account or self.accounts.primary).token()
+
+    def token_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the JWT caches, summed and per account."""
+        stats: Dict[str, Any] = {"hits": 0, "misses": 0, "refreshes": 0, "accounts": {}}
+        for account in self.accounts.accounts:
+            if account.token_cache is None:
+                continue
+            account_stats = account.token_cache.stats()
+            stats["accounts"][account.name] = account_stats
+            for key in ("hits", "misses", "refreshes"):
+                stats[key] += account_stats[key]
+        return stats
+
+    def account_stats(self) -> Dict[str, Any]:
+        return self.accounts.snapshot()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Connection pool usage. `saturated_requests` counts requests that had to
+        queue for a free connection; `pool_timeouts` those that gave up waiting.
+        """
+        max_connections = self.limits.max_connections
+        return {
+            "max_connections": max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "http2": self.http2,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "utilization": self._in_flight / max_connections if max_connections else 0.0,
+            "saturated_requests": self._saturated_requests,
+            "pool_timeouts": self._pool_timeouts,
+        }
+
+    def metric_families(self) -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+        """Pool, retry and per-account gauges for /metrics, read at scrape time."""
+        pool = self.pool_stats()
+        accounts = self.accounts.accounts
+        breakers = list(self.breakers.families.items())
+        return [
+            ("kling_upstream_in_flight", "gauge", "Requests to Kling currently in flight.",
+             [({}, pool["in_flight"])]),
+            ("kling_upstream_account_in_flight", "gauge", "Requests to Kling in flight per account.",
+             [({"account": account.name}, account.in_flight) for account in accounts]),
+            ("kling_pool_max_connections", "gauge", "Size of the connection pool to Kling.",
+             [({}, pool["max_connections"] or 0)]),
+            ("kling_pool_utilization", "gauge", "In-flight requests as a share of the connection pool.",
+             [({}, pool["utilization"])]),
+            ("kling_pool_peak_in_flight", "gauge", "Highest number of requests in flight so far.",
+             [({}, pool["peak_in_flight"])]),
+            ("kling_pool_saturated_requests_total", "counter", "Requests that had to queue for a free connection.",
+             [({}, pool["saturated_requests"])]),
+            ("kling_pool_timeouts_total", "counter", "Requests that gave up waiting for a free connection.",
+             [({}, pool["pool_timeouts"])]),
+            ("kling_upstream_retries_total", "counter", "Retried attempts to Kling.",
+             [({}, self._retries)]),
+            ("kling_upstream_give_ups_total", "counter", "Calls to Kling that ran out of attempts or deadline.",
+             [({}, self._give_ups)]),
+            ("kling_hedge_calls_total", "counter", "Task queries eligible for hedging.",
+             [({}, self.hedger.calls)]),
+            ("kling_hedges_total", "counter", "Hedged requests sent.",
+             [({}, self.hedger.hedges)]),
+            ("kling_hedge_wins_total", "counter", "Hedged requests that answered before the original.",
+             [({}, self.hedger.hedge_wins)]),
+            ("kling_hedge_delay_seconds", "gauge", "Current delay before a task query is hedged.",
+             [({}, self.hedger.delay())]),
+            ("kling_circuit_state", "gauge", "Circuit breaker state per family (0 closed, 1 half-open, 2 open).",
+             [({"family": family}, STATE_VALUES[breaker.state]) for family, breaker in breakers]),
+            ("kling_circuit_trips_total", "counter", "Times the circuit of a family opened.",
+             [({"family": family}, breaker.trips) for family, breaker in breakers]),
+            ("kling_circuit_rejected_total", "counter", "Calls failed fast by an open circuit.",
+             [({"family": family}, breaker.rejected) for family, breaker in breakers]),
+        ]
+
+    def retry_stats(self) -> Dict[str, int]:
+        """Number of retried attempts and of calls that ran out of attempts or deadline."""
+        return {"retries": self._retries, "give_ups": self._give_ups}
+
+    def _timeout_for(self, method: str) -> httpx.Timeout:
+        return self.query_timeout if method.upper() == "GET" else self.create_timeout
 
     async def close(self):
         await self.client.aclose()
 
-    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        # Inject Authorization header dynamically for each request to ensure freshness
-        token = self._get_token()
+    async def _request(self, method: str, endpoint: str, deadline: Optional[float] = None,
+                       account: Optional[Account] = None, base_url: Optional[str] = None,
+                       **kwargs) -> Dict[str, Any]:
+        """
+        Sends a request, retrying transient failures according to `retry_policy`.
+        `deadline` (a time.monotonic() instant) bounds both queueing on the
+        local rate limits and retries; past it the call fails fast with
+        RateLimitExceeded instead of waiting. While the circuit of the
+        endpoint family is open, attempts fail fast with CircuitOpen.
+        Submissions are signed by an account picked from the pool unless
+        `account` pins one; queries default to the primary account.
+        `base_url` sends the request to another Kling base URL than the client's.
+        """
+        policy = self.retry_policy
+        retry_deadline = time.monotonic() + policy.deadline
+        if deadline is not None:
+            retry_deadline = min(retry_deadline, deadline)
+        family = endpoint_family(method, endpoint)
+        submission = method.upper() != "GET"
+        pinned = account is not None or not submission
+        if account is None:
+            account = self.accounts.primary if pinned else self.accounts.select()
+        attempt = 0
+        delay = policy.base_delay
+        while True:
+            attempt += 1
+            try:
+                with self.breakers.call(family) as call:
+                    queued = time.perf_counter()
+                    async with self.governor.slot(family, deadline):
+                        record_phase("queue", time.perf_counter() - queued)
+                        call.start()
+                        response = await self._send(method, endpoint, account, base_url, **kwargs)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                quota_error = self._is_quota_error(e)
+                if quota_error:
+                    # Only submissions cool the account down; a throttled query says nothing about create quota
+                    self.accounts.record_quota_error(account, policy.retry_after(e), cooldown=submission)
+                else:
+                    self.accounts.record_failure(account)
+                if quota_error and not pinned and attempt < policy.max_attempts \
+                        and len(self.accounts.accounts) > 1:
+                    # Kling rejected the task before creating it; hand it to another account
+                    self._retries += 1
+                    account = self.accounts.select(exclude=account)
+                    continue
+                if not policy.is_retryable(method, kwargs, e):
+                    raise
+                retry_after = policy.retry_after(e)
+                delay = retry_after if retry_after is not None else policy.backoff(delay)
+                if attempt >= policy.max_attempts or time.monotonic() + delay > retry_deadline:
+                    self._give_ups += 1
+                    logger.warning(f"Giving up on {method} {endpoint} after {attempt} attempt(s): {e!r}")
+                    raise
+                self._retries += 1
+                logger.info(f"Retrying {method} {endpoint} in {delay:.2f}s (attempt {attempt} failed: {e!r})")
+                with phase("retry_wait"):
+                    await asyncio.sleep(delay)
+                continue
+
+            code = response.get("code") if isinstance(response, dict) else None
+            if code in QUOTA_ERROR_CODES:
+                self.accounts.record_quota_error(account, cooldown=submission)
+            else:
+                self.accounts.record_success(account)
+                if submission:
+                    task_data = response.get("data") or {}
+                    if task_data.get("task_id"):
+                        self.accounts.remember_task(task_data["task_id"], account)
+                        self._notify_task_created(endpoint, task_data, request_body(kwargs) or {}, account)
+                    if task_data.get("session_id"):
+                        # Identify-face sessions only exist for the account that created them
+                        self.accounts.remember_session(task_data["session_id"], account)
+            return response
+
+    def _notify_task_created(self, endpoint: str, task_data: Dict[str, Any], request_body: Dict[str, Any],
+                             account: Account):
+        for listener in self.task_listeners:
+            try:
+                listener(endpoint, task_data)
+            except Exception as e:
+                logger.error(f"Task listener failed for {endpoint}: {e!r}")
+        for listener in self.submission_listeners:
+            try:
+                listener(endpoint, task_data, request_body, account.name)
+            except Exception as e:
+                logger.error(f"Submission listener failed for {endpoint}: {e!r}")
+
+    @staticmethod
+    def _is_quota_error(error: Exception) -> bool:
+        if not isinstance(error, httpx.HTTPStatusError):
+            return False
+        if error.response.status_code == 429:
+            return True
+        try:
+            return error.response.json().get("code") in QUOTA_ERROR_CODES
+        except Exception:
+            return False
+
+    async def _send(self, method: str, endpoint: str, account: Account, base_url: Optional[str] = None,
+                    **kwargs) -> Dict[str, Any]:
+        # Inject Authorization header for each request; the token cache keeps it fresh
+        with phase("auth"):
+            token = self._get_token(account)
         if token:
-            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {token}"
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Authorization": f"Bearer {token}"}
         
+        kwargs.setdefault("timeout", self._timeout_for(method))
+
+        max_connections = self.limits.max_connections
+        if max_connections is not None and self._in_flight >= max_connections:
+            self._saturated_requests += 1
+        self._in_flight += 1
+        if self._in_flight > self._peak_in_flight:
+            self._peak_in_flight = self._in_flight
+        account.in_flight += 1
+        route = endpoint_route(method, endpoint)
+        started = time.perf_counter()
         try:
-            response = await self.client.request(method, endpoint, **kwargs)
+            try:
+                url = endpoint if base_url is None else f"{base_url}{endpoint}"
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                elapsed = time.perf_counter() - started
+                self.metrics.latency.observe((method, route), elapsed)
+                record_phase("upstream", elapsed)
+                self.metrics.errors.inc((method, route, type(e).__name__))
+                raise
+            elapsed = time.perf_counter() - started
+            self.metrics.latency.observe((method, route), elapsed)
+            record_phase("upstream", elapsed)
+            request_length = response.request.headers.get("Content-Length")
+            if request_length:
+                self.metrics.request_bytes.observe((method, route), int(request_length))
+            self.metrics.response_bytes.observe((method, route), len(response.content))
+            if response.is_error:
+                self.metrics.responses.inc((method, route, str(response.status_code), ""))
             response.raise_for_status()
-            return response.json()
+            with phase("decode"):
+                data = loads(response.content)
+            code = data.get("code") if isinstance(data, dict) else None
+            self.metrics.responses.inc((method, route, str(response.status_code), "" if code is None else str(code)))
+            return data
+        except httpx.PoolTimeout:
+            self._pool_timeouts += 1
+            raise
         except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401 and account.token_cache is not None:
+                # Force a fresh signature on the next call
+                account.token_cache.invalidate()
             # Re-raise to be handled by routers
             raise e
+        finally:
+            self._in_flight -= 1
+            account.in_flight -= 1
+
+    async def _externalize_media(self, data: Union[Dict[str, Any], StreamingJSONBody]):
+        """Swaps media for media store URLs; a body still carrying uploads stays streaming."""
+        if isinstance(data, StreamingJSONBody):
+            data = await self.media_store.externalize_upload(data)
+            if data.files:
+                return data
+            data = data.payload
+        return await self.media_store.externalize(data)
+
+    async def _post(self, endpoint: str, data: Union[Dict[str, Any], StreamingJSONBody],
+                    deadline: Optional[float] = None, account: Optional[Account] = None) -> Dict[str, Any]:
+        """
+        Submits `data` as JSON; a StreamingJSONBody is streamed with its own length.
+        `account` pins the submission to one account (no failover).
+        """
+        with phase("media"):
+            data = await self._externalize_media(data)
+        if isinstance(data, StreamingJSONBody):
+            return await self._request("POST", endpoint, content=data, headers=data.headers, deadline=deadline,
+                                       account=account)
+        return await self._request("POST", endpoint, json=data, deadline=deadline, account=account)
 
     # --- Video Generation ---
 
-    async def create_text2video(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/text2video", json=data)
+    async def create_text2video(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/text2video", data, deadline)
 
-    async def create_image2video(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/image2video", json=data)
+    async def create_image2video(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/image2video", data, deadline)
 
-    async def create_multi_image2video(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/multi-image2video", json=data)
+    async def create_multi_image2video(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/multi-image2video", data, deadline)
 
-    async def create_motion_control(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/motion-control", json=data)
+    async def create_motion_control(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/motion-control", data, deadline)
 
-    async def extend_video(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/video-extend", json=data)
+    async def extend_video(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/video-extend", data, deadline)
 
     # --- Lip Sync ---
 
-    async def identify_face(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/identify-face", json=data)
+    async def identify_face(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/videos/identify-face", data, deadline)
 
-    async def create_lip_sync_task(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/videos/advanced-lip-sync", json=data)
+    async def create_lip_sync_task(self, data: Union[Dict[str, Any], StreamingJSONBody],
+                                   deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Submitted by the account whose identify-face call created `session_id` (the primary one if unknown)."""
+        fields = data.payload if isinstance(data, StreamingJSONBody) else data
+        session_id = fields.get("session_id")
+        account = (self.accounts.for_session(session_id) if session_id else None) or self.accounts.primary
+        return await self._post("/videos/advanced-lip-sync", data, deadline, account=account)
 
     # --- Image Generation ---
 
-    async def generate_image(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/images/generations", json=data)
+    async def generate_image(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/images/generations", data, deadline)
 
-    async def generate_omni_image(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        return await self._request("POST", "/images/omni-image", json=data)
+    async def generate_omni_image(self, data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        return await self._post("/images/omni-image", data, deadline)
 
     # --- Task Query ---
 
-    async def get_task(self, endpoint_base: str, task_id: str) -> Dict[str, Any]:
+    async def get_task(self, endpoint_base: str, task_id: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Generic method to get task status.
         endpoint_base example: "/videos/text2video"
+        Hedged when enabled (see Hedger); the hedge is a single attempt that
+        fails instead of queueing on the local rate limits.
         """
-        return await self._request("GET", f"{endpoint_base}/{task_id}")
+        endpoint = f"{endpoint_base}/{task_id}"
+        account = self.accounts.known_task_account(task_id)
+        if account is None and len(self.accounts.accounts) > 1 and self.accounts.task_account_lookup is not None:
+            # Not in memory (restart, another worker, evicted): ask the persistent lookup before the primary
+            account = await asyncio.to_thread(self.accounts.lookup_task_account, task_id)
+        account = account or self.accounts.primary
+        return await self.hedger.run(
+            lambda: self._request("GET", endpoint, deadline=deadline, account=account),
+            lambda base_url: self._request(
+                "GET", endpoint, deadline=time.monotonic(), account=account, base_url=base_url
+            ),
+        )
 
-    async def get_task_list(self, endpoint_base: str, page_num: int = 1, page_size: int = 30) -> Dict[str, Any]:
+    async def get_task_list(self, endpoint_base: str, page_num: int = 1, page_size: int = 30,
+                            deadline: Optional[float] = None, account: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lists one page of tasks. Kling lists per account; `account` selects
+        which one by name (default: the primary account).
+        """
         params = {"pageNum": page_num, "pageSize": page_size}
-        return await self._request("GET", endpoint_base, params=params)
+        return await self._request(
+            "GET", endpoint_base, params=params, deadline=deadline,
+            account=self.accounts.by_name[account] if account else None
+        )
 
 # Dependency injection helper
 _kling_client: Optional[KlingClient] = None
@@ -0,0 +1,266 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.services.config import env_int
+from app.services.uploads import StreamingJSONBody, base64_length
+
+DEFAULT_MEDIA_DIR = os.path.join("data", "media")
+
+# Request fields holding base64 media that Kling also accepts as a URL
+MEDIA_FIELDS = ("image", "image_tail", "image_list")
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes -> Content-Type, for serving blobs back to Kling
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+    (b"BM", "image/bmp"),
+)
+
+READ_CHUNK = 1024 * 1024
+
+
+def sniff_content_type(head: bytes) -> str:
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return "application/octet-stream"
+
+
+class MediaStore:
+    """
+    Content-addressed blob directory for request media. A base64 image is
+    decoded, stored under the sha256 of its bytes and replaced by a URL of
+    this service, so a resubmitted image costs Kling one short URL instead
+    of megabytes of base64.
+
+    Blobs are evicted least-recently-used once the directory exceeds
+    `max_bytes`. Disabled unless `public_url` (reachable by Kling) is set.
+    All blocking file work runs in worker threads.
+    """
+
+    def __init__(self, directory: str, public_url: Optional[str] = None, max_bytes: Optional[int] = None,
+                 min_bytes: Optional[int] = None):
+        self.directory = directory
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.max_bytes = max_bytes if max_bytes is not None else env_int("KLING_MEDIA_MAX_BYTES", 2 * 1024 ** 3)
+        # Base64 values shorter than this are sent as they are
+        self.min_bytes = min_bytes if min_bytes is not None else env_int("KLING_MEDIA_MIN_BYTES", 4096)
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()  # digest -> size, oldest use first
+        self._size = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "MediaStore":
+        return cls(os.getenv("KLING_MEDIA_DIR", DEFAULT_MEDIA_DIR), public_url=os.getenv("KLING_MEDIA_PUBLIC_URL"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.public_url is not None
+
+    def url_for(self, digest: str) -> str:
+        return f"{self.public_url}/media/{digest}"
+
+    def path_for(self, digest: str) -> Optional[str]:
+        """Path of a stored blob (marking it recently used), or None."""
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        self._load()
+        with self._lock:
+            if digest not in self._blobs:
+                return None
+            self._blobs.move_to_end(digest)
+        return os.path.join(self.directory, digest)
+
+    # --- Blocking internals (worker threads) ---
+
+    def _load(self):
+        """Rebuilds the LRU order from the directory, oldest mtime first."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.directory):
+                if DIGEST_PATTERN.match(name):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._blobs[name] = size
+                self._size += size
+            self._loaded = True
+
+    def _touch(self, digest: str) -> bool:
+        """Marks a stored blob recently used; False when it is not stored."""
+        with self._lock:
+            if digest not in self._blobs:
+                return False
+            self._blobs.move_to_end(digest)
+            return True
+
+    def _admit(self, digest: str, size: int, temp_path: str) -> bool:
+        """Records a blob written to `temp_path`; returns True when it was already stored."""
+        with self._lock:
+            if digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                os.remove(temp_path)
+                return True
+            os.replace(temp_path, os.path.join(self.directory, digest))
+            self._blobs[digest] = size
+            self._size += size
+            while self._size > self.max_bytes and len(self._blobs) > 1:
+                old_digest, old_size = self._blobs.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, old_digest))
+                except FileNotFoundError:
+                    pass
+            return False
+
+    def _store_bytes(self, data: bytes) -> str:
+        self._load()
+        digest = hashlib.sha256(data).hexdigest()
+        # A blob evicted after the lookup is written again: _admit never records one without its file
+        hit = self._touch(digest)
+        if not hit:
+            temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            hit = self._admit(digest, len(data), temp_path)
+        self._count(hit)
+        return digest
+
+    def _store_file(self, file) -> str:
+        """Copies a binary file object into the store, hashing on the way."""
+        self._load()
+        file.seek(0)
+        sha = hashlib.sha256()
+        size = 0
+        temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, "wb") as out:
+                while True:
+                    chunk = file.read(READ_CHUNK)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        hit = self._admit(sha.hexdigest(), size, temp_path)
+        self._count(hit)
+        return sha.hexdigest()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _externalize_value(self, value: Any) -> Any:
+        if not isinstance(value, str) or len(value) < self.min_bytes or value.startswith(("http://", "https://")):
+            return value
+        try:
+            data = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            return value  # Not base64; let Kling report it
+        url = self.url_for(self._store_bytes(data))
+        with self._lock:
+            self.bytes_saved += len(value) - len(url)
+        return url
+
+    def _externalize(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        swapped = dict(payload)
+        for field in MEDIA_FIELDS:
+            value = payload.get(field)
+            if isinstance(value, list):
+                swapped[field] = [self._externalize_value(item) for item in value]
+            elif value is not None:
+                swapped[field] = self._externalize_value(value)
+        return swapped
+
+    # --- Async API ---
+
+    async def externalize(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a copy of `payload` whose base64 media fields are service URLs."""
+        if not self.enabled or not any(payload.get(field) for field in MEDIA_FIELDS):
+            return payload
+        return await asyncio.to_thread(self._externalize, payload)
+
+    async def store_upload(self, file, size: int) -> str:
+        """Stores an uploaded file (e.g. Starlette UploadFile) and returns its URL."""
+        digest = await asyncio.to_thread(self._store_file, file.file)
+        url = self.url_for(digest)
+        with self._lock:
+            self.bytes_saved += base64_length(size) - len(url)
+        return url
+
+    async def externalize_upload(self, body: StreamingJSONBody) -> StreamingJSONBody:
+        """
+        Swaps the uploaded files of a streaming body's media fields for
+        service URLs; other uploads (e.g. audio) keep streaming as base64.
+        """
+        if not self.enabled:
+            return body
+        payload = dict(body.payload)
+        files = dict(body.files)
+
+        async def swap(value):
+            if isinstance(value, str) and value in files:
+                file, size = files.pop(value)
+                return await self.store_upload(file, size)
+            return value
+
+        for field in MEDIA_FIELDS:
+            value = payload.get(field)
+            if isinstance(value, list):
+                payload[field] = [await swap(item) for item in value]
+            elif value is not None:
+                payload[field] = await swap(value)
+        return StreamingJSONBody(payload, files)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "blobs": len(self._blobs),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+        }
+
+
+# Dependency injection helper
+_media_store: Optional[MediaStore] = None
+
+def get_media_store() -> MediaStore:
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore.from_env()
+    return _media_store
@@ -0,0 +1,213 @@
+import bisect
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans a cached task query up to a slow create call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes; from a task query up to multi-megabyte base64 submissions
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter per label values; name it with a `_total` suffix.
+    Recording is a dict update on the event loop thread, deliberately
+    without a lock.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: Labels, value: float):
+        self._values[labels] = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram per label values. Each series is one preallocated
+    list of per-bucket counts followed by sum and count, so an observation
+    is a bisect and three in-place additions; buckets are made cumulative
+    only when scraped.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # len(buckets) + 1 counts (the last one is +Inf), then sum, then count
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, series in list(self._series.items()):
+            series = list(series)
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                yield self.name + "_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield self.name + "_sum", base, series[-2]
+            yield self.name + "_count", base, series[-1]
+
+
+# Scrape-time metrics: () -> [(name, type, documentation, [(labels, value)])]
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process in the Prometheus text exposition format.
+
+    Hot paths record into counters, gauges and histograms registered here;
+    values other components already keep (pool usage, retry counts) are
+    read by collectors only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Collector] = []
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class UpstreamMetrics:
+    """Metrics recorded by KlingClient for every attempt sent to Kling."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.latency = registry.histogram(
+            "kling_upstream_request_duration_seconds", "Latency of requests to Kling, per attempt.",
+            ("method", "endpoint")
+        )
+        self.responses = registry.counter(
+            "kling_upstream_responses_total", "Responses from Kling by HTTP status and Kling `code` ('' if none).",
+            ("method", "endpoint", "status", "code")
+        )
+        self.errors = registry.counter(
+            "kling_upstream_transport_errors_total", "Requests to Kling that got no response, by error type.",
+            ("method", "endpoint", "error")
+        )
+        self.request_bytes = registry.histogram(
+            "kling_upstream_request_bytes", "Size of request bodies sent to Kling.",
+            ("method", "endpoint"), SIZE_BUCKETS
+        )
+        self.response_bytes = registry.histogram(
+            "kling_upstream_response_bytes", "Size of response bodies received from Kling.",
+            ("method", "endpoint"), SIZE_BUCKETS
+        )
+
+
+class RouteMetrics:
+    """Metrics recorded by the HTTP middleware for requests to this service."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "Latency of requests to this service, per route template.",
+            ("method", "route", "status")
+        )
+        self.in_flight = registry.gauge(
+            "http_requests_in_flight", "Requests to this service currently being handled."
+        )
+
+
+# Dependency injection helper
+_metrics: Optional[MetricsRegistry] = None
+
+def get_metrics() -> MetricsRegistry:
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
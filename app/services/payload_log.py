@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+from app.services.config import env_bool, env_float, env_int
+
+# A long string whose head looks like this is summarized as binary, not truncated text
+_BASE64_HEAD = re.compile(r"^[A-Za-z0-9+/=_-]{64}")
+_HEAD_CHARS = 64
+
+
+def _summarize_string(value: str, max_string: int) -> str:
+    if len(value) <= max_string:
+        return value
+    if value.startswith("data:") or _BASE64_HEAD.match(value[:_HEAD_CHARS]):
+        digest = hashlib.sha256(value.encode("utf-8", "replace")).hexdigest()[:12]
+        return f"<base64 {len(value)} chars sha256:{digest}>"
+    return f"{value[:max_string]}...(+{len(value) - max_string} chars)"
+
+
+def summarize(value: Any, max_string: int = 128, max_items: int = 20, max_depth: int = 6) -> Any:
+    """
+    A copy of a JSON-like value that is safe to log: long strings are cut,
+    base64 media is replaced by its length and a short hash, and lists or
+    objects are capped at `max_items` entries and `max_depth` levels.
+    """
+    if isinstance(value, str):
+        return _summarize_string(value, max_string)
+    if isinstance(value, (dict, list, tuple)) and max_depth <= 0:
+        return f"<{type(value).__name__} of {len(value)}>"
+    if isinstance(value, dict):
+        summary = {}
+        for index, (key, item) in enumerate(value.items()):
+            if index == max_items:
+                summary["..."] = f"+{len(value) - max_items} keys"
+                break
+            summary[str(key)] = summarize(item, max_string, max_items, max_depth - 1)
+        return summary
+    if isinstance(value, (list, tuple)):
+        summary = [summarize(item, max_string, max_items, max_depth - 1) for item in value[:max_items]]
+        if len(value) > max_items:
+            summary.append(f"...+{len(value) - max_items} items")
+        return summary
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _summarize_string(repr(value), max_string)
+
+
+class LazyPayload:
+    """
+    Log argument that summarizes and serializes its payload only when a
+    handler actually formats the record; the output is at most `max_chars`.
+    """
+
+    __slots__ = ("payload", "max_string", "max_items", "max_chars")
+
+    def __init__(self, payload: Any, max_string: int, max_items: int, max_chars: int):
+        self.payload = payload
+        self.max_string = max_string
+        self.max_items = max_items
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = json.dumps(summarize(self.payload, self.max_string, self.max_items),
+                          ensure_ascii=False, default=str, separators=(",", ":"))
+        if len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}...(+{len(text) - self.max_chars} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+class PayloadLogger:
+    """
+    Logs request and response payloads exchanged with Kling.
+
+    Records are formatted lazily (nothing is serialized unless INFO is
+    enabled and a handler emits the record), every payload is summarized
+    to a bounded size, and each event is sampled to at most `rate` lines
+    per second; the number of skipped lines is reported on the next one.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, rate: Optional[float] = None,
+                 max_string: Optional[int] = None, max_items: Optional[int] = None,
+                 max_chars: Optional[int] = None, clock=time.monotonic):
+        self.enabled = enabled if enabled is not None else env_bool("KLING_LOG_PAYLOADS", True)
+        # Lines per second per event; 0 disables sampling
+        self.rate = rate if rate is not None else env_float("KLING_LOG_PAYLOAD_RATE", 10.0)
+        self.max_string = max_string if max_string is not None else env_int("KLING_LOG_MAX_STRING", 128)
+        self.max_items = max_items if max_items is not None else env_int("KLING_LOG_MAX_ITEMS", 20)
+        self.max_chars = max_chars if max_chars is not None else env_int("KLING_LOG_MAX_CHARS", 2048)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}  # event -> [tokens, last refill, suppressed]
+
+        self.logged = 0
+        self.suppressed = 0
+
+    def _admit(self, event: str) -> Optional[int]:
+        """Takes a token for `event`; returns the lines skipped since the last one, or None."""
+        if self.rate <= 0:
+            return 0
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(event)
+            if bucket is None:
+                bucket = self._buckets[event] = [self.rate, now, 0]
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed += 1
+                return None
+            bucket[0] -= 1
+            skipped, bucket[2] = bucket[2], 0
+            return skipped
+
+    def log(self, logger: logging.Logger, event: str, label: Optional[str], payload: Any,
+            level: int = logging.INFO):
+        if not self.enabled or not logger.isEnabledFor(level):
+            return
+        skipped = self._admit(event)
+        if skipped is None:
+            return
+        self.logged += 1
+        lazy = LazyPayload(payload, self.max_string, self.max_items, self.max_chars)
+        if skipped:
+            logger.log(level, "%s (%s): %s [%d similar lines skipped]", event, label, lazy, skipped)
+        else:
+            logger.log(level, "%s (%s): %s", event, label, lazy)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate": self.rate,
+            "max_chars": self.max_chars,
+            "logged": self.logged,
+            "suppressed": self.suppressed,
+        }
+
+
+# Dependency injection helper
+_payload_logger: Optional[PayloadLogger] = None
+
+def get_payload_logger() -> PayloadLogger:
+    global _payload_logger
+    if _payload_logger is None:
+        _payload_logger = PayloadLogger()
+    return _payload_logger
@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.services.config import env_bool, env_float, env_int
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.task_cache import TERMINAL_STATUSES, TaskStatusCache, get_task_cache, task_status_of
+
+logger = logging.getLogger(__name__)
+
+TaskKey = Tuple[str, str, str]
+
+# (max task age in seconds, poll interval): young tasks are polled often,
+# long-running ones progressively less.
+DEFAULT_SCHEDULE = ((30.0, 3.0), (120.0, 5.0), (600.0, 10.0), (1800.0, 20.0))
+
+
+def task_key(endpoint_base: str, task_id: str) -> TaskKey:
+    """("/videos/text2video", "123") -> ("videos", "text2video", "123")"""
+    category, _, task_type = endpoint_base.strip("/").partition("/")
+    return category, task_type, task_id
+
+
+class TrackedTask:
+    __slots__ = ("key", "endpoint_base", "task_id", "registered_at", "status", "failures", "generation")
+
+    def __init__(self, key: TaskKey, endpoint_base: str, task_id: str, status: str, now: float):
+        self.key = key
+        self.endpoint_base = endpoint_base
+        self.task_id = task_id
+        self.registered_at = now
+        self.status = status
+        self.failures = 0
+        self.generation = 0
+
+
+class TaskPoller:
+    """
+    Refreshes every in-flight Kling task from one scheduler loop and writes
+    the results into the shared TaskStatusCache, so API clients read task
+    state from the cache instead of each polling Kling.
+
+    Poll intervals grow with task age, are stretched while a task is still
+    queued (`submitted`), and back off on errors. Tasks leave the poller once
+    they reach succeed/failed, exceed `max_age`, or keep failing.
+    """
+
+    def __init__(self, client: KlingClient, cache: TaskStatusCache,
+                 concurrency: Optional[int] = None, max_tracked: Optional[int] = None,
+                 max_age: Optional[float] = None, max_failures: int = 5,
+                 schedule=DEFAULT_SCHEDULE, max_interval: float = 60.0, submitted_factor: float = 1.5):
+        self.client = client
+        self.cache = cache
+        self.concurrency = concurrency if concurrency is not None else env_int("KLING_POLLER_CONCURRENCY", 10)
+        self.max_tracked = max_tracked if max_tracked is not None else env_int("KLING_POLLER_MAX_TRACKED", 50_000)
+        self.max_age = max_age if max_age is not None else env_float("KLING_POLLER_MAX_AGE", 86_400.0)
+        self.max_failures = max_failures
+        self.schedule = schedule
+        self.max_interval = max_interval
+        self.submitted_factor = submitted_factor
+
+        self._tracked: Dict[TaskKey, TrackedTask] = {}
+        self._keys_by_task_id: Dict[str, TaskKey] = {}
+        self._heap: List[Tuple[float, int, int, TaskKey]] = []
+        self._seq = 0
+        self._running: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.errors = 0
+        self.completed = 0
+        self.dropped = 0
+
+    # --- Registration ---
+
+    def track(self, endpoint_base: str, task_data: Dict[str, Any]):
+        """
+        Starts tracking a task from its create (or query) response `data`.
+        Matches the KlingClient task listener signature.
+        """
+        task_id = task_data.get("task_id")
+        status = task_data.get("task_status") or "submitted"
+        if not task_id or status in TERMINAL_STATUSES:
+            return
+        key = task_key(endpoint_base, task_id)
+        if key in self._tracked:
+            return
+        if len(self._tracked) >= self.max_tracked:
+            self.dropped += 1
+            logger.warning(f"Task poller is tracking {len(self._tracked)} tasks; not tracking {task_id}")
+            return
+        now = time.monotonic()
+        task = TrackedTask(key, endpoint_base, task_id, status, now)
+        self._tracked[key] = task
+        self._keys_by_task_id[task_id] = key
+        self._schedule(task, now + self._interval(task, now))
+
+    def untrack(self, key: TaskKey):
+        if self._tracked.pop(key, None) is not None:
+            self._keys_by_task_id.pop(key[2], None)
+
+    def apply_callback(self, payload: Dict[str, Any]):
+        """
+        CallbackIngestor listener: stores the pushed state of a tracked task
+        in the cache right away and stops polling it once it has finished.
+        """
+        key = self._keys_by_task_id.get(payload.get("task_id"))
+        task = self._tracked.get(key) if key else None
+        if task is None:
+            return
+        data = dict(payload)
+        if "task_status" not in data and "status" in data:
+            data["task_status"] = data["status"]
+        task.status = data.get("task_status") or task.status
+        self.cache.put(key, {"code": 0, "message": "callback", "data": data})
+        if task.status in TERMINAL_STATUSES:
+            self.completed += 1
+            self.untrack(key)
+
+    def is_tracked(self, key: TaskKey) -> bool:
+        return key in self._tracked
+
+    # --- Scheduling ---
+
+    def _interval(self, task: TrackedTask, now: float) -> float:
+        age = now - task.registered_at
+        interval = self.max_interval
+        for max_age, step in self.schedule:
+            if age < max_age:
+                interval = step
+                break
+        if task.status == "submitted":
+            interval *= self.submitted_factor
+        if task.failures:
+            interval *= 2 ** task.failures
+        return min(interval, self.max_interval)
+
+    def _schedule(self, task: TrackedTask, due: float):
+        task.generation += 1
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, task.generation, task.key))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, *self._running, return_exceptions=True)
+            self._loop_task = None
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now and len(self._running) < self.concurrency:
+                _, _, generation, key = heapq.heappop(self._heap)
+                task = self._tracked.get(key)
+                if task is None or task.generation != generation:
+                    continue  # untracked or rescheduled since
+                refresh = asyncio.create_task(self._refresh(task))
+                self._running.add(refresh)
+                refresh.add_done_callback(self._on_refresh_done)
+
+            timeout = None
+            if self._heap and len(self._running) < self.concurrency:
+                timeout = max(0.0, self._heap[0][0] - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_refresh_done(self, refresh: asyncio.Task):
+        self._running.discard(refresh)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _refresh(self, task: TrackedTask):
+        now = time.monotonic()
+        if now - task.registered_at > self.max_age:
+            self.untrack(task.key)
+            return
+        # The next poll is due after this interval, so the refreshed entry stays
+        # fresh until then and API reads are served from the cache meanwhile.
+        ttl = self._interval(task, now) + 1.0
+        try:
+            response = await self.cache.get_or_fetch(
+                task.key,
+                lambda: self.client.get_task(task.endpoint_base, task.task_id),
+                ttl=ttl,
+                force=True,
+            )
+            if response.get("code") != 0:
+                raise RuntimeError(response.get("message", "Unknown error"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            task.failures += 1
+            if task.failures >= self.max_failures:
+                logger.warning(f"Task poller giving up on {task.task_id} after {task.failures} errors: {e}")
+                self.untrack(task.key)
+                return
+            self._schedule(task, time.monotonic() + self._interval(task, time.monotonic()))
+            return
+
+        self.refreshes += 1
+        task.failures = 0
+        task.status = task_status_of(response) or task.status
+        if task.status in TERMINAL_STATUSES:
+            self.completed += 1
+            self.untrack(task.key)
+            return
+        self._schedule(task, time.monotonic() + self._interval(task, time.monotonic()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._loop_task is not None,
+            "tracked": len(self._tracked),
+            "in_flight": len(self._running),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "completed": self.completed,
+            "dropped": self.dropped,
+        }
+
+
+# Dependency injection helper
+_task_poller: Optional[TaskPoller] = None
+
+def get_task_poller() -> TaskPoller:
+    global _task_poller
+    if _task_poller is None:
+        _task_poller = TaskPoller(get_kling_client(), get_task_cache())
+    return _task_poller
+
+
+def poller_enabled() -> bool:
+    return env_bool("KLING_POLLER_ENABLED", True)
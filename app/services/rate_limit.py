@@ -0,0 +1,240 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+from app.services.config import env_float, env_int
+from app.services.endpoints import FAMILIES, IDENTIFY_FACE, IMAGE_CREATE, TASK_QUERY, VIDEO_CREATE
+
+# Defaults per family: (qps, burst, concurrency). 0 disables a limit.
+DEFAULT_LIMITS = {
+    VIDEO_CREATE: (5.0, 10, 20),
+    IMAGE_CREATE: (5.0, 10, 20),
+    TASK_QUERY: (50.0, 100, 50),
+    IDENTIFY_FACE: (2.0, 5, 5),
+}
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a call cannot get a rate or concurrency slot before its deadline.
+    """
+
+    def __init__(self, family: str, retry_after: float):
+        super().__init__(f"Local {family} limit reached, retry in {retry_after:.1f}s")
+        self.family = family
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens/s up to `burst`.
+
+    Reservations may drive the balance negative; the caller then sleeps off
+    its share of the debt, which keeps waiters in FIFO order without a lock.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def configure(self, rate: float, burst: int):
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = min(self._tokens, float(burst))
+
+    def _refill(self) -> float:
+        now = self._clock()
+        if self.rate > 0:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def wait_time(self) -> float:
+        """Seconds until a token would be available, without taking it."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long the caller must wait before using it."""
+        wait = self.wait_time()
+        if self.rate > 0:
+            self._tokens -= 1.0
+        return wait
+
+    def refund(self):
+        """Gives back a reserved token that was never used."""
+        if self.rate > 0:
+            self._refill()
+            self._tokens = min(float(self.burst), self._tokens + 1.0)
+
+
+class ConcurrencyLimiter:
+    """
+    A semaphore whose limit can be changed while waiters are queued.
+    Keeps a moving average of how long slots are held, to tell rejected
+    callers when one is likely to free up.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.hold_time = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _has_room(self) -> bool:
+        return self.limit <= 0 or self.active < self.limit
+
+    async def acquire(self, timeout: Optional[float]):
+        if self._has_room() and not self._waiters:
+            self.active += 1
+            return
+        if timeout is not None and timeout <= 0:
+            raise asyncio.TimeoutError()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def observe_hold(self, seconds: float):
+        self.hold_time = seconds if not self.hold_time else 0.8 * self.hold_time + 0.2 * seconds
+
+    def expected_wait(self) -> float:
+        """Seconds until a newcomer would get a slot, judging by the queue ahead of it."""
+        if self.limit <= 0 or (self._has_room() and not self._waiters):
+            return 0.0
+        return (self.waiting + 1) / self.limit * self.hold_time
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+
+class EndpointLimits:
+    def __init__(self, qps: float, burst: int, concurrency: int):
+        self.bucket = TokenBucket(qps, burst)
+        self.limiter = ConcurrencyLimiter(concurrency)
+        self.rejected = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "qps": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "concurrency": self.limiter.limit,
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class Governor:
+    """
+    Client-side QPS and concurrency limits per endpoint family, so requests
+    queue (or fail fast) locally instead of being rejected by Kling.
+
+    Limits are read from KLING_LIMIT_<FAMILY>_QPS / _BURST / _CONCURRENCY
+    and can be changed at runtime with `configure`.
+    """
+
+    def __init__(self, default_max_wait: Optional[float] = None):
+        self.default_max_wait = default_max_wait if default_max_wait is not None \
+            else env_float("KLING_LIMIT_MAX_WAIT", 30.0)
+        self.families: Dict[str, EndpointLimits] = {}
+        for family in FAMILIES:
+            qps, burst, concurrency = DEFAULT_LIMITS[family]
+            prefix = f"KLING_LIMIT_{family.upper()}"
+            self.families[family] = EndpointLimits(
+                env_float(f"{prefix}_QPS", qps),
+                env_int(f"{prefix}_BURST", burst),
+                env_int(f"{prefix}_CONCURRENCY", concurrency),
+            )
+
+    def configure(self, family: str, qps: Optional[float] = None, burst: Optional[int] = None,
+                  concurrency: Optional[int] = None) -> Dict[str, Any]:
+        limits = self.families[family]
+        if qps is not None or burst is not None:
+            limits.bucket.configure(
+                qps if qps is not None else limits.bucket.rate,
+                burst if burst is not None else limits.bucket.burst,
+            )
+        if concurrency is not None:
+            limits.limiter.set_limit(concurrency)
+        return limits.snapshot()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {family: limits.snapshot() for family, limits in self.families.items()}
+
+    @asynccontextmanager
+    async def slot(self, family: str, deadline: Optional[float] = None):
+        """
+        Holds one rate token and one concurrency slot of `family`.
+        `deadline` is a time.monotonic() instant; a deadline already in the
+        past means "fail fast" instead of queueing.
+        """
+        limits = self.families.get(family)
+        if limits is None:
+            yield
+            return
+
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.default_max_wait
+        budget = deadline - now
+
+        wait = limits.bucket.wait_time()
+        if wait > max(budget, 0.0):
+            limits.rejected += 1
+            raise RateLimitExceeded(family, wait)
+        wait = limits.bucket.reserve()
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await limits.limiter.acquire(deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            # Nothing was sent: the token goes back to whoever comes next
+            limits.bucket.refund()
+            limits.rejected += 1
+            raise RateLimitExceeded(
+                family, max(limits.bucket.wait_time(), limits.limiter.expected_wait())
+            )
+        except asyncio.CancelledError:
+            limits.bucket.refund()
+            raise
+        acquired = time.monotonic()
+        try:
+            yield
+        finally:
+            limits.limiter.release()
+            limits.limiter.observe_hold(time.monotonic() - acquired)
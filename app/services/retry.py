@@ -0,0 +1,96 @@
+import random
+import time
+import httpx
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from app.services.config import env_float, env_int
+
+# Statuses worth another attempt: throttling and transient gateway/server errors
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Transport errors raised before the request reached Kling. Retrying these can
+# never create a duplicate task, so they are safe even for plain POSTs.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parses a Retry-After header (delta-seconds or HTTP-date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+def request_body(request_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The JSON document of a request, whether sent as `json=` or as a streaming body."""
+    body = request_kwargs.get("json")
+    if body is None:
+        body = getattr(request_kwargs.get("content"), "payload", None)
+    return body
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed upstream call is retried and how long to wait.
+
+    GETs are always retried. POSTs create tasks, so they are only retried when
+    the payload carries an `external_task_id` (Kling dedupes on it) or when the
+    request provably never left the client.
+    Waits use decorrelated jitter, are overridden by `Retry-After`, and the
+    whole call, sleeps included, must fit into `deadline` seconds.
+    """
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        deadline: Optional[float] = None,
+        retry_statuses=RETRYABLE_STATUSES,
+        rng: Callable[[float, float], float] = random.uniform,
+    ):
+        self.max_attempts = max_attempts if max_attempts is not None else env_int("KLING_RETRY_MAX_ATTEMPTS", 4)
+        self.base_delay = base_delay if base_delay is not None else env_float("KLING_RETRY_BASE_DELAY", 0.5)
+        self.max_delay = max_delay if max_delay is not None else env_float("KLING_RETRY_MAX_DELAY", 20.0)
+        self.deadline = deadline if deadline is not None else env_float("KLING_RETRY_DEADLINE", 60.0)
+        self.retry_statuses = retry_statuses
+        self._rng = rng
+
+    @staticmethod
+    def is_idempotent(method: str, request_kwargs: Dict[str, Any]) -> bool:
+        if method.upper() == "GET":
+            return True
+        body = request_body(request_kwargs)
+        return isinstance(body, dict) and bool(body.get("external_task_id"))
+
+    def is_retryable(self, method: str, request_kwargs: Dict[str, Any], error: Exception) -> bool:
+        if isinstance(error, NOT_SENT_ERRORS):
+            return True
+        if not self.is_idempotent(method, request_kwargs):
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.retry_statuses
+        return isinstance(error, httpx.TransportError)
+
+    def backoff(self, previous_delay: float) -> float:
+        """Decorrelated jitter: uniform(base, previous * 3), capped at max_delay."""
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, self._rng(self.base_delay, upper))
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        if isinstance(error, httpx.HTTPStatusError):
+            return parse_retry_after(error.response.headers.get("Retry-After"))
+        return None
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from app.services.config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"succeed", "failed"})
+
+
+class _FetchCancelled(Exception):
+    """Set on a shared fetch whose leader was cancelled; followers retry."""
+
+
+def task_status_of(response: Dict[str, Any]) -> Optional[str]:
+    data = response.get("data") if isinstance(response, dict) else None
+    return data.get("task_status") if isinstance(data, dict) else None
+
+
+class TaskStatusCache:
+    """
+    In-process cache of Kling task query responses keyed by
+    (category, task_type, task_id).
+
+    Finished tasks (succeed/failed) never change again and are kept for
+    `terminal_ttl` or until LRU eviction; running tasks only for
+    `active_ttl`. Concurrent misses on one key share a single upstream call.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, active_ttl: Optional[float] = None,
+                 terminal_ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries if max_entries is not None else env_int("KLING_TASK_CACHE_SIZE", 10_000)
+        self.active_ttl = active_ttl if active_ttl is not None else env_float("KLING_TASK_CACHE_ACTIVE_TTL", 2.0)
+        self.terminal_ttl = terminal_ttl if terminal_ttl is not None \
+            else env_float("KLING_TASK_CACHE_TERMINAL_TTL", 86_400.0)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Called as listener(key, response) on every stored response
+        self.listeners: List[Callable[[Hashable, Dict[str, Any]], None]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _ttl_for(self, response: Dict[str, Any]) -> float:
+        return self.terminal_ttl if task_status_of(response) in TERMINAL_STATUSES else self.active_ttl
+
+    def get(self, key: Hashable, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached response for `key`. `allow_stale` also returns an
+        expired (not yet evicted) entry, as the best state known locally.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if allow_stale:
+            return response
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: Hashable, response: Dict[str, Any], ttl: Optional[float] = None):
+        """
+        Stores a successful (code == 0) task query response. `ttl` overrides
+        the status-based TTL of running tasks, e.g. until the poller's next refresh.
+        """
+        if response.get("code") != 0:
+            return
+        if ttl is None or task_status_of(response) in TERMINAL_STATUSES:
+            ttl = self._ttl_for(response)
+        self._entries[key] = (response, self._clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        for listener in self.listeners:
+            try:
+                listener(key, response)
+            except Exception as e:
+                logger.error(f"Task cache listener failed for {key}: {e!r}")
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]],
+                           ttl: Optional[float] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Returns the cached response for `key`, or fetches it, sharing one
+        fetch among concurrent callers. `force` skips the cached entry but
+        still joins a fetch already in flight.
+        """
+        while True:
+            cached = None if force else self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _FetchCancelled:
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await fetch()
+        except BaseException as e:
+            future.set_exception(_FetchCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            # Followers get the response even if storing it goes wrong
+            future.set_result(response)
+            self.put(key, response, ttl)
+            return response
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Dependency injection helper
+_task_cache: Optional[TaskStatusCache] = None
+
+def get_task_cache() -> TaskStatusCache:
+    global _task_cache
+    if _task_cache is None:
+        _task_cache = TaskStatusCache()
+    return _task_cache
@@ -0,0 +1,210 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+from app.services.config import env_int
+from app.services.task_cache import TERMINAL_STATUSES
+
+
+class TaskEvent:
+    """
+    One task status transition. Shared by every subscriber; the wire
+    encodings are built once, on first use.
+    """
+    __slots__ = ("task_id", "status", "data", "_json", "_sse")
+
+    def __init__(self, task_id: str, status: str, data: Dict[str, Any]):
+        self.task_id = task_id
+        self.status = status
+        self.data = data
+        self._json: Optional[str] = None
+        self._sse: Optional[bytes] = None
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(
+                {"task_id": self.task_id, "task_status": self.status, "data": self.data},
+                ensure_ascii=False, separators=(",", ":")
+            )
+        return self._json
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = f"id: {self.task_id}:{self.status}\nevent: task\ndata: {self.json}\n\n".encode("utf-8")
+        return self._sse
+
+
+class Subscription:
+    """
+    Pending events of one connection. Events are coalesced per task, so a
+    slow reader only ever holds the latest state of each task and never
+    slows down the publisher or other subscribers.
+    """
+
+    def __init__(self, task_ids: Optional[Set[str]], max_pending: int):
+        self.task_ids = task_ids
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, TaskEvent]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+        self.lagged = 0
+
+    def push(self, event: TaskEvent):
+        if event.task_id in self._pending:
+            self.coalesced += 1
+        self._pending[event.task_id] = event
+        self._pending.move_to_end(event.task_id)
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+            self.lagged += 1
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float]) -> List[TaskEvent]:
+        """Waits for pending events; returns [] when `timeout` passes first (heartbeat)."""
+        if not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class TaskEventHub:
+    """
+    Fans task status transitions out to streaming subscribers (SSE and
+    WebSocket). Fed by the task status cache (API polls and the background
+    poller) and by callbacks; repeated reports of an unchanged status are
+    dropped here so only transitions reach subscribers.
+    """
+
+    def __init__(self, max_pending: Optional[int] = None, history_size: int = 10_000):
+        self.max_pending = max_pending if max_pending is not None else env_int("KLING_EVENTS_MAX_PENDING", 1000)
+        self.history_size = history_size
+        self._by_task: Dict[str, Set[Subscription]] = {}
+        self._all: Set[Subscription] = set()
+        self._last: "OrderedDict[str, TaskEvent]" = OrderedDict()
+        # Long-poll waiters per task, resolved by the terminal transition
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self.published = 0
+
+    def subscribe(self, task_ids: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Subscribes to the given tasks (all tasks when None). The last known
+        state of each requested task is delivered right away.
+        """
+        ids = set(task_ids) if task_ids else None
+        sub = Subscription(ids, self.max_pending)
+        if ids is None:
+            self._all.add(sub)
+        else:
+            for task_id in ids:
+                self._by_task.setdefault(task_id, set()).add(sub)
+                last = self._last.get(task_id)
+                if last is not None:
+                    sub.push(last)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._all.discard(sub)
+        for task_id in sub.task_ids or ():
+            subs = self._by_task.get(task_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_task[task_id]
+
+    def last_event(self, task_id: str) -> Optional[TaskEvent]:
+        return self._last.get(task_id)
+
+    async def wait_for_terminal(self, task_id: str, timeout: Optional[float]) -> Optional[TaskEvent]:
+        """
+        Parks until `task_id` reaches succeed/failed and returns that event,
+        or returns None after `timeout`. A waiter is only a future; nothing
+        polls upstream on its behalf.
+        """
+        last = self._last.get(task_id)
+        if last is not None and last.terminal:
+            return last
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                try:
+                    waiters.remove(waiter)
+                except ValueError:
+                    pass
+                if not waiters:
+                    del self._waiters[task_id]
+
+    def publish(self, task_id: str, data: Dict[str, Any]) -> Optional[TaskEvent]:
+        status = data.get("task_status") or data.get("status") or "unknown"
+        last = self._last.get(task_id)
+        if last is not None and last.status == status:
+            return None
+        event = TaskEvent(task_id, status, data)
+        self._last[task_id] = event
+        self._last.move_to_end(task_id)
+        while len(self._last) > self.history_size:
+            self._last.popitem(last=False)
+
+        self.published += 1
+        for sub in self._by_task.get(task_id, ()):
+            sub.push(event)
+        for sub in self._all:
+            sub.push(event)
+        if event.terminal:
+            for waiter in self._waiters.pop(task_id, ()):
+                if not waiter.done():
+                    waiter.set_result(event)
+        return event
+
+    # --- Source adapters ---
+
+    def publish_response(self, key, response: Dict[str, Any]):
+        """TaskStatusCache listener: (key, Kling task query response)."""
+        data = response.get("data")
+        if isinstance(data, dict) and data.get("task_id"):
+            self.publish(data["task_id"], data)
+
+    def publish_callback(self, payload: Dict[str, Any]):
+        """CallbackIngestor listener: raw callback payload."""
+        if payload.get("task_id"):
+            if "task_status" not in payload and "status" in payload:
+                payload = {**payload, "task_status": payload["status"]}
+            self.publish(payload["task_id"], payload)
+
+    def stats(self) -> Dict[str, Any]:
+        subs = set(self._all)
+        for task_subs in self._by_task.values():
+            subs.update(task_subs)
+        return {
+            "subscribers": len(subs),
+            "watched_tasks": len(self._by_task),
+            "waiters": sum(len(waiters) for waiters in self._waiters.values()),
+            "published": self.published,
+            "lagged": sum(sub.lagged for sub in subs),
+        }
+
+
+# Dependency injection helper
+_task_event_hub: Optional[TaskEventHub] = None
+
+def get_task_event_hub() -> TaskEventHub:
+    global _task_event_hub
+    if _task_event_hub is None:
+        _task_event_hub = TaskEventHub()
+    return _task_event_hub
@@ -0,0 +1,375 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from app.services.config import env_int
+from app.services.endpoints import endpoint_family
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_INDEX_DB = os.path.join("data", "tasks.db")
+
+# Fields with a secondary index
+INDEXED_FIELDS = ("status", "model_name", "mode", "family", "endpoint", "account")
+
+# Sort key of the created-time index: newest first is (created_at, task_id) descending
+SortKey = Tuple[int, str]
+
+
+class IndexedTask:
+    __slots__ = ("task_id", "endpoint", "family", "status", "model_name", "mode", "account",
+                 "created_at", "updated_at", "data")
+
+    def __init__(self, task_id: str, created_at: int):
+        self.task_id = task_id
+        self.created_at = created_at
+        self.updated_at = created_at
+        self.endpoint: Optional[str] = None
+        self.family: Optional[str] = None
+        self.status: Optional[str] = None
+        self.model_name: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.account: Optional[str] = None
+        self.data: Dict[str, Any] = {}
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "IndexedTask":
+        """Builds a task from a row of COLUMNS."""
+        task = cls.__new__(cls)
+        for field, value in zip(cls.__slots__, row):
+            setattr(task, field, value)
+        task.data = json.loads(task.data)
+        return task
+
+    def row(self) -> Tuple:
+        return tuple(json.dumps(self.data, ensure_ascii=False) if field == "data" else getattr(self, field)
+                     for field in self.__slots__)
+
+    @property
+    def sort_key(self) -> SortKey:
+        return self.created_at, self.task_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+COLUMNS = ", ".join(IndexedTask.__slots__)
+PLACEHOLDERS = ", ".join("?" for _ in IndexedTask.__slots__)
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(f"{key[0]}:{key[1]}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """Raises ValueError for cursors this index did not produce."""
+    try:
+        created_at, _, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition(":")
+        return int(created_at), task_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class TaskIndex:
+    """
+    SQLite (WAL mode) index of the tasks this service has seen, so listings
+    can be filtered locally instead of paging through Kling, and survive a
+    restart.
+
+    One row per task_id, with an index on (created_at, task_id) for time
+    ranges and cursor pagination and one on (field, created_at, task_id)
+    per INDEXED_FIELDS entry, so a filtered page is read newest-first
+    straight from an index. Fed by submissions, task query results and
+    callbacks; the oldest tasks are dropped beyond `max_entries`.
+
+    The listeners only enqueue (never touch the disk): a single writer
+    drains the bounded queue into SQLite in batches, off the event loop,
+    and updates are shed once it is full. The other methods are blocking.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 queue_size: Optional[int] = None, batch_size: Optional[int] = None):
+        self.path = path if path is not None else os.getenv("KLING_TASK_INDEX_DB", DEFAULT_TASK_INDEX_DB)
+        self.max_entries = max_entries if max_entries is not None else env_int("KLING_TASK_INDEX_SIZE", 100_000)
+        self.queue_size = queue_size if queue_size is not None \
+            else env_int("KLING_TASK_INDEX_QUEUE_SIZE", 10_000)
+        self.batch_size = batch_size if batch_size is not None else env_int("KLING_TASK_INDEX_BATCH_SIZE", 500)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._size = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+        self.updates = 0
+        self.evictions = 0
+        self.dropped = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def open(self):
+        with self._lock:
+            if self._conn is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    endpoint TEXT,
+                    family TEXT,
+                    status TEXT,
+                    model_name TEXT,
+                    mode TEXT,
+                    account TEXT,
+                    created_at INTEGER NOT NULL,
+                    updated_at INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_created ON tasks (created_at, task_id)")
+            for field in INDEXED_FIELDS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS tasks_by_{field} ON tasks ({field}, created_at, task_id)")
+            conn.commit()
+            self._size = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        self.open()
+        return self._size
+
+    def _get(self, task_id: str) -> Optional[IndexedTask]:
+        row = self._conn.execute(f"SELECT {COLUMNS} FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return IndexedTask.from_row(row) if row is not None else None
+
+    def get(self, task_id: str) -> Optional[IndexedTask]:
+        self.open()
+        with self._lock:
+            return self._get(task_id)
+
+    def account_of(self, task_id: str) -> Optional[str]:
+        """Name of the account that submitted `task_id`, if indexed (AccountPool.task_account_lookup)."""
+        self.open()
+        with self._lock:
+            row = self._conn.execute("SELECT account FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    # --- Background writer ---
+
+    def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    async def join(self):
+        """Waits until everything queued so far has been written."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self):
+        """Writes everything still queued, then stops the writer and closes the database."""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await asyncio.to_thread(self.close)
+
+    def submit(self, task_id: str, data: Optional[Dict[str, Any]] = None, endpoint: Optional[str] = None,
+               model_name: Optional[str] = None, mode: Optional[str] = None,
+               account: Optional[str] = None) -> bool:
+        """
+        Queues an `upsert` for the writer. Returns False when the queue is
+        full; the update is dropped, later ones for the task still apply.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((task_id, data, endpoint, model_name, mode, account))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self.write_batch, batch)
+                self.batches += 1
+            except Exception as e:
+                # Derived data: the next update of each task brings it back in step
+                self.write_errors += 1
+                logger.error(f"Failed to index {len(batch)} task updates: {e!r}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # --- Writes (blocking) ---
+
+    def _merge(self, task_id: str, data: Optional[Dict[str, Any]], endpoint: Optional[str],
+               model_name: Optional[str], mode: Optional[str], account: Optional[str]) -> IndexedTask:
+        data = data or {}
+        task = self._get(task_id)
+        created = task is None
+        if created:
+            created_at = data.get("created_at")
+            task = IndexedTask(task_id, created_at if isinstance(created_at, int) else _now_ms())
+        if endpoint:
+            task.endpoint = endpoint
+            task.family = endpoint_family("POST", endpoint)
+        for field, value in (("status", data.get("task_status")), ("model_name", model_name),
+                             ("mode", mode), ("account", account)):
+            if value is not None:
+                setattr(task, field, value)
+        if data:
+            task.data = {**task.data, **data}
+            updated_at = data.get("updated_at")
+            task.updated_at = updated_at if isinstance(updated_at, int) else _now_ms()
+        self._conn.execute(f"INSERT OR REPLACE INTO tasks ({COLUMNS}) VALUES ({PLACEHOLDERS})", task.row())
+        self._size += created
+        self.updates += 1
+        return task
+
+    def write_batch(self, updates: List[Tuple]) -> List[IndexedTask]:
+        """
+        Applies (task_id, data, endpoint, model_name, mode, account) updates
+        in one transaction, then evicts beyond `max_entries`.
+        """
+        self.open()
+        with self._lock:
+            with self._conn:
+                tasks = [self._merge(*update) for update in updates]
+                if self._size > self.max_entries:
+                    self._evict_oldest(self._size - self.max_entries)
+            return tasks
+
+    def upsert(self, task_id: str, data: Optional[Dict[str, Any]] = None, endpoint: Optional[str] = None,
+               model_name: Optional[str] = None, mode: Optional[str] = None,
+               account: Optional[str] = None) -> IndexedTask:
+        """
+        Merges what is known about a task, right away. Fields left as None
+        keep their indexed value, so partial sources (e.g. callbacks) never
+        erase details.
+        """
+        return self.write_batch([(task_id, data, endpoint, model_name, mode, account)])[0]
+
+    def _evict_oldest(self, count: int):
+        # Walks the created-time index from its oldest end, so eviction costs O(log n) per task
+        deleted = self._conn.execute(
+            "DELETE FROM tasks WHERE task_id IN "
+            "(SELECT task_id FROM tasks ORDER BY created_at, task_id LIMIT ?)",
+            (count,)
+        ).rowcount
+        self._size -= deleted
+        self.evictions += deleted
+
+    # --- Source adapters (listeners: they only enqueue) ---
+
+    def record_submission(self, endpoint: str, data: Dict[str, Any], request_body: Dict[str, Any], account: str):
+        """KlingClient submission listener."""
+        self.submit(
+            data["task_id"], data, endpoint=endpoint,
+            model_name=request_body.get("model_name"), mode=request_body.get("mode"), account=account
+        )
+
+    def record_response(self, key: Hashable, response: Dict[str, Any]):
+        """TaskStatusCache listener: key is (category, task_type, task_id)."""
+        data = response.get("data")
+        if isinstance(data, dict) and data.get("task_id"):
+            category, task_type, _ = key
+            self.submit(data["task_id"], data, endpoint=f"/{category}/{task_type}")
+
+    def record_callback(self, payload: Dict[str, Any]):
+        """CallbackIngestor listener."""
+        if payload.get("task_id"):
+            if "task_status" not in payload and "status" in payload:
+                payload = {**payload, "task_status": payload["status"]}
+            self.submit(payload["task_id"], payload)
+
+    # --- Queries ---
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, created_after: Optional[int] = None,
+              created_before: Optional[int] = None, limit: int = 50,
+              cursor: Optional[str] = None) -> Tuple[List[IndexedTask], Optional[str]]:
+        """
+        Returns up to `limit` tasks matching every filter (field -> value),
+        newest first, plus the cursor of the next page (None on the last).
+        `created_after` is inclusive and `created_before` exclusive, in ms.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {', '.join(sorted(unknown))}")
+
+        # Field names come from INDEXED_FIELDS only; values are bound
+        clauses = [f"{field} = ?" for field in filters]
+        params: List[Any] = list(filters.values())
+        if cursor is not None:
+            clauses.append("(created_at, task_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        if created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if created_after is not None:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        params.append(limit + 1)
+
+        self.open()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM tasks {where}ORDER BY created_at DESC, task_id DESC LIMIT ?", params
+            ).fetchall()
+        page = [IndexedTask.from_row(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(page[-1].sort_key) if len(rows) > limit else None
+        return page, next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        self.open()
+        with self._lock:
+            by_status = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE status IS NOT NULL GROUP BY status"
+            ).fetchall())
+        return {
+            "path": self.path,
+            "size": self._size,
+            "max_entries": self.max_entries,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "by_status": by_status,
+        }
+
+
+# Dependency injection helper
+_task_index: Optional[TaskIndex] = None
+
+def get_task_index() -> TaskIndex:
+    global _task_index
+    if _task_index is None:
+        _task_index = TaskIndex()
+    return _task_index
@@ -0,0 +1,98 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Optional, Tuple
+from app.services.config import env_int
+from app.services.endpoints import TASK_ENDPOINTS
+from app.services.kling_client import KlingClient
+
+# Task types that Kling can list, as `endpoint_base` paths
+LISTABLE_ENDPOINTS = TASK_ENDPOINTS
+
+# Kling accepts pageSize 1..500 and pageNum 1..1000
+MAX_PAGE_SIZE = 500
+MAX_PAGES = 1000
+
+
+class TaskListError(Exception):
+    """Kling answered a listing request with a non-zero business code."""
+
+    def __init__(self, endpoint_base: str, page_num: int, message: str):
+        self.endpoint_base = endpoint_base
+        self.page_num = page_num
+        super().__init__(f"Listing {endpoint_base} page {page_num} failed: {message}")
+
+
+async def iter_task_list(client: KlingClient, endpoint_base: str, page_size: Optional[int] = None,
+                         prefetch: Optional[int] = None, account: Optional[str] = None,
+                         max_pages: int = MAX_PAGES) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields every task of one listing, in Kling's order, page by page.
+
+    Up to `prefetch` pages are requested ahead of the one being consumed,
+    so at most prefetch * page_size tasks are held in memory. The listing
+    ends at the first short page; pages requested beyond it are cancelled,
+    as are all outstanding requests when the consumer stops iterating.
+    """
+    page_size = min(page_size or env_int("KLING_TASK_LIST_PAGE_SIZE", MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    prefetch = max(1, prefetch or env_int("KLING_TASK_LIST_PREFETCH", 4))
+    pending: Deque[Tuple[int, asyncio.Task]] = deque()
+    next_page = 1
+
+    try:
+        while True:
+            while len(pending) < prefetch and next_page <= max_pages:
+                fetch = client.get_task_list(endpoint_base, page_num=next_page, page_size=page_size, account=account)
+                pending.append((next_page, asyncio.ensure_future(fetch)))
+                next_page += 1
+            if not pending:
+                return
+
+            page_num, fetch = pending.popleft()
+            response = await fetch
+            if response.get("code") != 0:
+                raise TaskListError(endpoint_base, page_num, response.get("message", "Unknown error"))
+            tasks = response.get("data") or []
+            for task in tasks:
+                yield task
+            if len(tasks) < page_size:
+                return
+    finally:
+        for _, fetch in pending:
+            fetch.cancel()
+        await asyncio.gather(*(fetch for _, fetch in pending), return_exceptions=True)
+
+
+async def merge_task_lists(client: KlingClient, endpoint_bases: Iterable[str], buffer: int = 1000,
+                           **options) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Walks several listings concurrently and yields (endpoint_base, task) in
+    arrival order. A failing listing yields (endpoint_base, exception) once
+    and stops; the others carry on. `buffer` bounds the tasks held between
+    the listings and a slow consumer.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+    done = object()
+
+    async def drain(endpoint_base: str):
+        try:
+            async for task in iter_task_list(client, endpoint_base, **options):
+                await queue.put((endpoint_base, task))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((endpoint_base, e))
+        await queue.put((endpoint_base, done))
+
+    producers = [asyncio.ensure_future(drain(endpoint_base)) for endpoint_base in endpoint_bases]
+    try:
+        remaining = len(producers)
+        while remaining:
+            endpoint_base, item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield endpoint_base, item
+    finally:
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
@@ -0,0 +1,84 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional
+
+# Order of the phases in Server-Timing; unknown phases follow
+PHASE_ORDER = ("read", "validate", "endpoint", "media", "queue", "auth", "upstream", "decode",
+               "retry_wait", "serialize")
+
+
+class RequestTiming:
+    """
+    Time spent per phase while handling one request, in seconds.
+    Concurrent work started by the request (e.g. batch items) shares the
+    object, so its phases add up and may exceed the wall-clock total.
+    """
+
+    __slots__ = ("started", "phases", "endpoint_started", "endpoint_finished", "token")
+
+    def __init__(self):
+        self.token = None
+        self.started = perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def ordered(self) -> Dict[str, float]:
+        known = {name: self.phases[name] for name in PHASE_ORDER if name in self.phases}
+        return {**known, **{name: seconds for name, seconds in self.phases.items() if name not in known}}
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.ordered().items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+def start_timing() -> RequestTiming:
+    """Starts timing the request being handled in the current context."""
+    timing = RequestTiming()
+    timing.token = _current.set(timing)
+    return timing
+
+
+def finish_timing(timing: RequestTiming):
+    _current.reset(timing.token)
+
+
+def record_phase(name: str, seconds: float):
+    timing = _current.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+class phase:
+    """
+    `with phase("auth"): ...` adds the block's duration to the current
+    request's timing; a no-op outside of a request (e.g. background tasks).
+    """
+
+    __slots__ = ("name", "timing", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timing = _current.get()
+        if self.timing is not None:
+            self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timing is not None:
+            self.timing.add(self.name, perf_counter() - self.started)
+        return False
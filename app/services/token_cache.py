@@ -0,0 +1,109 @@
+import asyncio
+import time
+import jwt
+from typing import Callable, Dict, Optional, Tuple
+
+
+class TokenCache:
+    """
+    Caches the HS256 JWT signed from an AK/SK pair.
+
+    A token is reused until `safety_margin` seconds before its `exp`, so a
+    request never goes out with a token that could expire in flight.
+    Once a token enters the `refresh_ahead` window, a replacement is minted
+    in a worker thread while the current one keeps being served.
+    """
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        ttl: int = 1800,
+        safety_margin: int = 60,
+        refresh_ahead: int = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        if safety_margin >= ttl:
+            raise ValueError("safety_margin must be smaller than ttl")
+        self.ak = access_key
+        self.sk = secret_key
+        self.ttl = ttl
+        self.safety_margin = safety_margin
+        self.refresh_ahead = max(refresh_ahead, safety_margin)
+        self._clock = clock
+        # (token, exp) is swapped as one tuple so readers never see a token
+        # paired with the wrong expiry, even when a refresh thread lands.
+        self._current: Optional[Tuple[str, int]] = None
+        self._refresh_task: Optional[asyncio.Future] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _mint(self) -> Tuple[str, int]:
+        now = int(self._clock())
+        exp = now + self.ttl
+        headers = {
+            "alg": "HS256",
+            "typ": "JWT"
+        }
+        payload = {
+            "iss": self.ak,
+            "exp": exp,
+            "nbf": now - 5      # valid from 5s ago
+        }
+        token = jwt.encode(payload, self.sk, headers=headers)
+        # PyJWT 2.x returns str, but just in case
+        if isinstance(token, bytes):
+            token = token.decode('utf-8')
+        return token, exp
+
+    def get(self) -> str:
+        """
+        Returns a token that stays valid for at least `safety_margin` seconds.
+        Only signs synchronously on a cold cache or when the background
+        refresh did not land in time.
+        """
+        now = self._clock()
+        current = self._current
+        if current is not None and now < current[1] - self.safety_margin:
+            self.hits += 1
+            if now >= current[1] - self.refresh_ahead:
+                self._schedule_refresh()
+            return current[0]
+
+        self.misses += 1
+        self._current = self._mint()
+        return self._current[0]
+
+    def _schedule_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (sync caller): the next miss signs inline instead.
+            return
+        self._refresh_task = loop.run_in_executor(None, self._mint)
+        self._refresh_task.add_done_callback(self._on_refreshed)
+
+    def _on_refreshed(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        token, exp = future.result()
+        if self._current is None or exp > self._current[1]:
+            self._current = (token, exp)
+            self.refreshes += 1
+
+    def invalidate(self):
+        """Drops the cached token, e.g. after the upstream rejected it."""
+        self._current = None
+
+    def stats(self) -> Dict[str, int]:
+        current = self._current
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "expires_in": max(0, int(current[1] - self._clock())) if current else 0,
+        }
@@ -0,0 +1,125 @@
+import base64
+import json
+import re
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+
+# Request fields that may be sent as file parts instead of base64 strings
+UPLOAD_FIELDS = frozenset({"image", "image_tail", "image_list", "sound_file"})
+
+# Read size while encoding; a multiple of 3 so chunks encode independently
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+def base64_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+async def iter_base64(file, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Base64 of a file, chunk by chunk, from its start. `file` is anything
+    with async read(n) and seek(offset), such as Starlette's UploadFile.
+    """
+    await file.seek(0)
+    carry = b""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if carry:
+            chunk = carry + chunk
+        cut = len(chunk) - len(chunk) % 3
+        carry = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if carry:
+        yield base64.b64encode(carry)
+
+
+async def file_size(file) -> int:
+    size = getattr(file, "size", None)
+    if size is None:
+        # UploadFile.seek() only takes an offset; measure the underlying file
+        size = file.file.seek(0, 2)
+    return size
+
+
+class StreamingJSONBody:
+    """
+    A JSON request body whose file fields are base64-encoded while it is
+    sent, so a file is never held in memory as bytes or as a string.
+
+    `payload` is the document with a placeholder token in place of each
+    file; it is serialized once and split around the tokens. Iterating the
+    body again (e.g. on a retry) re-reads the files from their start, and
+    the exact length is known up front for the Content-Length header.
+    """
+
+    def __init__(self, payload: Dict[str, Any], files: Dict[str, Tuple[Any, int]]):
+        self.payload = payload
+        self.files = files
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        self._segments: List[Union[bytes, Tuple[Any, int]]] = []
+        position = 0
+        if files:
+            for match in re.finditer("|".join(re.escape(token) for token in files), text):
+                self._segments.append(text[position:match.start()].encode("utf-8"))
+                self._segments.append(files[match.group()])
+                position = match.end()
+        self._segments.append(text[position:].encode("utf-8"))
+        self.content_length = sum(
+            len(segment) if isinstance(segment, bytes) else base64_length(segment[1])
+            for segment in self._segments
+        )
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json", "Content-Length": str(self.content_length)}
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                async for chunk in iter_base64(segment[0]):
+                    yield chunk
+
+
+def _place(document: Dict[str, Any], path: str, value: str):
+    """
+    Stores `value` at a dotted path such as "image", "image_list" (appended)
+    or "face_choose.0.sound_file". Raises ValueError for paths that do not
+    end in an upload field or do not exist in the document.
+    """
+    parts = path.split(".")
+    if parts[-1] not in UPLOAD_FIELDS:
+        raise ValueError(f"{path!r} does not accept a file upload")
+    target: Any = document
+    for part in parts[:-1]:
+        try:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError(f"{path!r} does not match the request fields")
+    if not isinstance(target, dict):
+        raise ValueError(f"{path!r} does not match the request fields")
+    name = parts[-1]
+    if name == "image_list":
+        target.setdefault(name, []).append(value)
+    else:
+        target[name] = value
+
+
+async def build_upload(fields: Dict[str, Any],
+                       files: List[Tuple[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Tuple[Any, int]]]:
+    """
+    Merges uploaded files into the request fields as placeholder tokens.
+    Returns the fields to validate and {token: (file, size)} for
+    StreamingJSONBody.
+    """
+    tokens: Dict[str, Tuple[Any, int]] = {}
+    for path, file in files:
+        token = f"@upload:{uuid.uuid4().hex}"
+        _place(fields, path, token)
+        tokens[token] = (file, await file_size(file))
+    return fields, tokens
+
@@ -0,0 +1,122 @@
+"""
+Per-request cost of the JSON path, with and without KLING_FAST_JSON.
+
+Serves a large succeeded task through GET /api/v1/tasks/{category}/{type}/{id}
+(upstream decode + response rendering) and a full page of
+GET /api/v1/tasks (local index, response rendering only) in-process, and
+prints the mean time per request for each mode.
+
+    python benchmarks/bench_json.py [--requests 300] [--results 200]
+"""
+import os
+import sys
+import time
+import json
+import logging
+import argparse
+import httpx
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services import json_codec
+from app.services.downloader import ResultDownloader, get_result_downloader
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.task_cache import get_task_cache
+from app.services.task_index import TaskIndex, get_task_index
+
+
+def make_task(task_id: str, results: int) -> dict:
+    return {
+        "task_id": task_id,
+        "task_status": "succeed",
+        "task_status_msg": "",
+        "created_at": 1722769557708,
+        "updated_at": 1722769600000,
+        "task_info": {"external_task_id": f"idem-{task_id}"},
+        "task_result": {
+            "images": [
+                {"index": i, "url": f"https://cdn.klingai.test/bs2/upload-kling-api/{task_id}/{i:04d}.png"}
+                for i in range(results)
+            ],
+            "videos": [
+                {"id": f"{task_id}-{i}", "url": f"https://cdn.klingai.test/v/{task_id}/{i}.mp4", "duration": "5.1"}
+                for i in range(results // 10)
+            ],
+        },
+    }
+
+
+class PassThroughCache:
+    """Every query reaches the (mocked) upstream, so decoding is measured too."""
+
+    async def get_or_fetch(self, key, fetch):
+        return await fetch()
+
+
+def build_client(body: bytes) -> KlingClient:
+    client = KlingClient(access_key="ak" * 16, secret_key="sk" * 16, base_url="https://kling.test")
+    # Local QPS limits would dominate the timings
+    client.governor.configure("task_query", qps=1e9, burst=1_000_000)
+    client.client = httpx.AsyncClient(
+        base_url=client.base_url,
+        headers=client.headers,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=body, headers={"Content-Type": "application/json"})
+        ),
+    )
+    return client
+
+
+def measure(http: TestClient, url: str, requests: int) -> float:
+    for _ in range(min(20, requests)):
+        http.get(url)
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = http.get(url)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--results", type=int, default=200, help="result images per task")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    body = json.dumps({"code": 0, "message": "SUCCESS", "data": make_task("bench_task", args.results)}).encode()
+    index = TaskIndex(":memory:")
+    for n in range(500):
+        index.upsert(f"task_{n}", make_task(f"task_{n}", 10), endpoint="/images/generations")
+
+    client = build_client(body)
+    app.dependency_overrides[get_kling_client] = lambda: client
+    app.dependency_overrides[get_task_cache] = PassThroughCache
+    app.dependency_overrides[get_result_downloader] = lambda: ResultDownloader("unused", enabled=False)
+    app.dependency_overrides[get_task_index] = lambda: index
+
+    cases = {
+        f"task query ({len(body) // 1024} KiB)": "/api/v1/tasks/images/generations/bench_task",
+        "task list (500 items)": "/api/v1/tasks?limit=500",
+    }
+    print(f"orjson: {'available' if json_codec.orjson is not None else 'not installed'}")
+    try:
+        with TestClient(app) as http:
+            for name, url in cases.items():
+                timings = {}
+                for fast in (False, True):
+                    json_codec.FAST_JSON = fast
+                    timings[fast] = measure(http, url, args.requests)
+                saved = timings[False] - timings[True]
+                print(f"{name:28s} standard {timings[False] * 1e3:7.3f} ms   fast {timings[True] * 1e3:7.3f} ms   "
+                      f"saved {saved * 1e3:7.3f} ms/request ({timings[False] / timings[True]:.2f}x)")
+    finally:
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
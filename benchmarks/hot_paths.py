@@ -0,0 +1,317 @@
+"""
+Micro-benchmarks for the code that runs on every request, with a stored
+baseline to catch regressions.
+
+    python benchmarks/hot_paths.py                   # print timings
+    python benchmarks/hot_paths.py --save-baseline   # record benchmarks/baseline.json
+    python benchmarks/hot_paths.py --check           # exit 1 on a regression
+    python benchmarks/hot_paths.py --check --threshold 0.5 --filter base64
+
+Each benchmark reports the best time per call over several repeats. A fixed
+pure-Python workload is timed alongside them and results are compared
+relative to it, so a baseline recorded on one machine stays usable on a
+faster or slower one. Machine-independent comparison is approximate:
+re-record the baseline after changing interpreter or dependency versions.
+"""
+import os
+import sys
+import json
+import base64
+import timeit
+import logging
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from app.schemas.kling import OmniImageRequest, TaskResponse, Text2VideoRequest, clean_base64_field
+from app.services.json_codec import trusted_response
+from app.services.kling_client import KlingClient
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+MB = 1024 * 1024
+
+# name -> setup; a setup builds its inputs and returns the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def base64_payload(size: int) -> str:
+    """Deterministic base64 text of about `size` characters."""
+    raw = bytes(range(256)) * (size * 3 // 4 // 256 + 1)
+    return base64.b64encode(raw[:size * 3 // 4]).decode("ascii")
+
+
+def make_task(task_id: str, results: int = 4) -> Dict[str, Any]:
+    return {
+        "task_id": task_id,
+        "task_status": "succeed",
+        "task_status_msg": "",
+        "created_at": 1722769557708,
+        "updated_at": 1722769600000,
+        "task_info": {"external_task_id": f"idem-{task_id}"},
+        "task_result": {
+            "videos": [
+                {"id": f"{task_id}-{i}", "url": f"https://cdn.klingai.test/v/{task_id}/{i}.mp4", "duration": "5.1"}
+                for i in range(results)
+            ],
+        },
+    }
+
+
+def _client() -> KlingClient:
+    return KlingClient(access_key="ak" * 16, secret_key="sk" * 16, base_url="https://kling.test")
+
+
+def _run_coroutine(coroutine):
+    # serialize_response awaits nothing that suspends, so it completes on the first step
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+@benchmark("token_cached")
+def _token_cached():
+    client = _client()
+    client._get_token()
+    return client._get_token
+
+
+@benchmark("token_mint")
+def _token_mint():
+    client = _client()
+    cache = client.token_cache
+
+    def mint():
+        cache._current = None
+        return client._get_token()
+    return mint
+
+
+for _size in (1, 8):
+    @benchmark(f"clean_base64_{_size}mb")
+    def _clean_base64(size=_size):
+        value = "data:image/png;base64," + base64_payload(size * MB)
+        return lambda: clean_base64_field(value)
+
+
+@benchmark("text2video_validate_dump")
+def _text2video():
+    body = {
+        "model_name": "kling-v1-6",
+        "prompt": "A red fox running through fresh snow at dawn, cinematic lighting " * 10,
+        "negative_prompt": "blurry, low quality",
+        "cfg_scale": 0.5,
+        "mode": "pro",
+        "aspect_ratio": "16:9",
+        "duration": "10",
+        "camera_control": {"type": "simple", "config": {"zoom": 5}},
+        "callback_url": "https://example.test/callback",
+    }
+    return lambda: Text2VideoRequest.model_validate(body).model_dump(mode="json", exclude_none=True)
+
+
+@benchmark("omni_image_validate_dump_4x2mb")
+def _omni_image():
+    images = ["data:image/png;base64," + base64_payload(2 * MB) for _ in range(4)]
+    body = {"prompt": "Combine <<<image_1>>> and <<<image_2>>> into one scene", "image_list": images, "n": 2}
+    return lambda: OmniImageRequest.model_validate(body).model_dump(mode="json", exclude_none=True)
+
+
+@benchmark("task_response_fastapi_serialize")
+def _task_response_validated():
+    async def endpoint():
+        pass
+
+    field = APIRoute("/bench", endpoint, response_model=TaskResponse).response_field
+    task = make_task("838402373462118464")
+
+    def serialize():
+        response = TaskResponse(task_id=task["task_id"], message=task["task_status"], raw_data=task)
+        content = _run_coroutine(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+    return serialize
+
+
+@benchmark("task_response_trusted")
+def _task_response_trusted():
+    task = make_task("838402373462118464")
+
+    # With KLING_FAST_JSON the response is rendered when constructed
+    return lambda: trusted_response(
+        TaskResponse, {"task_id": task["task_id"], "message": task["task_status"], "raw_data": task}
+    )
+
+
+def calibrate() -> float:
+    """Seconds per call of a fixed pure-Python workload, used as the unit of comparison."""
+    def workload():
+        data = {}
+        for i in range(200):
+            data[str(i)] = [i, i * 2, str(i)]
+        return sorted(data.items(), key=lambda item: item[1][1])
+    return measure(workload)
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.1) -> float:
+    """Best seconds per call over `repeat` runs of at least `min_time` seconds each."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 5, rounds: int = 1) -> Dict[str, Any]:
+    """
+    Times each benchmark in `rounds` interleaved passes and keeps the best
+    of them; the calibration is taken before and after every pass, so a
+    machine that speeds up or slows down mid-run is less misleading.
+    """
+    setups = {name: BENCHMARKS[name]() for name in names or list(BENCHMARKS)}
+    calibration = calibrate()
+    results: Dict[str, float] = {}
+    for _ in range(rounds):
+        for name, fn in setups.items():
+            seconds = measure(fn, repeat=repeat)
+            results[name] = min(seconds, results.get(name, seconds))
+        calibration = min(calibration, calibrate())
+    return {
+        "python": sys.version.split()[0],
+        "calibration": calibration,
+        "results": results,
+    }
+
+
+def merge(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Best of two runs, each result rescaled to the lower calibration."""
+    calibration = min(first["calibration"], second["calibration"])
+    results = {}
+    for run_ in (first, second):
+        scale = calibration / run_["calibration"]
+        for name, seconds in run_["results"].items():
+            results[name] = min(seconds * scale, results.get(name, seconds * scale))
+    return {**first, "calibration": calibration, "results": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    One row per benchmark in `current`: its time relative to the baseline
+    after normalizing both by their calibration. `ratio` is None for
+    benchmarks missing from the baseline.
+    """
+    scale = baseline["calibration"] / current["calibration"]
+    rows = []
+    for name, seconds in current["results"].items():
+        before = baseline["results"].get(name)
+        ratio = seconds * scale / before if before else None
+        rows.append({
+            "name": name,
+            "seconds": seconds,
+            "baseline_seconds": before,
+            "ratio": ratio,
+            "regressed": ratio is not None and ratio > 1 + threshold,
+        })
+    return rows
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, factor in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= factor:
+            return f"{seconds / factor:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'benchmark':34s} {'per call':>11s} {'baseline':>11s} {'ratio':>7s}"]
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "new"
+        flag = "  REGRESSED" if row["regressed"] else ""
+        lines.append(
+            f"{row['name']:34s} {_format_seconds(row['seconds']):>11s} "
+            f"{_format_seconds(row['baseline_seconds']):>11s} {ratio:>7s}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the service hot paths")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per benchmark and round")
+    parser.add_argument("--rounds", type=int, default=None,
+                        help="Passes over all benchmarks, best kept (default 1, or 3 with --save-baseline)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="With --check, re-measure apparent regressions this many times before failing")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a benchmark regressed past --threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown relative to the baseline (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    if not names:
+        parser.error(f"No benchmark matches {args.filter!r}")
+    rounds = args.rounds or (3 if args.save_baseline else 1)
+    current = run(names, repeat=args.repeat, rounds=rounds)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    reference = baseline or {"calibration": current["calibration"], "results": {}}
+    rows = compare(current, reference, args.threshold)
+    if args.check:
+        # Timings on a busy machine are noisy upwards only; a regression must survive re-measuring
+        for _ in range(args.retries):
+            regressed = [row["name"] for row in rows if row["regressed"]]
+            if not regressed:
+                break
+            current = merge(current, run(regressed, repeat=args.repeat))
+            rows = compare(current, reference, args.threshold)
+
+    if args.json:
+        print(json.dumps({**current, "comparison": rows}, indent=2))
+    else:
+        print(format_rows(rows))
+
+    if args.save_baseline:
+        if baseline and args.filter:
+            # Keep the entries of benchmarks that were not re-run, rescaled to this machine
+            scale = current["calibration"] / baseline["calibration"]
+            current["results"] = {
+                **{name: seconds * scale for name, seconds in baseline["results"].items()},
+                **current["results"],
+            }
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    regressed = [row["name"] for row in rows if row["regressed"]]
+    if args.check and regressed:
+        print(f"Regressed past {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
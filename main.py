@@ -1,8 +1,18 @@
+import json
 import logging
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
-from app.routers import videos, lipsync, images, tasks
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.middleware import MetricsMiddleware, TimingMiddleware
+from app.routers import videos, lipsync, images, tasks, admin, media
+from app.services.callback_store import CallbackIngestor, get_callback_ingestor
+from app.services.downloader import get_result_downloader
 from app.services.kling_client import get_kling_client
+from app.services.metrics import MetricsRegistry, get_metrics
+from app.services.poller import get_task_poller, poller_enabled
+from app.services.task_cache import get_task_cache
+from app.services.task_events import get_task_event_hub
+from app.services.task_index import get_task_index
 
 # Configure logger
 load_dotenv()
@@ -10,19 +20,58 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Kling AI API Integration", version="1.0.0")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TimingMiddleware)
 
 app.include_router(videos.router)
 app.include_router(lipsync.router)
 app.include_router(images.router)
 app.include_router(tasks.router)
+app.include_router(admin.router)
+app.include_router(media.router)
+
+def add_listener(listeners, listener):
+    # Startup can run more than once per process (e.g. in tests)
+    if listener not in listeners:
+        listeners.append(listener)
 
 @app.on_event("startup")
 async def startup_event():
     # Initialize client
-    get_kling_client()
+    client = get_kling_client()
+    get_metrics().add_collector(client.metric_families)
+    ingestor = get_callback_ingestor()
+    if poller_enabled():
+        # Track every created task centrally instead of letting each consumer poll Kling
+        poller = get_task_poller()
+        add_listener(client.task_listeners, poller.track)
+        add_listener(ingestor.listeners, poller.apply_callback)
+        await poller.start()
+    # Push status transitions seen by polls, the poller and callbacks to stream subscribers
+    hub = get_task_event_hub()
+    add_listener(get_task_cache().listeners, hub.publish_response)
+    add_listener(ingestor.listeners, hub.publish_callback)
+    # Keep the local task index in step with every source of task state
+    index = get_task_index()
+    add_listener(client.submission_listeners, index.record_submission)
+    add_listener(get_task_cache().listeners, index.record_response)
+    add_listener(ingestor.listeners, index.record_callback)
+    index.start()
+    # Queries for tasks this process does not remember are signed by the account the index recorded
+    client.accounts.task_account_lookup = index.account_of
+    downloader = get_result_downloader()
+    if downloader.enabled:
+        # Fetch result media once, as soon as a task is seen to succeed
+        add_listener(get_task_cache().listeners, downloader.on_response)
+        add_listener(ingestor.listeners, downloader.on_callback)
+    ingestor.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await get_task_poller().stop()
+    await get_callback_ingestor().stop()
+    await get_result_downloader().stop()
+    await get_task_index().stop()
     client = get_kling_client()
     await client.close()
 
@@ -30,13 +79,31 @@ async def shutdown_event():
 async def root():
     return {"message": "Welcome to Kling AI API Integration Service"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(registry: MetricsRegistry = Depends(get_metrics)):
+    """
+    Prometheus scrape endpoint: upstream and route latency, Kling response
+    codes, payload sizes, in-flight and connection pool gauges.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/callback")
-async def handle_callback(request: Request):
+async def handle_callback(request: Request, ingestor: CallbackIngestor = Depends(get_callback_ingestor)):
     """
     Endpoint to receive asynchronous task updates from Kling AI.
     Configure this URL (publicly accessible) in your API calls as `callback_url`.
+    The payload is acknowledged immediately and persisted in the background;
+    redelivered callbacks are deduplicated on (task_id, task_status).
     """
-    body = await request.json()
-    logger.info(f"Received callback: {body}")
-    # TODO: Implement your business logic here (e.g., update database, notify user)
+    try:
+        body = json.loads(await request.body())
+        if not isinstance(body, dict):
+            raise ValueError("Callback payload must be a JSON object")
+        accepted = ingestor.submit(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not accepted:
+        # Queue is full: let Kling redeliver instead of blocking this handler
+        logger.warning(f"Callback queue full, rejecting callback for {body.get('task_id')}")
+        return JSONResponse(status_code=503, content={"status": "busy"}, headers={"Retry-After": "5"})
     return {"status": "received"}
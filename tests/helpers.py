@@ -0,0 +1,45 @@
+"""Helpers shared by the test modules."""
+import os
+import sys
+import httpx
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.kling_client import KlingClient
+from app.services.retry import RetryPolicy
+
+
+def make_client(handler, **kwargs) -> KlingClient:
+    """
+    Builds a KlingClient whose httpx transport is served by `handler`.
+    """
+    client = KlingClient(access_key="ak", secret_key="sk", base_url="https://kling.test", **kwargs)
+    client.client = httpx.AsyncClient(
+        base_url=client.base_url,
+        headers=client.headers,
+        transport=httpx.MockTransport(handler),
+    )
+    return client
+
+
+def fast_retries(**overrides) -> RetryPolicy:
+    """A RetryPolicy with millisecond backoff, so retrying tests stay fast."""
+    options = dict(max_attempts=4, base_delay=0.001, max_delay=0.01, deadline=5.0)
+    options.update(overrides)
+    return RetryPolicy(**options)
+
+
+class StubIngestor:
+    """Stands in for CallbackIngestor: keeps accepted payloads in memory."""
+
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.payloads = []
+
+    def submit(self, payload):
+        if not payload.get("task_id"):
+            raise ValueError("Callback payload has no task_id")
+        self.payloads.append(payload)
+        return self.accept
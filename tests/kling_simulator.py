@@ -0,0 +1,415 @@
+"""
+Local stand-in for the Kling API, for end-to-end and load tests.
+
+Serves the create, query, list and identify-face endpoints under /v1 with
+responses shaped like the fixtures in tests/mock_kling_response.py, and
+simulates:
+- task lifecycles: submitted -> processing -> succeed/failed, driven by the
+  clock, with lognormal durations
+- lognormal response latency, separately for submissions and queries
+- quotas: HTTP 429 with code 1302 above `quota_qps` submissions per second
+  and code 1303 above `max_active_tasks` unfinished tasks
+- 5xx bursts: with probability `burst_rate` per request, every request fails
+  with 503 for the next `burst_duration` seconds
+- callbacks: POSTed to a task's `callback_url` on each status change, after
+  `callback_delay`, with a few retries
+
+Run standalone and point the service at it:
+
+    python tests/kling_simulator.py --port 9000 --failure-rate 0.1 --burst-rate 0.001
+    BASE_URL=http://127.0.0.1:9000/v1 KLING_AI_API_TOKEN=dev uvicorn main:app
+
+or embed it (see `KlingSimulator.serve_in_thread` and tests/test_e2e.py).
+"""
+import os
+import sys
+import copy
+import contextlib
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from tests.mock_kling_response import (
+    MOCK_ERROR_RESPONSE, MOCK_IMAGE_GEN_RESPONSE, MOCK_LIPSYNC_IDENTIFY_RESPONSE, MOCK_TASK_QUERY_SUCCESS,
+    MOCK_TEXT2VIDEO_RESPONSE
+)
+
+CREATE_ENDPOINTS = (
+    "/videos/text2video",
+    "/videos/image2video",
+    "/videos/multi-image2video",
+    "/videos/motion-control",
+    "/videos/video-extend",
+    "/videos/advanced-lip-sync",
+    "/images/generations",
+    "/images/omni-image",
+)
+
+class Latency:
+    """Lognormal delay around `median` seconds; `sigma` sets the tail (0: constant)."""
+
+    def __init__(self, median: float = 0.0, sigma: float = 0.5, maximum: float = 30.0):
+        self.median = median
+        self.sigma = sigma
+        self.maximum = maximum
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return min(self.maximum, self.median * math.exp(rng.gauss(0.0, self.sigma)))
+
+
+class SimulatedTask:
+    def __init__(self, task_id: str, endpoint: str, request: Dict[str, Any], created: float,
+                 processing_after: float, finish_after: float, fails: bool):
+        self.task_id = task_id
+        self.endpoint = endpoint
+        self.request = request
+        self.created = created
+        self.processing_at = created + processing_after
+        self.finished_at = created + finish_after
+        self.fails = fails
+        self.created_ms = int(time.time() * 1000)
+
+    def status(self, now: float) -> str:
+        if now >= self.finished_at:
+            return "failed" if self.fails else "succeed"
+        if now >= self.processing_at:
+            return "processing"
+        return "submitted"
+
+    def data(self, now: float) -> Dict[str, Any]:
+        status = self.status(now)
+        data = {
+            "task_id": self.task_id,
+            "task_status": status,
+            "task_status_msg": "Simulated failure" if status == "failed" else "",
+            "task_info": {"external_task_id": self.request.get("external_task_id")},
+            "created_at": self.created_ms,
+            "updated_at": self.created_ms + int(1000 * max(0.0, min(now, self.finished_at) - self.created)),
+        }
+        if status == "succeed":
+            data["task_result"] = self.result()
+        return data
+
+    def result(self) -> Dict[str, Any]:
+        if self.endpoint.startswith("/images/"):
+            count = int(self.request.get("n") or 1)
+            return {"images": [
+                {"index": i, "url": f"https://cdn.klingai.test/images/{self.task_id}/{i}.png"} for i in range(count)
+            ]}
+        result = copy.deepcopy(MOCK_TASK_QUERY_SUCCESS["data"]["task_result"])
+        for index, video in enumerate(result["videos"]):
+            video["id"] = f"{self.task_id}-{index}"
+            video["url"] = f"https://cdn.klingai.test/videos/{self.task_id}/{index}.mp4"
+        return result
+
+
+class KlingSimulator:
+    """
+    The simulated API as an ASGI app (`.app`). All knobs are constructor
+    arguments; `seed` makes latencies, durations and failures repeatable.
+    """
+
+    def __init__(self, create_latency: Optional[Latency] = None, query_latency: Optional[Latency] = None,
+                 task_duration: Optional[Latency] = None, processing_after: float = 0.2,
+                 failure_rate: float = 0.0, quota_qps: float = 0.0, quota_burst: int = 10,
+                 max_active_tasks: int = 0, burst_rate: float = 0.0, burst_duration: float = 1.0,
+                 callback_delay: float = 0.0, callback_attempts: int = 3,
+                 callback_transport: Optional[httpx.AsyncBaseTransport] = None,
+                 require_auth: bool = True, seed: Optional[int] = None):
+        self.create_latency = create_latency or Latency()
+        self.query_latency = query_latency or Latency()
+        self.task_duration = task_duration or Latency(median=1.0, sigma=0.3)
+        self.processing_after = processing_after
+        self.failure_rate = failure_rate
+        self.quota_qps = quota_qps  # 0: unlimited
+        self.quota_burst = quota_burst
+        self.max_active_tasks = max_active_tasks  # 0: unlimited
+        self.burst_rate = burst_rate
+        self.burst_duration = burst_duration
+        self.callback_delay = callback_delay
+        self.callback_attempts = callback_attempts
+        self.callback_transport = callback_transport
+        self.require_auth = require_auth
+        self.rng = random.Random(seed)
+
+        self.tasks: Dict[str, SimulatedTask] = {}
+        self._by_external_id: Dict[str, str] = {}
+        self._tokens = float(quota_burst)
+        self._refilled = time.monotonic()
+        self._burst_until = 0.0
+        self._callback_client: Optional[httpx.AsyncClient] = None
+        self._callback_tasks: set = set()
+        self.counters: Dict[str, int] = {}
+        self.callbacks_delivered = 0
+        self.callbacks_failed = 0
+
+        self.app = Starlette(
+            routes=[
+                Route("/v1/videos/identify-face", self.identify_face, methods=["POST"]),
+                Route("/v1/{category}/{task_type}", self.create_task, methods=["POST"]),
+                Route("/v1/{category}/{task_type}", self.list_tasks, methods=["GET"]),
+                Route("/v1/{category}/{task_type}/{task_id}", self.get_task, methods=["GET"]),
+                Route("/__sim/stats", self.stats_endpoint, methods=["GET"]),
+            ],
+            lifespan=self._lifespan,
+        )
+
+    # --- Fault injection ---
+
+    def _count(self, name: str):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def _error(self, status: int, code: int, message: str) -> JSONResponse:
+        self._count(f"http_{status}")
+        return JSONResponse(
+            {"code": code, "message": message, "request_id": uuid.uuid4().hex, "data": None}, status_code=status
+        )
+
+    async def _preamble(self, request: Request, latency: Latency) -> Optional[JSONResponse]:
+        """Latency, auth and 5xx bursts shared by every endpoint; returns an error response or None."""
+        delay = latency.sample(self.rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.require_auth and not request.headers.get("authorization", "").startswith("Bearer "):
+            return self._error(401, MOCK_ERROR_RESPONSE["code"], MOCK_ERROR_RESPONSE["message"])
+        now = time.monotonic()
+        if now < self._burst_until:
+            return self._error(503, 5000, "Simulated outage")
+        if self.burst_rate and self.rng.random() < self.burst_rate:
+            self._burst_until = now + self.burst_duration
+            self._count("bursts")
+            return self._error(503, 5000, "Simulated outage")
+        return None
+
+    def _take_quota(self) -> bool:
+        if not self.quota_qps:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.quota_burst, self._tokens + (now - self._refilled) * self.quota_qps)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _active_tasks(self, now: float) -> int:
+        return sum(1 for task in self.tasks.values() if now < task.finished_at)
+
+    # --- Endpoints ---
+
+    async def create_task(self, request: Request) -> JSONResponse:
+        endpoint = f"/{request.path_params['category']}/{request.path_params['task_type']}"
+        if endpoint not in CREATE_ENDPOINTS:
+            return self._error(404, 1203, f"Unknown endpoint {endpoint}")
+        error = await self._preamble(request, self.create_latency)
+        if error is not None:
+            return error
+        try:
+            body = await request.json()
+        except ValueError:
+            return self._error(400, 1200, "Invalid JSON body")
+        now = time.monotonic()
+        external_task_id = body.get("external_task_id")
+        if external_task_id and external_task_id in self._by_external_id:
+            # A retried submission: answer with the task it already created
+            self._count("deduplicated")
+            return self._task_response(self.tasks[self._by_external_id[external_task_id]], now)
+        if not self._take_quota():
+            return self._error(429, 1302, "Simulated rate limit")
+        if self.max_active_tasks and self._active_tasks(now) >= self.max_active_tasks:
+            return self._error(429, 1303, "Simulated concurrency quota")
+
+        task = SimulatedTask(
+            task_id=f"sim_{uuid.uuid4().hex[:16]}",
+            endpoint=endpoint,
+            request=body,
+            created=now,
+            processing_after=self.processing_after,
+            finish_after=max(self.processing_after, self.task_duration.sample(self.rng)),
+            fails=self.rng.random() < self.failure_rate,
+        )
+        self.tasks[task.task_id] = task
+        if external_task_id:
+            self._by_external_id[external_task_id] = task.task_id
+        self._count("created")
+        if body.get("callback_url"):
+            delivery = asyncio.create_task(self._deliver_callbacks(task, body["callback_url"]))
+            self._callback_tasks.add(delivery)
+            delivery.add_done_callback(self._callback_tasks.discard)
+        return self._task_response(task, now)
+
+    def _task_response(self, task: SimulatedTask, now: float) -> JSONResponse:
+        template = MOCK_IMAGE_GEN_RESPONSE if task.endpoint.startswith("/images/") else MOCK_TEXT2VIDEO_RESPONSE
+        return JSONResponse({**template, "request_id": uuid.uuid4().hex, "data": task.data(now)})
+
+    async def get_task(self, request: Request) -> JSONResponse:
+        error = await self._preamble(request, self.query_latency)
+        if error is not None:
+            return error
+        task = self.tasks.get(request.path_params["task_id"])
+        if task is None:
+            return self._error(404, 1203, "Task not found")
+        self._count("queried")
+        return JSONResponse({**MOCK_TASK_QUERY_SUCCESS, "request_id": uuid.uuid4().hex,
+                             "data": task.data(time.monotonic())})
+
+    async def list_tasks(self, request: Request) -> JSONResponse:
+        error = await self._preamble(request, self.query_latency)
+        if error is not None:
+            return error
+        endpoint = f"/{request.path_params['category']}/{request.path_params['task_type']}"
+        page_num = int(request.query_params.get("pageNum", 1))
+        page_size = int(request.query_params.get("pageSize", 30))
+        tasks = sorted((t for t in self.tasks.values() if t.endpoint == endpoint), key=lambda t: -t.created)
+        now = time.monotonic()
+        page = [task.data(now) for task in tasks[(page_num - 1) * page_size:page_num * page_size]]
+        self._count("listed")
+        return JSONResponse({"code": 0, "message": "success", "request_id": uuid.uuid4().hex, "data": page})
+
+    async def identify_face(self, request: Request) -> JSONResponse:
+        error = await self._preamble(request, self.create_latency)
+        if error is not None:
+            return error
+        self._count("identified")
+        return JSONResponse({**MOCK_LIPSYNC_IDENTIFY_RESPONSE, "request_id": uuid.uuid4().hex})
+
+    async def stats_endpoint(self, request: Request) -> JSONResponse:
+        return JSONResponse(self.stats())
+
+    # --- Callbacks ---
+
+    async def _deliver_callbacks(self, task: SimulatedTask, url: str):
+        for at in (task.processing_at, task.finished_at):
+            await asyncio.sleep(max(0.0, at - time.monotonic()) + self.callback_delay)
+            # asyncio may wake a little early; report the state the callback is for
+            payload = task.data(max(time.monotonic(), at))
+            for attempt in range(self.callback_attempts):
+                try:
+                    response = await self._callbacks().post(url, json=payload)
+                    if response.status_code < 500:
+                        self.callbacks_delivered += 1
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1 * 2 ** attempt)
+            else:
+                self.callbacks_failed += 1
+
+    def _callbacks(self) -> httpx.AsyncClient:
+        if self._callback_client is None:
+            self._callback_client = httpx.AsyncClient(transport=self.callback_transport, timeout=10.0)
+        return self._callback_client
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app):
+        yield
+        await self.close()
+
+    async def close(self):
+        for delivery in list(self._callback_tasks):
+            delivery.cancel()
+        await asyncio.gather(*self._callback_tasks, return_exceptions=True)
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+            self._callback_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        statuses: Dict[str, int] = {}
+        for task in self.tasks.values():
+            status = task.status(now)
+            statuses[status] = statuses.get(status, 0) + 1
+        return {
+            "tasks": len(self.tasks),
+            "statuses": statuses,
+            "counters": dict(self.counters),
+            "callbacks_delivered": self.callbacks_delivered,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+    # --- Serving ---
+
+    def serve_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> "ServerThread":
+        """Serves the simulator over real sockets; use `server.url + "/v1"` as Kling's base URL."""
+        return ServerThread(self.app, host, port)
+
+
+class ServerThread:
+    """An ASGI app under uvicorn in a daemon thread, listening on `url`."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        import socket
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Local Kling API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--create-latency", type=float, default=0.3, help="median seconds")
+    parser.add_argument("--query-latency", type=float, default=0.05, help="median seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--task-duration", type=float, default=20.0, help="median seconds until finished")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--quota-qps", type=float, default=0.0)
+    parser.add_argument("--max-active-tasks", type=int, default=0)
+    parser.add_argument("--burst-rate", type=float, default=0.0)
+    parser.add_argument("--burst-duration", type=float, default=2.0)
+    parser.add_argument("--callback-delay", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    simulator = KlingSimulator(
+        create_latency=Latency(args.create_latency, args.latency_sigma),
+        query_latency=Latency(args.query_latency, args.latency_sigma),
+        task_duration=Latency(args.task_duration, 0.3, maximum=600.0),
+        processing_after=min(1.0, args.task_duration / 4),
+        failure_rate=args.failure_rate,
+        quota_qps=args.quota_qps,
+        max_active_tasks=args.max_active_tasks,
+        burst_rate=args.burst_rate,
+        burst_duration=args.burst_duration,
+        callback_delay=args.callback_delay,
+        seed=args.seed,
+    )
+    uvicorn.run(simulator.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
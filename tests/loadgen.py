@@ -0,0 +1,263 @@
+"""
+Load generator for the service: drives a weighted mix of routes with a fixed
+number of concurrent workers and reports throughput, p50/p99 latency and
+error rates per route.
+
+Against a running service (e.g. one pointed at tests/kling_simulator.py):
+
+    python tests/loadgen.py --target http://127.0.0.1:8000 --concurrency 50 --duration 30
+
+Self-contained: starts the simulator and the service in-process, over real
+sockets, with the given fault injection:
+
+    python tests/loadgen.py --simulate --concurrency 50 --duration 30 --failure-rate 0.1 --quota-qps 20
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Relative weights of the operations a worker picks from
+DEFAULT_MIX = {"create_video": 2, "create_image": 1, "get_task": 6, "wait_task": 0, "list_tasks": 1}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, status: str, latency: float):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def errors(self) -> int:
+        return sum(count for status, count in self.statuses.items() if not status.startswith("2"))
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "throughput_rps": count / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "error_rate": self.errors / count if count else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class LoadReport:
+    def __init__(self, routes: Dict[str, RouteStats], elapsed: float):
+        self.routes = routes
+        self.elapsed = elapsed
+
+    def summary(self) -> Dict[str, Any]:
+        total = RouteStats()
+        for stats in self.routes.values():
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+            total.latencies.extend(stats.latencies)
+        return {
+            "elapsed_s": self.elapsed,
+            "total": total.summary(self.elapsed),
+            "routes": {route: stats.summary(self.elapsed) for route, stats in sorted(self.routes.items())},
+        }
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [f"{'route':56s} {'reqs':>7s} {'rps':>8s} {'p50 ms':>9s} {'p99 ms':>9s} {'errors':>7s}  statuses"]
+        for route, row in list(summary["routes"].items()) + [("TOTAL", summary["total"])]:
+            lines.append(
+                f"{route:56s} {row['requests']:7d} {row['throughput_rps']:8.1f} {row['p50_ms']:9.1f} "
+                f"{row['p99_ms']:9.1f} {row['error_rate']:6.1%}  {row['statuses']}"
+            )
+        return "\n".join(lines)
+
+
+class LoadGenerator:
+    """
+    Issues requests from `concurrency` workers, each picking an operation
+    from `mix`. Created tasks are remembered so status queries and waits hit
+    real task IDs; prompts are unique so idempotent submission never folds
+    two requests into one.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, mix: Optional[Dict[str, float]] = None,
+                 callback_url: Optional[str] = None, wait_timeout: float = 5.0, seed: Optional[int] = None):
+        self.http = http
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.callback_url = callback_url
+        self.wait_timeout = wait_timeout
+        self.rng = random.Random(seed)
+        self.tasks: List[str] = []  # "<category>/<task_type>/<task_id>"
+        self.routes: Dict[str, RouteStats] = {}
+        self._operations: Dict[str, Callable] = {
+            "create_video": self.create_video,
+            "create_image": self.create_image,
+            "get_task": self.get_task,
+            "wait_task": self.wait_task,
+            "list_tasks": self.list_tasks,
+        }
+
+    async def _call(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.routes.setdefault(route, RouteStats()).record(status, time.perf_counter() - started)
+        return response
+
+    def _submission(self) -> Dict[str, Any]:
+        body = {"prompt": f"load test {uuid.uuid4().hex}", "model_name": "kling-v1"}
+        if self.callback_url:
+            body["callback_url"] = self.callback_url
+        return body
+
+    async def _create(self, route: str, path: str, task_path: str):
+        response = await self._call(route, "POST", path, json=self._submission())
+        if response is not None and response.status_code == 200:
+            self.tasks.append(f"{task_path}/{response.json()['task_id']}")
+
+    async def create_video(self):
+        await self._create("POST /api/v1/videos/text2video", "/api/v1/videos/text2video", "videos/text2video")
+
+    async def create_image(self):
+        await self._create("POST /api/v1/images/generations", "/api/v1/images/generations", "images/generations")
+
+    async def get_task(self):
+        if not self.tasks:
+            return await self.create_video()
+        await self._call("GET /api/v1/tasks/{category}/{task_type}/{task_id}", "GET",
+                         f"/api/v1/tasks/{self.rng.choice(self.tasks)}")
+
+    async def wait_task(self):
+        if not self.tasks:
+            return await self.create_video()
+        await self._call("GET /api/v1/tasks/{category}/{task_type}/{task_id}/wait", "GET",
+                         f"/api/v1/tasks/{self.rng.choice(self.tasks)}/wait",
+                         params={"timeout": self.wait_timeout}, timeout=self.wait_timeout + 10)
+
+    async def list_tasks(self):
+        await self._call("GET /api/v1/tasks", "GET", "/api/v1/tasks", params={"limit": 50})
+
+    async def run(self, concurrency: int = 10, duration: Optional[float] = None,
+                  requests: Optional[int] = None) -> LoadReport:
+        """Runs until `duration` seconds have passed or `requests` were issued, whichever comes first."""
+        if duration is None and requests is None:
+            raise ValueError("Give a duration or a number of requests")
+        names, weights = list(self.mix), list(self.mix.values())
+        started = time.perf_counter()
+        stop_at = started + duration if duration is not None else None
+        remaining = [requests if requests is not None else float("inf")]
+
+        async def worker():
+            while remaining[0] > 0 and (stop_at is None or time.perf_counter() < stop_at):
+                remaining[0] -= 1
+                await self._operations[self.rng.choices(names, weights)[0]]()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return LoadReport(self.routes, time.perf_counter() - started)
+
+
+def _start_simulated_stack(args):
+    """Simulator and service in this process, each under uvicorn on its own port."""
+    from tests.kling_simulator import KlingSimulator, Latency, ServerThread
+
+    simulator = KlingSimulator(
+        create_latency=Latency(args.create_latency, 0.5),
+        query_latency=Latency(args.query_latency, 0.5),
+        task_duration=Latency(args.task_duration, 0.3, maximum=600.0),
+        processing_after=min(1.0, args.task_duration / 4),
+        failure_rate=args.failure_rate,
+        quota_qps=args.quota_qps,
+        burst_rate=args.burst_rate,
+        burst_duration=args.burst_duration,
+        seed=args.seed,
+    )
+    simulator_server = simulator.serve_in_thread()
+    # The service reads its configuration when first used
+    os.environ["BASE_URL"] = simulator_server.url + "/v1"
+    os.environ.setdefault("KLING_AI_API_TOKEN", "simulated")
+    os.environ.setdefault("KLING_CALLBACK_DB", os.path.join(tempfile.mkdtemp(), "callbacks.db"))
+    from main import app
+
+    service_server = ServerThread(app)
+    return simulator, [service_server, simulator_server], service_server.url
+
+
+async def _drive(args, target: str, callback_url: Optional[str]) -> LoadReport:
+    mix = json.loads(args.mix) if args.mix else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as http:
+        generator = LoadGenerator(http, mix, callback_url=callback_url, seed=args.seed)
+        return await generator.run(args.concurrency, duration=args.duration, requests=args.requests)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load generator for the Kling service")
+    parser.add_argument("--target", help="Base URL of a running service")
+    parser.add_argument("--simulate", action="store_true", help="Start the simulator and the service in-process")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=None, help="seconds")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--mix", help=f"JSON weights, default {json.dumps(DEFAULT_MIX)}")
+    parser.add_argument("--callbacks", action="store_true", help="Ask for callbacks to <target>/callback")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--seed", type=int, default=None)
+    simulation = parser.add_argument_group("simulator (with --simulate)")
+    simulation.add_argument("--create-latency", type=float, default=0.2)
+    simulation.add_argument("--query-latency", type=float, default=0.03)
+    simulation.add_argument("--task-duration", type=float, default=5.0)
+    simulation.add_argument("--failure-rate", type=float, default=0.05)
+    simulation.add_argument("--quota-qps", type=float, default=0.0)
+    simulation.add_argument("--burst-rate", type=float, default=0.0)
+    simulation.add_argument("--burst-duration", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    if bool(args.target) == args.simulate:
+        parser.error("Give exactly one of --target or --simulate")
+    if args.duration is None and args.requests is None:
+        args.duration = 10.0
+
+    servers = []
+    simulator = None
+    target = args.target
+    if args.simulate:
+        simulator, servers, target = _start_simulated_stack(args)
+    try:
+        report = asyncio.run(_drive(args, target, f"{target}/callback" if args.callbacks else None))
+    finally:
+        for server in servers:
+            server.stop()
+    if args.json:
+        print(json.dumps(report.summary(), indent=2))
+    else:
+        print(report.format())
+        if simulator is not None:
+            print(f"simulator: {json.dumps(simulator.stats())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import sys
+import asyncio
+import httpx
+import jwt
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.accounts import Account, AccountPool
+from app.services.kling_client import KlingClient
+from app.services.rate_limit import RateLimitExceeded
+from app.services.retry import RetryPolicy
+from app.services.task_index import TaskIndex
+from app.services.token_cache import TokenCache
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+
+
+def make_pool(strategy="least_in_flight", weights=(1, 1)) -> AccountPool:
+    accounts = [
+        Account(f"acc{i}", token_cache=TokenCache(f"ak{i}", f"sk{i}"), weight=weight)
+        for i, weight in enumerate(weights)
+    ]
+    return AccountPool(accounts, strategy=strategy, cooldown=60)
+
+
+def test_weighted_strategy_follows_weights():
+    pool = make_pool("weighted", weights=(3, 1))
+    picks = [pool.select().name for _ in range(8)]
+    assert picks.count("acc0") == 6
+    assert picks.count("acc1") == 2
+
+
+def test_least_in_flight_and_cooldown():
+    pool = make_pool()
+    pool.accounts[0].in_flight = 2
+    assert pool.select().name == "acc1"
+
+    pool.record_quota_error(pool.accounts[1])
+    assert pool.select().name == "acc0"
+    pool.record_quota_error(pool.accounts[0], retry_after=5)
+    with pytest.raises(RateLimitExceeded):
+        pool.select()
+
+
+def test_tasks_are_queried_with_their_creating_account():
+    issuers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].split(" ", 1)[1]
+        issuer = jwt.decode(token, options={"verify_signature": False})["iss"]
+        issuers.append(issuer)
+        if request.method == "POST":
+            if issuer == "ak0":
+                return httpx.Response(429, json={"code": 1303, "message": "parallel task over resource pack limit"})
+            return httpx.Response(200, json={"code": 0, "data": {"task_id": "task_new"}})
+        return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+    client = KlingClient(base_url="https://kling.test", accounts=make_pool())
+    client.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        await client.create_text2video({"prompt": "x"})
+        await client.get_task("/videos/text2video", "task_new")
+
+    asyncio.run(scenario())
+    # acc0 hit its quota, the submission moved to acc1 and the query followed it
+    assert issuers == ["ak0", "ak1", "ak1"]
+    stats = client.account_stats()["accounts"]
+    assert stats["acc0"]["quota_errors"] == 1
+    assert stats["acc0"]["cooling_down_for"] > 0
+
+
+def issuer_of(request: httpx.Request) -> str:
+    token = request.headers["Authorization"].split(" ", 1)[1]
+    return jwt.decode(token, options={"verify_signature": False})["iss"]
+
+
+def test_unknown_tasks_are_signed_with_the_indexed_account(tmp_path):
+    issuers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        issuers.append(issuer_of(request))
+        return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+    # As after a restart: the in-memory map is empty, the task index knows the task
+    index = TaskIndex(str(tmp_path / "tasks.db"))
+    index.upsert("task_old", {"task_id": "task_old"}, endpoint="/videos/text2video", account="acc1")
+    pool = make_pool()
+    pool.task_account_lookup = index.account_of
+    client = KlingClient(base_url="https://kling.test", accounts=pool)
+    client.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        await client.get_task("/videos/text2video", "task_old")
+        await client.get_task("/videos/text2video", "task_old")
+        await client.get_task("/videos/text2video", "task_unknown")
+
+    asyncio.run(scenario())
+    index.close()
+    assert issuers == ["ak1", "ak1", "ak0"]
+    assert pool.known_task_account("task_old").name == "acc1"
+
+
+def test_lip_sync_is_submitted_by_the_account_of_its_face_session():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        issuer = issuer_of(request)
+        calls.append((request.url.path, issuer))
+        if request.url.path.endswith("/identify-face"):
+            if issuer == "ak0":
+                return httpx.Response(429, json={"code": 1303, "message": "parallel task over resource pack limit"})
+            return httpx.Response(200, json={"code": 0, "data": {"session_id": "sess_1", "face_data": []}})
+        return httpx.Response(200, json={"code": 0, "data": {"task_id": "task_sync"}})
+
+    pool = make_pool()
+    client = KlingClient(base_url="https://kling.test", accounts=pool)
+    client.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        await client.identify_face({"video_url": "https://cdn.test/v.mp4"})
+        # acc0 is available again and less busy, but the session belongs to acc1
+        pool.accounts[0].cooldown_until = 0
+        pool.accounts[1].in_flight = 5
+        await client.create_lip_sync_task({"session_id": "sess_1", "face_choose": []})
+
+    asyncio.run(scenario())
+    assert calls == [("/v1/videos/identify-face", "ak0"), ("/v1/videos/identify-face", "ak1"),
+                     ("/v1/videos/advanced-lip-sync", "ak1")]
+    assert pool.for_task("task_sync").name == "acc1"
+
+
+def test_throttled_queries_do_not_block_submissions():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(429, json={"code": 1302, "message": "rate too high"})
+        return httpx.Response(200, json={"code": 0, "data": {"task_id": "task_new"}})
+
+    client = KlingClient(
+        access_key="ak", secret_key="sk", base_url="https://kling.test",
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.001, max_delay=0.01, deadline=5.0)
+    )
+    client.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_task("/videos/text2video", "task_1")
+        return await client.create_text2video({"prompt": "x"})
+
+    response = asyncio.run(scenario())
+    assert response["data"]["task_id"] == "task_new"
+    assert calls == ["GET"] * 4 + ["POST"]
+    stats = client.account_stats()["accounts"]["default"]
+    assert stats["quota_errors"] == 4
+    assert stats["cooling_down_for"] == 0
+
+
+def test_single_account_is_never_cooled_down():
+    pool = AccountPool([Account("only", api_token="t")], cooldown=60)
+    pool.record_quota_error(pool.primary)
+    assert pool.select() is pool.primary
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.kling_client import KlingClient, get_kling_client
+from tests.mock_kling_response import MOCK_TEXT2VIDEO_RESPONSE, MOCK_ERROR_RESPONSE
+
+client = TestClient(app)
+
+
+def post_batch(path, payload, mock_client):
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    idempotency_cache = IdempotencyCache()
+    app.dependency_overrides[get_idempotency_cache] = lambda: idempotency_cache
+    try:
+        response = client.post(path, json=payload)
+    finally:
+        app.dependency_overrides = {}
+    if response.status_code != 200:
+        return response, []
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    return response, sorted(lines, key=lambda line: line["index"])
+
+
+def test_text2video_batch_reports_each_item():
+    mock_client = AsyncMock(spec=KlingClient)
+
+    async def create(data, deadline=None):
+        if data["prompt"] == "bad":
+            return MOCK_ERROR_RESPONSE
+        return MOCK_TEXT2VIDEO_RESPONSE
+
+    mock_client.create_text2video.side_effect = create
+    payload = [{"prompt": "a cat"}, {"prompt": "bad"}, {"prompt": "a dog"}]
+    response, lines = post_batch("/api/v1/videos/text2video:batch", payload, mock_client)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [line["status_code"] for line in lines] == [200, 400, 200]
+    assert lines[0]["result"]["task_id"] == "task_t2v_001"
+    assert lines[1]["detail"] == "Invalid API Token"
+    assert mock_client.create_text2video.call_count == 3
+
+
+def test_batch_is_validated_in_one_pass():
+    mock_client = AsyncMock(spec=KlingClient)
+    payload = [{"prompt": "ok"}, {"negative_prompt": "missing prompt"}]
+    response, _ = post_batch("/api/v1/videos/text2video:batch", payload, mock_client)
+    assert response.status_code == 422
+    mock_client.create_text2video.assert_not_called()
+
+
+def test_image_batch():
+    mock_client = AsyncMock(spec=KlingClient)
+    mock_client.generate_image.return_value = {"code": 0, "data": {"task_id": "img_1"}}
+    response, lines = post_batch("/api/v1/images/generations:batch", [{"prompt": "x"}] * 4, mock_client)
+    assert response.status_code == 200
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert all(line["result"]["task_id"] == "img_1" for line in lines)
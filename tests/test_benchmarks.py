@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import hot_paths
+
+
+def test_every_benchmark_runs():
+    for name, setup in hot_paths.BENCHMARKS.items():
+        assert setup()() is not None, name
+
+
+def test_baseline_covers_every_benchmark():
+    with open(hot_paths.BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert baseline["calibration"] > 0
+    assert set(baseline["results"]) == set(hot_paths.BENCHMARKS)
+
+
+def test_compare_normalizes_by_calibration():
+    baseline = {"calibration": 1.0, "results": {"a": 1.0, "b": 1.0}}
+    # Twice as slow a machine: "a" kept its relative cost, "b" regressed by 50%
+    current = {"calibration": 2.0, "results": {"a": 2.0, "b": 3.0, "c": 1.0}}
+    rows = {row["name"]: row for row in hot_paths.compare(current, baseline, threshold=0.25)}
+    assert rows["a"]["ratio"] == 1.0 and not rows["a"]["regressed"]
+    assert rows["b"]["ratio"] == 1.5 and rows["b"]["regressed"]
+    assert rows["c"]["ratio"] is None and not rows["c"]["regressed"]
+
+
+def test_merge_keeps_best_rescaled_result():
+    first = {"python": "3", "calibration": 2.0, "results": {"a": 4.0, "b": 2.0}}
+    second = {"python": "3", "calibration": 1.0, "results": {"a": 1.0}}
+    merged = hot_paths.merge(first, second)
+    assert merged["calibration"] == 1.0
+    assert merged["results"] == {"a": 1.0, "b": 1.0}
+
+
+def test_check_fails_on_regression(tmp_path, monkeypatch):
+    monkeypatch.setattr(hot_paths, "BENCHMARKS", {"noop": lambda: (lambda: None)})
+    path = tmp_path / "baseline.json"
+    assert hot_paths.main(["--save-baseline", "--baseline", str(path), "--repeat", "1", "--rounds", "1"]) == 0
+    assert hot_paths.main(["--check", "--baseline", str(path), "--repeat", "1"]) == 0
+
+    baseline = json.loads(path.read_text())
+    baseline["results"]["noop"] /= 100
+    path.write_text(json.dumps(baseline))
+    assert hot_paths.main(["--check", "--baseline", str(path), "--repeat", "1", "--retries", "0"]) == 1
@@ -0,0 +1,98 @@
+import os
+import sys
+import asyncio
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.callback_store import CallbackIngestor, CallbackStore, get_callback_ingestor
+from tests.helpers import StubIngestor
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+
+CALLBACK = MOCK_TASK_QUERY_SUCCESS["data"]
+
+
+def test_callbacks_are_batched_and_deduplicated(tmp_path):
+    store = CallbackStore(str(tmp_path / "callbacks.db"))
+
+    async def scenario():
+        ingestor = CallbackIngestor(store, queue_size=100, batch_size=10)
+        processing = {**CALLBACK, "task_status": "processing"}
+        for payload in [processing, CALLBACK, CALLBACK]:
+            assert ingestor.submit(payload)
+        await ingestor.stop()
+        return ingestor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["accepted"] == 2
+    assert stats["duplicates"] == 1
+    assert stats["written"] == 2
+
+    rows = store.get("task_t2v_001")
+    assert [row["task_status"] for row in rows] == ["processing", "succeed"]
+    assert rows[1]["payload"]["task_result"]["videos"][0]["id"] == "vid_001"
+
+
+def test_redelivery_after_restart_is_idempotent(tmp_path):
+    path = str(tmp_path / "callbacks.db")
+
+    async def deliver():
+        ingestor = CallbackIngestor(CallbackStore(path))
+        ingestor.submit(CALLBACK)
+        await ingestor.stop()
+
+    asyncio.run(deliver())
+    asyncio.run(deliver())
+    rows = CallbackStore(path).get("task_t2v_001")
+    assert len(rows) == 1
+    assert rows[0]["deliveries"] == 2
+
+
+class FlakyStore(CallbackStore):
+    """Fails its first write, like a locked or full disk."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failures = 1
+
+    def write_batch(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk I/O error")
+        super().write_batch(rows)
+
+
+def test_failed_write_is_retried_until_stored(tmp_path):
+    store = FlakyStore(str(tmp_path / "callbacks.db"))
+
+    async def scenario():
+        ingestor = CallbackIngestor(store, retry_delay=0.01)
+        assert ingestor.submit(CALLBACK)
+        await ingestor.stop()
+        return ingestor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["write_errors"] == 1
+    assert stats["written"] == 1
+    assert [row["task_status"] for row in CallbackStore(store.path).get("task_t2v_001")] == ["succeed"]
+
+
+def test_callback_endpoint_acks_and_sheds_load():
+    client = TestClient(app)
+    stub = StubIngestor()
+    app.dependency_overrides[get_callback_ingestor] = lambda: stub
+    try:
+        assert client.post("/callback", json=CALLBACK).json() == {"status": "received"}
+        assert stub.payloads == [CALLBACK]
+        assert client.post("/callback", content=b"not json").status_code == 400
+        assert client.post("/callback", json={"status": "succeed"}).status_code == 400
+
+        stub.accept = False
+        response = client.post("/callback", json=CALLBACK)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,164 @@
+import os
+import sys
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers, CircuitOpen
+from app.services.kling_client import KlingClient, get_kling_client
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+from tests.helpers import fast_retries, make_client
+
+
+def make_breaker(now, **options) -> CircuitBreaker:
+    settings = dict(window=10.0, min_calls=4, error_rate=0.5, slow_call=5.0, slow_rate=0.8,
+                    open_seconds=10.0, max_open_seconds=30.0, half_open_probes=2)
+    settings.update(options)
+    return CircuitBreaker("task_query", clock=lambda: now[0], **settings)
+
+
+def test_opens_on_error_rate_and_fails_fast():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for failed in (False, True, False):
+        breaker.record(breaker.acquire(), failed, 0.1)
+    assert breaker.state == CLOSED  # below min_calls
+    breaker.record(breaker.acquire(), True, 0.1)
+    assert breaker.state == OPEN
+
+    now[0] = 4.0
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.acquire()
+    assert exc.value.retry_after == pytest.approx(6.0)
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_old_outcomes_leave_the_window():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for _ in range(3):
+        breaker.record(breaker.acquire(), True, 0.1)
+    now[0] = 11.0
+    breaker.record(breaker.acquire(), True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 1
+
+
+def test_opens_on_slow_calls():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for elapsed in (6.0, 7.0, 8.0, 0.1):
+        breaker.record(breaker.acquire(), False, elapsed)
+    assert breaker.state == CLOSED  # 3/4 slow is below slow_rate
+    breaker.record(breaker.acquire(), False, 9.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probes_close_the_circuit():
+    now = [0.0]
+    breaker = make_breaker(now, min_calls=1)
+    breaker.record(breaker.acquire(), True, 0.1)
+    now[0] = 10.0
+    first, second = breaker.acquire(), breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.acquire()  # only half_open_probes at a time
+    breaker.record(first, False, 0.1)
+    breaker.record(second, False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_with_backoff():
+    now = [0.0]
+    breaker = make_breaker(now, min_calls=1)
+    breaker.record(breaker.acquire(), True, 0.1)
+    now[0] = 10.0
+    probe = breaker.acquire()
+    cancelled = breaker.acquire()
+    breaker.record(probe, True, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.open_until == pytest.approx(30.0)
+    # A probe finishing after the circuit reopened changes nothing
+    breaker.release(cancelled)
+    assert breaker.snapshot()["probes_in_flight"] == 0
+
+    now[0] = 30.0
+    breaker.record(breaker.acquire(), True, 0.1)
+    assert breaker.open_until == pytest.approx(60.0)  # capped at max_open_seconds
+
+
+def test_client_stops_calling_kling_once_open():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(503, json={"code": 5000, "message": "unavailable"})
+
+    breakers = CircuitBreakers(enabled=True, window=60.0, min_calls=3, error_rate=0.5)
+    client = make_client(handler, retry_policy=fast_retries(max_attempts=2), breakers=breakers)
+
+    async def scenario():
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_task("/videos/text2video", "t1")
+        with pytest.raises(CircuitOpen):
+            # The third failed attempt opens the circuit, the retry after it fails fast
+            await client.get_task("/videos/text2video", "t1")
+        with pytest.raises(CircuitOpen):
+            await client.get_task("/videos/text2video", "t1")
+        # Other families keep their own circuit
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.create_text2video({"prompt": "x"})
+        await client.close()
+
+    asyncio.run(scenario())
+    assert calls.count("/v1/videos/text2video/t1") == 3
+    snapshot = breakers.snapshot()["families"]
+    assert snapshot["task_query"]["state"] == OPEN
+    assert snapshot["video_create"]["state"] == CLOSED
+
+
+def test_client_errors_do_not_open_the_circuit():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404, json={"code": 1203, "message": "not found"})
+        return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+    breakers = CircuitBreakers(enabled=True, min_calls=2)
+    client = make_client(handler, retry_policy=fast_retries(), breakers=breakers)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.get_task("/videos/text2video", "missing")
+        await client.get_task("/videos/text2video", "t1")
+        await client.close()
+
+    asyncio.run(scenario())
+    assert breakers.snapshot()["families"]["task_query"]["state"] == CLOSED
+
+
+def test_router_maps_open_circuit_to_503_and_admin_shows_state():
+    mock_client = AsyncMock(spec=KlingClient)
+    mock_client.create_text2video.side_effect = CircuitOpen("video_create", 7.2)
+    mock_client.breakers = CircuitBreakers(enabled=True)
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    try:
+        http = TestClient(app)
+        response = http.post("/api/v1/videos/text2video", json={"prompt": "a cat"})
+        breakers = http.get("/api/v1/admin/breakers").json()
+        reset = http.post("/api/v1/admin/breakers/task_query/reset")
+        unknown = http.post("/api/v1/admin/breakers/nope/reset")
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "8"
+    assert breakers["families"]["video_create"]["state"] == CLOSED
+    assert reset.json()["state"] == CLOSED
+    assert unknown.status_code == 404
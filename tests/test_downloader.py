@@ -0,0 +1,161 @@
+import os
+import sys
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.downloader import ResultDownloader
+
+VIDEO = os.urandom(300_000)
+
+
+class CDN:
+    """Threaded local HTTP server standing in for Kling's CDN (Range + MD5 ETag)."""
+
+    def __init__(self):
+        self.files = {}
+        self.cut_once = set()  # paths whose first response stops half-way
+        self.bad_etag = set()
+        self.requests = []
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                cdn.requests.append((self.path, self.headers.get("Range")))
+                data = cdn.files.get(self.path)
+                if data is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=")[1].rstrip("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                body = data[start:]
+                etag = "0" * 32 if self.path in cdn.bad_etag else hashlib.md5(data).hexdigest()
+                self.send_header("ETag", f'"{etag}"')
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.path in cdn.cut_once:
+                    cdn.cut_once.discard(self.path)
+                    self.wfile.write(body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def cdn():
+    server = CDN()
+    yield server
+    server.close()
+
+
+def make_downloader(tmp_path) -> ResultDownloader:
+    return ResultDownloader(str(tmp_path), enabled=True, concurrency=2, max_attempts=3,
+                            chunk_size=16 * 1024, retry_delay=0.01)
+
+
+def run(downloader, *urls):
+    async def scenario():
+        for url in urls:
+            downloader.schedule(url)
+        await downloader.join()
+        await downloader.stop()
+    asyncio.run(scenario())
+
+
+def test_interrupted_download_resumes_with_range(cdn, tmp_path):
+    cdn.files["/v/out.mp4"] = VIDEO
+    cdn.cut_once.add("/v/out.mp4")
+    downloader = make_downloader(tmp_path)
+    url = cdn.base + "/v/out.mp4"
+    run(downloader, url)
+
+    asset = downloader._assets[url]
+    assert asset.state == "done" and asset.resumed == 1
+    assert cdn.requests[0][1] is None and cdn.requests[1][1].startswith("bytes=")
+    with open(downloader.path_for(asset.name), "rb") as f:
+        assert f.read() == VIDEO
+    assert asset.sha256 == hashlib.sha256(VIDEO).hexdigest()
+
+
+def test_urls_are_downloaded_once(cdn, tmp_path):
+    cdn.files["/v/a.mp4"] = VIDEO
+    downloader = make_downloader(tmp_path)
+    url = cdn.base + "/v/a.mp4"
+    task = {"task_id": "t1", "task_status": "succeed", "task_result": {"videos": [{"id": "1", "url": url}]}}
+
+    async def scenario():
+        downloader.on_response(("videos", "text2video", "t1"), {"code": 0, "data": task})
+        downloader.on_callback(task)
+        await downloader.join()
+        await downloader.stop()
+    asyncio.run(scenario())
+
+    assert len(cdn.requests) == 1
+    assert downloader.stats()["deduped"] == 1
+    annotated = downloader.annotate(task)
+    name = ResultDownloader.name_for(url)
+    assert annotated["task_result"]["videos"][0]["local_url"] == f"/downloads/{name}"
+    assert "local_url" not in task["task_result"]["videos"][0]
+
+    # Already on disk: a fresh downloader (e.g. after a restart) does not fetch it again
+    again = make_downloader(tmp_path)
+    run(again, url)
+    assert again._assets[url].state == "done" and again._assets[url].size == len(VIDEO)
+    assert len(cdn.requests) == 1
+
+
+def test_checksum_mismatch_fails_without_keeping_the_file(cdn, tmp_path):
+    cdn.files["/i/bad.png"] = VIDEO[:1000]
+    cdn.bad_etag.add("/i/bad.png")
+    downloader = make_downloader(tmp_path)
+    url = cdn.base + "/i/bad.png"
+    run(downloader, url)
+
+    asset = downloader._assets[url]
+    assert asset.state == "failed" and "MD5" in asset.error
+    assert downloader.path_for(asset.name) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_download_is_retried_when_scheduled_again(cdn, tmp_path):
+    downloader = make_downloader(tmp_path)
+    url = cdn.base + "/v/late.mp4"
+
+    async def scenario():
+        downloader.schedule(url)
+        await downloader.join()
+        assert downloader._assets[url].state == "failed"  # 404: not published yet
+        cdn.files["/v/late.mp4"] = VIDEO
+        downloader.schedule(url)
+        await downloader.join()
+        await downloader.stop()
+    asyncio.run(scenario())
+
+    asset = downloader._assets[url]
+    assert asset.state == "done" and asset.error is None
+    assert downloader.stats()["failed"] == 1 and downloader.stats()["completed"] == 1
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import asyncio
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.callback_store import get_callback_ingestor
+from app.services.circuit_breaker import CircuitBreakers
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.task_cache import TaskStatusCache, get_task_cache
+from tests.kling_simulator import KlingSimulator, Latency, ServerThread
+from tests.loadgen import LoadGenerator
+from tests.helpers import StubIngestor, fast_retries
+
+
+def real_client(base_url: str) -> KlingClient:
+    """
+    A KlingClient with its real httpx pool, pointed at the simulator. The
+    circuit breakers are off: injected outages would otherwise open them
+    and turn the upstream statuses the tests look for into local 503s.
+    """
+    client = KlingClient(access_key="ak" * 16, secret_key="sk" * 16, base_url=base_url,
+                         retry_policy=fast_retries(max_attempts=3), breakers=CircuitBreakers(enabled=False))
+    for family in ("video_create", "image_create", "task_query"):
+        client.governor.configure(family, qps=1000, burst=1000, concurrency=100)
+    return client
+
+
+@pytest.fixture
+def stack():
+    """Simulator and service, each under uvicorn on a local port."""
+    servers = []
+    ingestor = StubIngestor()
+
+    def start(simulator: KlingSimulator):
+        simulator_server = simulator.serve_in_thread()
+        servers.append(simulator_server)
+        client = real_client(simulator_server.url + "/v1")
+        app.dependency_overrides[get_kling_client] = lambda: client
+        app.dependency_overrides[get_callback_ingestor] = lambda: ingestor
+        idempotency_cache = IdempotencyCache()
+        app.dependency_overrides[get_idempotency_cache] = lambda: idempotency_cache
+        task_cache = TaskStatusCache(active_ttl=0.05)
+        app.dependency_overrides[get_task_cache] = lambda: task_cache
+        service = ServerThread(app)
+        servers.insert(0, service)
+        return service.url, ingestor
+
+    yield start
+    for server in servers:
+        server.stop()
+    app.dependency_overrides = {}
+
+
+def drive(service_url: str, **options):
+    async def scenario():
+        async with httpx.AsyncClient(base_url=service_url, timeout=30) as http:
+            generator = LoadGenerator(http, options.pop("mix"), callback_url=options.pop("callback_url", None), seed=7)
+            report = await generator.run(**options)
+            return generator, report
+    return asyncio.run(scenario())
+
+
+def test_task_lifecycle_and_callbacks_end_to_end(stack):
+    simulator = KlingSimulator(create_latency=Latency(0.01), query_latency=Latency(0.005),
+                               task_duration=Latency(0.3, 0.2), processing_after=0.1, failure_rate=0.3, seed=1)
+    service_url, ingestor = stack(simulator)
+    generator, report = drive(service_url, mix={"create_video": 1, "create_image": 1, "get_task": 3},
+                              callback_url=f"{service_url}/callback", concurrency=8, requests=60)
+
+    summary = report.summary()
+    assert summary["total"]["error_rate"] == 0, summary
+    assert summary["routes"]["POST /api/v1/videos/text2video"]["p99_ms"] > 0
+    created = {path.rsplit("/", 1)[1] for path in generator.tasks}
+    assert created and created == set(simulator.tasks)
+
+    # Every task reaches a terminal state, visible through the service and through callbacks
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        terminal = {p["task_id"]: p["task_status"] for p in ingestor.payloads if p["task_status"] in ("succeed", "failed")}
+        if set(terminal) == created:
+            break
+        time.sleep(0.05)
+    assert set(terminal) == created
+    failed = {task_id for task_id, task in simulator.tasks.items() if task.fails}
+    assert {task_id for task_id, status in terminal.items() if status == "failed"} == failed
+
+    statuses = set()
+    with httpx.Client(base_url=service_url) as http:
+        for path in generator.tasks[:10]:
+            body = http.get(f"/api/v1/tasks/{path}").json()
+            statuses.add(body["message"])
+            if body["message"] == "succeed":
+                assert body["raw_data"]["task_result"]
+    assert statuses <= {"succeed", "failed"}
+
+
+def test_quota_and_outages_surface_as_retryable_errors(stack):
+    # A quota of 3 submissions, refilled once a second, is exhausted well before the ~75 creates are done
+    simulator = KlingSimulator(quota_qps=1, quota_burst=3, burst_rate=0.05, burst_duration=0.05,
+                               task_duration=Latency(0.2), seed=3)
+    service_url, _ = stack(simulator)
+    _, report = drive(service_url, mix={"create_video": 1, "get_task": 1}, concurrency=10, requests=150)
+
+    statuses = report.summary()["total"]["statuses"]
+    assert statuses.get("200", 0) > 0
+    # Kling's rejections reach callers with their own status, never as internal errors
+    assert set(statuses) <= {"200", "429", "503"}, statuses
+    assert simulator.counters.get("http_429", 0) > 0
+    assert simulator.counters.get("bursts", 0) > 0
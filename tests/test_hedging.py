@@ -0,0 +1,176 @@
+import os
+import sys
+import asyncio
+import time
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.hedging import Hedger
+from app.services.rate_limit import RateLimitExceeded
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+from tests.helpers import make_client
+
+
+def make_hedger(**options) -> Hedger:
+    settings = dict(enabled=True, min_delay=0.01, max_delay=0.01, budget=1.0, samples=100)
+    settings.update(options)
+    return Hedger(**settings)
+
+
+def test_hedge_wins_and_loser_is_cancelled():
+    async def scenario():
+        hedger = make_hedger(base_urls=["https://alt.test/v1"])
+        cancelled = []
+        seen = []
+
+        async def primary():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append("primary")
+                raise
+
+        async def hedge(base_url):
+            seen.append(base_url)
+            return "hedged"
+
+        assert await hedger.run(primary, hedge) == "hedged"
+        await asyncio.sleep(0)
+        assert cancelled == ["primary"]
+        assert seen == ["https://alt.test/v1"]
+        assert hedger.stats()["hedge_wins"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_losing_attempts_are_observed_until_cancelled():
+    async def scenario():
+        hedger = make_hedger(min_delay=0.05, max_delay=0.05)
+
+        async def primary():
+            await asyncio.sleep(10)
+
+        async def hedge(base_url):
+            return "hedged"
+
+        assert await hedger.run(primary, hedge) == "hedged"
+        await asyncio.sleep(0)
+        latencies = sorted(hedger._latencies)
+        assert len(latencies) == 2
+        # The cancelled primary counts with at least the time it was waited for
+        assert latencies[0] < 0.05 <= latencies[1]
+
+    asyncio.run(scenario())
+
+
+def test_fast_primary_is_not_hedged():
+    async def scenario():
+        hedger = make_hedger(max_delay=1.0)
+
+        async def primary():
+            return "first"
+
+        async def hedge(base_url):
+            raise AssertionError("should not hedge")
+
+        assert await hedger.run(primary, hedge) == "first"
+        assert hedger.hedges == 0
+
+    asyncio.run(scenario())
+
+
+def test_budget_caps_hedges():
+    async def scenario():
+        hedger = make_hedger(budget=0.5)
+
+        async def primary():
+            await asyncio.sleep(0.03)
+            return "first"
+
+        async def hedge(base_url):
+            await asyncio.sleep(1)
+
+        for _ in range(6):
+            assert await hedger.run(primary, hedge) == "first"
+        assert hedger.hedges == 3
+        assert hedger.budget_exhausted == 3
+
+    asyncio.run(scenario())
+
+
+def test_primary_error_raised_when_both_fail():
+    async def scenario():
+        hedger = make_hedger()
+
+        async def primary():
+            await asyncio.sleep(0.02)
+            raise ValueError("primary")
+
+        async def hedge(base_url):
+            raise KeyError("hedge")
+
+        with pytest.raises(ValueError):
+            await hedger.run(primary, hedge)
+
+    asyncio.run(scenario())
+
+
+def test_locally_refused_hedge_is_not_counted_or_observed():
+    async def scenario():
+        hedger = make_hedger(budget=1.0)
+
+        async def primary():
+            await asyncio.sleep(0.03)
+            return "first"
+
+        async def hedge(base_url):
+            raise RateLimitExceeded("task_query", 0.5)
+
+        assert await hedger.run(primary, hedge) == "first"
+        assert hedger.hedges == 0
+        assert hedger.hedges_not_sent == 1
+        # Only the primary's latency is known, and the token is back for the next call
+        assert len(hedger._latencies) == 1
+        assert hedger._tokens == pytest.approx(1.0)
+
+    asyncio.run(scenario())
+
+
+def test_delay_follows_latency_percentile():
+    hedger = make_hedger(min_delay=0.0, max_delay=5.0, percentile=90.0)
+    assert hedger.delay() == 5.0  # not enough samples yet
+    for i in range(100):
+        hedger.observe(i / 100)
+    assert hedger.delay() == pytest.approx(0.9)
+    for _ in range(100):
+        hedger.observe(10.0)
+    assert hedger.delay() == 5.0  # clamped
+
+
+def test_client_hedges_task_query_to_alternate_base_url():
+    seen = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        if request.url.host == "kling.test":
+            await asyncio.sleep(5)
+        return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+    client = make_client(handler, hedger=make_hedger(base_urls=["https://kling-alt.test/v1"]))
+
+    async def scenario():
+        started = time.monotonic()
+        response = await client.get_task("/videos/text2video", "task_t2v_001")
+        elapsed = time.monotonic() - started
+        await client.close()
+        return response, elapsed
+
+    response, elapsed = asyncio.run(scenario())
+    assert response["data"]["task_id"] == MOCK_TASK_QUERY_SUCCESS["data"]["task_id"]
+    assert elapsed < 2
+    assert seen == ["kling.test", "kling-alt.test"]
+    assert client.hedger.stats()["hedge_wins"] == 1
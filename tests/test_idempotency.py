@@ -0,0 +1,143 @@
+import os
+import sys
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.idempotency import IdempotencyCache, IdempotencyConflict, get_idempotency_cache
+from app.services.kling_client import KlingClient, get_kling_client
+from tests.mock_kling_response import MOCK_TEXT2VIDEO_RESPONSE, MOCK_ERROR_RESPONSE
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def mock_kling_client():
+    mock_client = AsyncMock(spec=KlingClient)
+    mock_client.create_text2video.return_value = MOCK_TEXT2VIDEO_RESPONSE
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    cache = IdempotencyCache(window=60)
+    app.dependency_overrides[get_idempotency_cache] = lambda: cache
+    yield mock_client
+    app.dependency_overrides = {}
+
+
+def test_concurrent_submissions_share_one_call():
+    async def scenario():
+        cache = IdempotencyCache(window=60)
+        calls = []
+
+        async def submit():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "task-1"
+
+        results = await asyncio.gather(*[cache.run(("s", "k"), "fp", submit) for _ in range(5)])
+        assert results == ["task-1"] * 5
+        assert len(calls) == 1
+        assert await cache.run(("s", "k"), "fp", submit) == "task-1"
+        stats = cache.stats()
+        assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+    asyncio.run(scenario())
+
+
+def test_results_expire_and_failures_are_not_remembered():
+    async def scenario():
+        now = [0.0]
+        cache = IdempotencyCache(window=10, clock=lambda: now[0])
+        outcomes = [RuntimeError("boom"), "task-1", "task-2"]
+
+        async def submit():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with pytest.raises(RuntimeError):
+            await cache.run("k", "fp", submit)
+        assert await cache.run("k", "fp", submit) == "task-1"
+        assert await cache.run("k", "fp", submit) == "task-1"
+        now[0] = 11
+        assert await cache.run("k", "fp", submit) == "task-2"
+
+    asyncio.run(scenario())
+
+
+def test_reused_key_with_other_payload_conflicts():
+    async def scenario():
+        cache = IdempotencyCache(window=60)
+
+        async def submit():
+            return "task-1"
+
+        await cache.run(("s", "key", "abc"), "fp-1", submit, explicit=True)
+        with pytest.raises(IdempotencyConflict):
+            await cache.run(("s", "key", "abc"), "fp-2", submit, explicit=True)
+
+    asyncio.run(scenario())
+
+
+def test_repeated_payload_without_key_submits_again(mock_kling_client):
+    payload = {"prompt": "a cat"}
+    first = client.post("/api/v1/videos/text2video", json=payload)
+    second = client.post("/api/v1/videos/text2video", json=payload)
+    assert first.status_code == second.status_code == 200
+    assert mock_kling_client.create_text2video.call_count == 2
+    sent = [call[0][0]["external_task_id"] for call in mock_kling_client.create_text2video.call_args_list]
+    assert sent[0].startswith("idem-") and sent[0] != sent[1]
+
+
+def test_payload_replay_is_opt_in(mock_kling_client):
+    cache = IdempotencyCache(window=60, replay_payloads=True)
+    app.dependency_overrides[get_idempotency_cache] = lambda: cache
+    payload = {"prompt": "a cat"}
+    first = client.post("/api/v1/videos/text2video", json=payload)
+    second = client.post("/api/v1/videos/text2video", json=payload)
+    assert first.json() == second.json()
+    mock_kling_client.create_text2video.assert_called_once()
+
+
+def test_concurrent_payloads_coalesce_without_being_remembered():
+    async def scenario():
+        cache = IdempotencyCache(window=60)
+        calls = []
+
+        async def submit():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return f"task-{len(calls)}"
+
+        results = await asyncio.gather(*[cache.run("k", "fp", submit, remember=False) for _ in range(3)])
+        assert results == ["task-1"] * 3
+        assert await cache.run("k", "fp", submit, remember=False) == "task-2"
+        assert len(cache) == 0
+
+    asyncio.run(scenario())
+
+
+def test_idempotency_key_header(mock_kling_client):
+    headers = {"Idempotency-Key": "order-42"}
+    assert client.post("/api/v1/videos/text2video", json={"prompt": "a"}, headers=headers).status_code == 200
+    assert client.post("/api/v1/videos/text2video", json={"prompt": "a"}, headers=headers).status_code == 200
+    mock_kling_client.create_text2video.assert_called_once()
+
+    conflict = client.post("/api/v1/videos/text2video", json={"prompt": "b"}, headers=headers)
+    assert conflict.status_code == 422
+    # A caller-chosen external_task_id is never replaced
+    client.post("/api/v1/videos/text2video", json={"prompt": "c", "external_task_id": "mine"})
+    assert mock_kling_client.create_text2video.call_args[0][0]["external_task_id"] == "mine"
+
+
+def test_error_responses_are_not_replayed(mock_kling_client):
+    mock_kling_client.create_text2video.return_value = MOCK_ERROR_RESPONSE
+    assert client.post("/api/v1/videos/text2video", json={"prompt": "a"}).status_code == 400
+    mock_kling_client.create_text2video.return_value = MOCK_TEXT2VIDEO_RESPONSE
+    assert client.post("/api/v1/videos/text2video", json={"prompt": "a"}).status_code == 200
+    assert mock_kling_client.create_text2video.call_count == 2
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import httpx
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services import json_codec
+from app.services.downloader import ResultDownloader, get_result_downloader
+from app.services.kling_client import get_kling_client
+from app.services.task_cache import TaskStatusCache, get_task_cache
+from app.services.task_index import TaskIndex, get_task_index
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+from tests.helpers import make_client
+
+
+def test_dumps_matches_stdlib_output():
+    value = {"prompt": "猫 \"quoted\"", "n": 1, "x": 1.5, "ok": True, "none": None, "list": [1, {"a": []}]}
+    expected = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert json_codec.dumps(value) == expected
+    assert json_codec.loads(expected) == value
+    assert json_codec.dumps({1: 2**70}) == b'{"1":1180591620717411303424}'
+
+
+def test_fast_responses_match_validated_ones(tmp_path):
+    client = make_client(lambda request: httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS))
+    index = TaskIndex(":memory:")
+    index.upsert("task_1", {"task_id": "task_1", "task_status": "succeed", "created_at": 1, "updated_at": 2},
+                 endpoint="/videos/text2video", model_name="kling-v1")
+    app.dependency_overrides[get_kling_client] = lambda: client
+    app.dependency_overrides[get_task_cache] = lambda: TaskStatusCache(active_ttl=0, terminal_ttl=0)
+    app.dependency_overrides[get_result_downloader] = lambda: ResultDownloader(str(tmp_path), enabled=False)
+    app.dependency_overrides[get_task_index] = lambda: index
+    fast_json = json_codec.FAST_JSON
+    urls = ["/api/v1/tasks/videos/text2video/task_t2v_001", "/api/v1/tasks?limit=10"]
+    try:
+        with TestClient(app) as http:
+            bodies = {}
+            for fast in (False, True):
+                json_codec.FAST_JSON = fast
+                bodies[fast] = [http.get(url) for url in urls]
+    finally:
+        json_codec.FAST_JSON = fast_json
+        app.dependency_overrides = {}
+
+    for standard, fast in zip(bodies[False], bodies[True]):
+        assert standard.status_code == fast.status_code == 200
+        assert standard.json() == fast.json()
+        assert fast.headers["content-type"] == "application/json"
+    assert bodies[True][0].json()["raw_data"] == MOCK_TASK_QUERY_SUCCESS["data"]
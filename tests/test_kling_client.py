@@ -0,0 +1,143 @@
+import os
+import sys
+import asyncio
+import httpx
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.retry import parse_retry_after
+from tests.helpers import fast_retries, make_client
+from tests.mock_kling_response import MOCK_TEXT2VIDEO_RESPONSE, MOCK_TASK_QUERY_SUCCESS
+
+
+def test_timeouts_per_operation():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen[request.method] = request.extensions["timeout"]
+        if request.method == "GET":
+            return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+        return httpx.Response(200, json=MOCK_TEXT2VIDEO_RESPONSE)
+
+    client = make_client(
+        handler,
+        query_timeout=httpx.Timeout(2.0, read=3.0),
+        create_timeout=httpx.Timeout(5.0, read=90.0),
+    )
+
+    async def scenario():
+        await client.get_task("/videos/text2video", "task_t2v_001")
+        await client.create_text2video({"prompt": "x"})
+        await client.close()
+
+    asyncio.run(scenario())
+    assert seen["GET"]["read"] == 3.0
+    assert seen["POST"]["read"] == 90.0
+
+
+def test_pool_saturation_counters():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await release.wait()
+            return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+        client = make_client(handler, max_connections=2)
+        calls = [asyncio.create_task(client.get_task("/videos/text2video", str(i))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        stats = client.pool_stats()
+        assert stats["in_flight"] == 3
+        assert stats["saturated_requests"] == 1
+
+        release.set()
+        await asyncio.gather(*calls)
+        stats = client.pool_stats()
+        assert stats["in_flight"] == 0
+        assert stats["peak_in_flight"] == 3
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_get_retried_until_success():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) < 3:
+            return httpx.Response(502)
+        return httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)
+
+    client = make_client(handler, retry_policy=fast_retries())
+    result = asyncio.run(client.get_task("/videos/text2video", "task_t2v_001"))
+    assert result["data"]["task_status"] == "succeed"
+    assert len(attempts) == 3
+    assert client.retry_stats() == {"retries": 2, "give_ups": 0}
+
+
+def test_post_retried_only_with_external_task_id():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        return httpx.Response(503)
+
+    client = make_client(handler, retry_policy=fast_retries(max_attempts=3))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.create_text2video({"prompt": "x"}))
+    assert len(attempts) == 1
+
+    attempts.clear()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.create_text2video({"prompt": "x", "external_task_id": "ext_001"}))
+    assert len(attempts) == 3
+    assert client.retry_stats() == {"retries": 2, "give_ups": 1}
+
+
+def test_retry_after_is_honored(monkeypatch):
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    responses = [httpx.Response(429, headers={"Retry-After": "2"}), httpx.Response(200, json=MOCK_TASK_QUERY_SUCCESS)]
+
+    client = make_client(lambda request: responses.pop(0), retry_policy=fast_retries())
+    asyncio.run(client.get_task("/videos/text2video", "task_t2v_001"))
+    assert sleeps == [2.0]
+
+    # A Retry-After beyond the deadline budget gives up immediately
+    responses = [httpx.Response(429, headers={"Retry-After": "60"})]
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.get_task("/videos/text2video", "task_t2v_001"))
+    assert client.retry_stats()["give_ups"] == 1
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=1445412500.0) == 10.0
+    assert parse_retry_after("garbage") is None
+
+
+def test_task_listeners_see_created_tasks():
+    client = make_client(lambda request: httpx.Response(200, json=MOCK_TEXT2VIDEO_RESPONSE))
+    created = []
+    client.task_listeners.append(lambda endpoint, data: created.append((endpoint, data["task_id"])))
+    asyncio.run(client.create_text2video({"prompt": "x"}))
+    assert created == [("/videos/text2video", "task_t2v_001")]
+
+
+def test_submission_listeners_see_request_and_account():
+    client = make_client(lambda request: httpx.Response(200, json=MOCK_TEXT2VIDEO_RESPONSE))
+    submitted = []
+    client.submission_listeners.append(
+        lambda endpoint, data, body, account: submitted.append((data["task_id"], body["mode"], account))
+    )
+    asyncio.run(client.create_text2video({"prompt": "x", "mode": "pro"}))
+    assert submitted == [("task_t2v_001", "pro", "default")]
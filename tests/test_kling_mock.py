@@ -1,7 +1,8 @@
 import os
 import sys
+import time
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
 from fastapi.testclient import TestClient
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -10,6 +11,10 @@ if PROJECT_ROOT not in sys.path:
 
 from main import app
 from app.services.kling_client import get_kling_client, KlingClient
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.task_cache import TaskStatusCache, get_task_cache
+from app.services.poller import TaskPoller, get_task_poller
+from app.services.task_events import TaskEventHub, get_task_event_hub
 from tests.mock_kling_response import (
     MOCK_TEXT2VIDEO_RESPONSE, 
     MOCK_TASK_QUERY_SUCCESS,
@@ -33,6 +38,13 @@ def mock_kling_client():
 @pytest.fixture
 def override_dependency(mock_kling_client):
     app.dependency_overrides[get_kling_client] = lambda: mock_kling_client
+    # Fresh cache per test so cached task states never leak between tests
+    task_cache = TaskStatusCache()
+    app.dependency_overrides[get_task_cache] = lambda: task_cache
+    idempotency_cache = IdempotencyCache()
+    app.dependency_overrides[get_idempotency_cache] = lambda: idempotency_cache
+    poller = TaskPoller(mock_kling_client, task_cache)
+    app.dependency_overrides[get_task_poller] = lambda: poller
     yield
     app.dependency_overrides = {}
 
@@ -61,6 +73,24 @@ def test_create_text2video(override_dependency, mock_kling_client):
     assert call_args["prompt"] == payload["prompt"]
     assert call_args["model_name"] == payload["model_name"]
 
+def test_request_timeout_header_becomes_client_deadline(override_dependency, mock_kling_client):
+    started = time.monotonic()
+    response = client.post("/api/v1/videos/text2video", json={"prompt": "a cat"},
+                           headers={"X-Request-Timeout": "1500"})
+    assert response.status_code == 200
+    deadline = mock_kling_client.create_text2video.call_args.kwargs["deadline"]
+    assert started + 1.5 <= deadline <= time.monotonic() + 1.5
+
+    client.get("/api/v1/tasks/videos/text2video/task_t2v_001", headers={"X-Request-Timeout": "200"})
+    assert mock_kling_client.get_task.call_args.kwargs["deadline"] <= time.monotonic() + 0.2
+
+@pytest.mark.parametrize("timeout", ["soon", "0", "-5", "inf"])
+def test_invalid_request_timeout_is_rejected(override_dependency, mock_kling_client, timeout):
+    response = client.post("/api/v1/videos/text2video", json={"prompt": "a cat"},
+                           headers={"X-Request-Timeout": timeout})
+    assert response.status_code == 400
+    mock_kling_client.create_text2video.assert_not_called()
+
 def test_get_task_status(override_dependency, mock_kling_client):
     task_id = "task_t2v_001"
     response = client.get(f"/api/v1/tasks/videos/text2video/{task_id}")
@@ -71,7 +101,7 @@ def test_get_task_status(override_dependency, mock_kling_client):
     assert data["message"] == "succeed"
     assert data["raw_data"]["task_result"]["videos"][0]["url"] == "https://cdn.klingai.com/videos/generated_001.mp4"
     
-    mock_kling_client.get_task.assert_called_once_with("/videos/text2video", task_id)
+    mock_kling_client.get_task.assert_called_once_with("/videos/text2video", task_id, deadline=None)
 
 def test_identify_face(override_dependency, mock_kling_client):
     payload = {"video_url": "https://example.com/video.mp4"}
@@ -83,3 +113,45 @@ def test_identify_face(override_dependency, mock_kling_client):
     assert len(data["face_data"]) == 1
     
     mock_kling_client.identify_face.assert_called_once()
+
+def test_get_task_status_is_cached(override_dependency, mock_kling_client):
+    task_id = "task_t2v_001"
+    for _ in range(3):
+        response = client.get(f"/api/v1/tasks/videos/text2video/{task_id}")
+        assert response.status_code == 200
+        assert response.json()["message"] == "succeed"
+
+    # Finished tasks are served from the cache after the first poll
+    mock_kling_client.get_task.assert_called_once_with("/videos/text2video", task_id, deadline=None)
+
+def test_wait_returns_finished_task_immediately(override_dependency, mock_kling_client):
+    response = client.get("/api/v1/tasks/videos/text2video/task_t2v_001/wait?timeout=5")
+    assert response.status_code == 200
+    assert response.json()["message"] == "succeed"
+
+def test_waiters_share_one_poller_started_on_demand(override_dependency, mock_kling_client, monkeypatch):
+    processing = {**MOCK_TASK_QUERY_SUCCESS, "data": {**MOCK_TASK_QUERY_SUCCESS["data"], "task_status": "processing"}}
+    mock_kling_client.get_task.side_effect = [processing, MOCK_TASK_QUERY_SUCCESS]
+    monkeypatch.setenv("KLING_POLLER_ENABLED", "false")
+    # Startup wiring does not run here: connect the cache to a private hub by hand
+    hub = TaskEventHub()
+    task_cache = TaskStatusCache(active_ttl=0)
+    task_cache.listeners.append(hub.publish_response)
+    poller = TaskPoller(mock_kling_client, task_cache, schedule=((3600.0, 0.01),))
+    app.dependency_overrides[get_task_event_hub] = lambda: hub
+    app.dependency_overrides[get_task_cache] = lambda: task_cache
+    app.dependency_overrides[get_task_poller] = lambda: poller
+    response = client.get("/api/v1/tasks/videos/text2video/task_t2v_001/wait?timeout=5")
+    assert response.status_code == 200
+    assert response.json()["message"] == "succeed"
+    # The waiter itself made one query; the refresh that finished the task came from the poller
+    assert mock_kling_client.get_task.call_count == 2
+    assert poller.stats()["refreshes"] == 1 and poller.stats()["tracked"] == 0
+
+def test_wait_times_out_with_current_state(override_dependency, mock_kling_client):
+    processing = {**MOCK_TASK_QUERY_SUCCESS, "data": {**MOCK_TASK_QUERY_SUCCESS["data"], "task_status": "processing"}}
+    mock_kling_client.get_task.return_value = processing
+    response = client.get("/api/v1/tasks/videos/text2video/task_t2v_001/wait?timeout=0.05")
+    assert response.status_code == 200
+    assert response.json()["message"] == "processing"
+    mock_kling_client.get_task.assert_called_once()
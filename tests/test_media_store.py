@@ -0,0 +1,142 @@
+import os
+import sys
+import io
+import json
+import base64
+import asyncio
+import threading
+import httpx
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.media_store import MediaStore, get_media_store
+from app.services.uploads import StreamingJSONBody
+from tests.mock_kling_response import MOCK_IMAGE2VIDEO_RESPONSE
+from tests.helpers import make_client
+
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(6000)
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def test_repeated_images_become_urls(tmp_path):
+    store = MediaStore(str(tmp_path), public_url="https://svc.test/", min_bytes=100)
+
+    async def scenario():
+        first = await store.externalize({"prompt": "p", "image": b64(PNG), "image_tail": "c21hbGw="})
+        second = await store.externalize({"image_list": [b64(PNG), "https://cdn.test/a.png"]})
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    digest = first["image"].rsplit("/", 1)[1]
+    assert first["image"] == f"https://svc.test/media/{digest}"
+    assert first["image_tail"] == "c21hbGw="  # below min_bytes
+    assert second["image_list"] == [first["image"], "https://cdn.test/a.png"]
+    with open(store.path_for(digest), "rb") as f:
+        assert f.read() == PNG
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert stats["bytes_saved"] == 2 * (len(b64(PNG)) - len(first["image"]))
+
+
+def test_lru_eviction_and_reload(tmp_path):
+    store = MediaStore(str(tmp_path), public_url="https://svc.test", max_bytes=2500, min_bytes=0)
+    blobs = [os.urandom(1000) for _ in range(3)]
+
+    async def put(data):
+        return (await store.externalize({"image": b64(data)}))["image"].rsplit("/", 1)[1]
+
+    async def scenario():
+        a = await put(blobs[0])
+        b = await put(blobs[1])
+        store.path_for(a)  # a is now more recently used than b
+        c = await put(blobs[2])
+        return a, b, c
+
+    a, b, c = asyncio.run(scenario())
+    assert store.path_for(b) is None and not os.path.exists(tmp_path / b)
+    assert store.path_for(a) and store.path_for(c)
+    assert store.stats()["evictions"] == 1
+
+    reloaded = MediaStore(str(tmp_path), public_url="https://svc.test", max_bytes=2500)
+    assert reloaded.path_for(a) and reloaded.stats()["size_bytes"] == 2000
+
+
+class EvictOnRelease:
+    """Store lock that runs `then` once, right after the next release: the moment another thread could run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.then = None
+
+    def __enter__(self):
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc):
+        self.lock.__exit__(*exc)
+        then, self.then = self.then, None
+        if then is not None:
+            then()
+
+
+def test_blob_evicted_while_being_stored_again_is_not_lost(tmp_path):
+    store = MediaStore(str(tmp_path), public_url="https://svc.test", max_bytes=1000, min_bytes=0)
+    first, second = os.urandom(1000), os.urandom(1000)
+    digest = store._store_bytes(first)
+    store._lock = EvictOnRelease()
+    store._lock.then = lambda: store._store_bytes(second)  # evicts `first`
+
+    assert store._store_bytes(first) == digest
+    store._store_bytes(first)
+    # However the two interleave, the index never lists a blob without its file
+    on_disk = {name: os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if not name.startswith(".")}
+    assert dict(store._blobs) == on_disk
+    with open(store.path_for(digest), "rb") as f:
+        assert f.read() == first
+
+
+def test_client_sends_urls_for_json_and_uploads(tmp_path):
+    store = MediaStore(str(tmp_path), public_url="https://svc.test", min_bytes=0)
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(json.loads(request.read()))
+        return httpx.Response(200, json=MOCK_IMAGE2VIDEO_RESPONSE)
+
+    class Upload:
+        def __init__(self, data):
+            self.file = io.BytesIO(data)
+
+    client = make_client(handler, media_store=store)
+    upload = StreamingJSONBody({"image": "@upload:1"}, {"@upload:1": (Upload(PNG), len(PNG))})
+
+    async def scenario():
+        await client.create_image2video({"image": b64(PNG)})
+        await client.create_image2video(upload)
+
+    asyncio.run(scenario())
+    assert sent[0]["image"] == sent[1]["image"]
+    assert sent[0]["image"].startswith("https://svc.test/media/")
+    assert store.stats()["hits"] == 1
+
+
+def test_media_route(tmp_path):
+    store = MediaStore(str(tmp_path), public_url="https://svc.test", min_bytes=0)
+    url = asyncio.run(store.externalize({"image": b64(PNG)}))["image"]
+    app.dependency_overrides[get_media_store] = lambda: store
+    try:
+        client = TestClient(app)
+        response = client.get(url.replace("https://svc.test", ""))
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content == PNG
+        assert client.get("/media/" + "0" * 64).status_code == 404
+        assert client.get("/media/..%2Fsecrets").status_code == 404
+    finally:
+        app.dependency_overrides = {}
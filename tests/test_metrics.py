@@ -0,0 +1,94 @@
+import os
+import sys
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.endpoints import endpoint_route
+from app.services.metrics import MetricsRegistry
+from tests.mock_kling_response import MOCK_TEXT2VIDEO_RESPONSE
+from tests.helpers import fast_retries, make_client
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Op latency.", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(("a\"b",), value)
+    registry.counter("ops_total", "Ops.", ("op",)).inc(("a",), 2)
+    registry.add_collector(lambda: [("pool_size", "gauge", "Pool size.", [({}, 10)])])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE op_seconds histogram" in lines
+    assert 'op_seconds_bucket{op="a\\"b",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{op="a\\"b",le="1"} 3' in lines
+    assert 'op_seconds_bucket{op="a\\"b",le="+Inf"} 4' in lines
+    assert 'op_seconds_count{op="a\\"b"} 4' in lines
+    assert 'op_seconds_sum{op="a\\"b"} 4.05' in lines
+    assert 'ops_total{op="a"} 2' in lines
+    assert "pool_size 10" in lines
+
+
+def test_client_records_upstream_calls():
+    responses = iter([
+        httpx.Response(200, json=MOCK_TEXT2VIDEO_RESPONSE),
+        httpx.Response(500, json={"code": 5000, "message": "boom"}),
+        httpx.Response(200, json={"code": 1303, "message": "busy"}),
+    ])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/broken"):
+            raise httpx.ConnectError("refused", request=request)
+        return next(responses)
+
+    registry = MetricsRegistry()
+    client = make_client(handler, retry_policy=fast_retries(max_attempts=1), metrics=registry)
+
+    async def scenario():
+        await client.create_text2video({"prompt": "cat"})
+        for endpoint in ("/videos/text2video/t1", "/videos/text2video/t2", "/videos/text2video/broken"):
+            try:
+                await client._request("GET", endpoint)
+            except httpx.HTTPError:
+                pass
+    asyncio.run(scenario())
+
+    m = client.metrics
+    task = ("GET", "/videos/text2video/{task_id}")
+    assert m.responses.value(("POST", "/videos/text2video", "200", "0")) == 1
+    assert m.responses.value(task + ("500", "")) == 1
+    assert m.responses.value(task + ("200", "1303")) == 1
+    assert m.errors.value(task + ("ConnectError",)) == 1
+    assert m.latency.count(task) == 3
+    assert m.request_bytes.count(("POST", "/videos/text2video")) == 1
+    assert m.request_bytes.count(task) == 0
+    names = [family[0] for family in client.metric_families()]
+    assert "kling_upstream_in_flight" in names and "kling_pool_utilization" in names
+
+
+def test_endpoint_route_labels_are_bounded():
+    assert endpoint_route("GET", "/videos/text2video/abc") == "/videos/text2video/{task_id}"
+    assert endpoint_route("GET", "/images/generations") == "/images/generations"
+    assert endpoint_route("POST", "/videos/identify-face") == "/videos/identify-face"
+    # Task query paths carry caller-supplied category and task_type
+    assert endpoint_route("GET", "/anything/goes/abc") == "other"
+    assert endpoint_route("GET", "/videos/x1/abc") == "other"
+    assert endpoint_route("POST", "/videos/unknown") == "other"
+
+
+def test_metrics_endpoint_reports_routes():
+    with TestClient(app) as http:
+        http.get("/")
+        http.get("/no-such-route")
+        response = http.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in text
+    assert 'route="unmatched",status="404"' in text
+    assert "kling_pool_max_connections" in text
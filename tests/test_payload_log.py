@@ -0,0 +1,70 @@
+import os
+import sys
+import base64
+import logging
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.payload_log import LazyPayload, PayloadLogger, summarize
+
+IMAGE = base64.b64encode(os.urandom(3 * 1024 * 1024)).decode("ascii")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_summary_hides_media_and_bounds_size():
+    payload = {
+        "model_name": "kling-v1",
+        "image": IMAGE,
+        "image_list": [IMAGE] * 50,
+        "prompt": "a cat " * 200,
+        "face_choose": [{"sound_file": "data:audio/mp3;base64," + IMAGE}],
+    }
+    summary = summarize(payload, max_string=64, max_items=5)
+    assert summary["model_name"] == "kling-v1"
+    assert summary["image"].startswith(f"<base64 {len(IMAGE)} chars sha256:")
+    assert len(summary["image_list"]) == 6 and summary["image_list"][-1] == "...+45 items"
+    assert summary["prompt"] == ("a cat " * 200)[:64] + "...(+1136 chars)"
+    assert summary["face_choose"][0]["sound_file"].startswith("<base64 ")
+
+    text = str(LazyPayload(payload, 64, 5, 300))
+    assert len(text) < 400 and IMAGE[:64] not in text
+
+
+def test_nothing_is_formatted_when_info_is_disabled(caplog):
+    class Exploding:
+        def __repr__(self):
+            raise AssertionError("payload was formatted")
+
+    logger = logging.getLogger("test_payload_log.quiet")
+    payload_logger = PayloadLogger(enabled=True, rate=0)
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        payload_logger.log(logger, "Sending payload to Kling", "Text to Video", {"x": Exploding()})
+    assert caplog.records == [] and payload_logger.logged == 0
+
+
+def test_each_event_is_sampled(caplog):
+    clock = Clock()
+    logger = logging.getLogger("test_payload_log.sampled")
+    payload_logger = PayloadLogger(enabled=True, rate=2, clock=clock)
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for _ in range(10):
+            payload_logger.log(logger, "Sending payload to Kling", "Text to Video", {"image": IMAGE})
+        payload_logger.log(logger, "Received response from Kling", "Text to Video", {"code": 0})
+        clock.now = 1.0
+        payload_logger.log(logger, "Sending payload to Kling", "Text to Video", {"image": IMAGE})
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 4
+    assert messages[2].startswith("Received response from Kling (Text to Video): {\"code\":0}")
+    assert messages[3].endswith("[8 similar lines skipped]")
+    assert all(len(message) < 200 for message in messages)
+    assert payload_logger.stats()["suppressed"] == 8
@@ -0,0 +1,68 @@
+import os
+import sys
+import asyncio
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.poller import TaskPoller, task_key
+from app.services.task_cache import TaskStatusCache
+
+
+class FakeClient:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = []
+
+    async def get_task(self, endpoint_base, task_id):
+        self.calls.append((endpoint_base, task_id))
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {"code": 0, "data": {"task_id": task_id, "task_status": status}}
+
+
+def make_poller(client, cache):
+    return TaskPoller(client, cache, concurrency=4, schedule=((60.0, 0.01),), max_interval=0.05,
+                      submitted_factor=1.0)
+
+
+def test_poller_refreshes_until_terminal():
+    async def scenario():
+        client = FakeClient(["processing", "processing", "succeed"])
+        cache = TaskStatusCache(max_entries=10, active_ttl=0, terminal_ttl=100)
+        poller = make_poller(client, cache)
+        await poller.start()
+        poller.track("/videos/text2video", {"task_id": "t1", "task_status": "submitted"})
+
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if not poller.is_tracked(("videos", "text2video", "t1")):
+                break
+        await poller.stop()
+
+        assert client.calls == [("/videos/text2video", "t1")] * 3
+        assert cache.get(("videos", "text2video", "t1"))["data"]["task_status"] == "succeed"
+        assert poller.stats()["completed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_poller_keeps_running_entries_fresh_between_polls():
+    async def scenario():
+        client = FakeClient(["processing"])
+        cache = TaskStatusCache(max_entries=10, active_ttl=0, terminal_ttl=100)
+        poller = TaskPoller(client, cache, schedule=((60.0, 5.0),), submitted_factor=1.0)
+        poller.track("/images/generations", {"task_id": "t2"})
+        await poller._refresh(poller._tracked[task_key("/images/generations", "t2")])
+        # active_ttl is 0, but the poller stored the entry until its next refresh
+        assert cache.get(("images", "generations", "t2"))["data"]["task_status"] == "processing"
+
+    asyncio.run(scenario())
+
+
+def test_terminal_and_duplicate_registrations_are_ignored():
+    poller = TaskPoller(FakeClient(["succeed"]), TaskStatusCache())
+    poller.track("/videos/text2video", {"task_id": "done", "task_status": "succeed"})
+    poller.track("/videos/text2video", {"task_id": "t3"})
+    poller.track("/videos/text2video", {"task_id": "t3"})
+    assert poller.stats()["tracked"] == 1
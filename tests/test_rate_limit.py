@@ -0,0 +1,106 @@
+import os
+import sys
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.rate_limit import Governor, RateLimitExceeded, TokenBucket
+
+
+def test_token_bucket_debt():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, burst=1, clock=lambda: now[0])
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    now[0] = 1.0
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+
+def test_fail_fast_when_deadline_passed():
+    async def scenario():
+        governor = Governor()
+        governor.configure("video_create", qps=1, burst=1)
+        async with governor.slot("video_create"):
+            pass
+        with pytest.raises(RateLimitExceeded) as exc:
+            async with governor.slot("video_create", deadline=time.monotonic()):
+                pass
+        assert exc.value.retry_after > 0
+        assert governor.snapshot()["video_create"]["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limit_adjustable_at_runtime():
+    async def scenario():
+        governor = Governor()
+        governor.configure("task_query", qps=0, concurrency=1)
+        entered = []
+
+        async def call(i):
+            async with governor.slot("task_query"):
+                entered.append(i)
+                await asyncio.sleep(10)
+
+        tasks = [asyncio.create_task(call(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert entered == [0]
+        assert governor.snapshot()["task_query"]["waiting"] == 2
+
+        governor.configure("task_query", concurrency=3)
+        await asyncio.sleep(0.01)
+        assert sorted(entered) == [0, 1, 2]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert governor.snapshot()["task_query"]["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_is_refunded_when_no_slot_is_free():
+    async def scenario():
+        governor = Governor()
+        governor.configure("task_query", qps=0.5, burst=3, concurrency=1)
+        async with governor.slot("task_query"):
+            await asyncio.sleep(0.05)
+        release = asyncio.Event()
+
+        async def holder():
+            async with governor.slot("task_query"):
+                await release.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded) as exc:
+            async with governor.slot("task_query", deadline=time.monotonic() + 0.01):
+                pass
+        # Retry-After follows the slot hold times seen so far, not a constant
+        assert 0.05 <= exc.value.retry_after < 0.5
+        # The rejected call's token was given back, so the next one need not wait for a refill
+        assert governor.families["task_query"].bucket.wait_time() == 0.0
+        release.set()
+        await task
+
+    asyncio.run(scenario())
+
+
+def test_router_maps_rate_limit_to_429():
+    mock_client = AsyncMock(spec=KlingClient)
+    mock_client.create_text2video.side_effect = RateLimitExceeded("video_create", 2.5)
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    try:
+        response = TestClient(app).post("/api/v1/videos/text2video", json={"prompt": "a cat"})
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,117 @@
+import os
+import sys
+import asyncio
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.task_cache import TaskStatusCache
+
+
+def task_response(status: str, task_id: str = "t1"):
+    return {"code": 0, "data": {"task_id": task_id, "task_status": status}}
+
+
+def test_ttl_depends_on_status():
+    now = [0.0]
+    cache = TaskStatusCache(max_entries=10, active_ttl=2, terminal_ttl=100, clock=lambda: now[0])
+    cache.put("running", task_response("processing"))
+    cache.put("done", task_response("succeed"))
+    now[0] = 5
+    assert cache.get("running") is None
+    assert cache.get("done")["data"]["task_status"] == "succeed"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction():
+    cache = TaskStatusCache(max_entries=2, active_ttl=10, terminal_ttl=10)
+    cache.put("a", task_response("succeed"))
+    cache.put("b", task_response("succeed"))
+    cache.get("a")
+    cache.put("c", task_response("succeed"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    async def scenario():
+        cache = TaskStatusCache(max_entries=10, active_ttl=10, terminal_ttl=10)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return task_response("processing")
+
+        results = await asyncio.gather(*[cache.get_or_fetch("k", fetch) for _ in range(5)])
+        assert len(calls) == 1
+        assert all(r["data"]["task_status"] == "processing" for r in results)
+        stats = cache.stats()
+        assert stats["misses"] == 1 and stats["coalesced"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = TaskStatusCache(max_entries=10, active_ttl=10, terminal_ttl=10)
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*[cache.get_or_fetch("k", failing) for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(cache) == 0
+
+    asyncio.run(scenario())
+
+
+def test_followers_retry_when_leader_is_cancelled():
+    async def scenario():
+        cache = TaskStatusCache(max_entries=10, active_ttl=10, terminal_ttl=10)
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def fast():
+            return task_response("succeed")
+
+        leader = asyncio.create_task(cache.get_or_fetch("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_fetch("k", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert (await follower)["data"]["task_status"] == "succeed"
+
+    asyncio.run(scenario())
+
+
+def test_failing_listener_does_not_hang_followers():
+    async def scenario():
+        cache = TaskStatusCache(max_entries=10, active_ttl=2, terminal_ttl=100)
+        seen = []
+
+        def broken(key, response):
+            raise RuntimeError("listener bug")
+
+        cache.listeners += [broken, lambda key, response: seen.append(key)]
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return task_response("succeed")
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*[cache.get_or_fetch("k", fetch) for _ in range(3)]), timeout=1
+        )
+        assert [r["data"]["task_status"] for r in results] == ["succeed"] * 3
+        assert seen == ["k"]
+        assert cache.get("k") is not None
+
+    asyncio.run(scenario())
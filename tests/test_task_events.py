@@ -0,0 +1,100 @@
+import os
+import sys
+import asyncio
+import json
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.task_events import TaskEventHub, get_task_event_hub
+from tests.mock_kling_response import MOCK_TASK_QUERY_SUCCESS
+
+
+def test_transitions_are_fanned_out_without_copies():
+    async def scenario():
+        hub = TaskEventHub()
+        a = hub.subscribe(["t1"])
+        b = hub.subscribe()
+        hub.publish("t1", {"task_id": "t1", "task_status": "processing"})
+        hub.publish("t1", {"task_id": "t1", "task_status": "processing"})  # not a transition
+        hub.publish("t2", {"task_id": "t2", "task_status": "processing"})
+
+        events_a = await a.next(0.1)
+        events_b = await b.next(0.1)
+        assert [e.task_id for e in events_a] == ["t1"]
+        assert [e.task_id for e in events_b] == ["t1", "t2"]
+        assert events_a[0] is events_b[0]
+        assert events_a[0].sse is events_b[0].sse
+        assert await a.next(0.01) == []
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_only_keeps_latest_state():
+    async def scenario():
+        hub = TaskEventHub(max_pending=2)
+        sub = hub.subscribe()
+        for task_id in ("t1", "t2", "t3"):
+            hub.publish(task_id, {"task_id": task_id, "task_status": "processing"})
+        hub.publish("t3", {"task_id": "t3", "task_status": "succeed"})
+        events = await sub.next(0.1)
+        assert [(e.task_id, e.status) for e in events] == [("t2", "processing"), ("t3", "succeed")]
+        assert sub.lagged == 1 and sub.coalesced == 1
+
+    asyncio.run(scenario())
+
+
+def test_sse_stream_replays_state_and_closes_when_finished():
+    hub = TaskEventHub()
+    hub.publish_response(None, MOCK_TASK_QUERY_SUCCESS)
+    app.dependency_overrides[get_task_event_hub] = lambda: hub
+    try:
+        with TestClient(app).stream("GET", "/api/v1/tasks/events?task_id=task_t2v_001") as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = response.read().decode()
+    finally:
+        app.dependency_overrides = {}
+    data_lines = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+    assert len(data_lines) == 1
+    event = json.loads(data_lines[0])
+    assert event["task_status"] == "succeed"
+    assert event["data"]["task_result"]["videos"][0]["id"] == "vid_001"
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_websocket_stream():
+    hub = TaskEventHub()
+    hub.publish("t9", {"task_id": "t9", "task_status": "failed"})
+    app.dependency_overrides[get_task_event_hub] = lambda: hub
+    try:
+        with TestClient(app).websocket_connect("/api/v1/tasks/events/ws?task_id=t9") as ws:
+            message = json.loads(ws.receive_text())
+    finally:
+        app.dependency_overrides = {}
+    assert message["task_id"] == "t9"
+    assert message["task_status"] == "failed"
+
+
+def test_waiters_are_woken_by_terminal_transition():
+    async def scenario():
+        hub = TaskEventHub()
+        waiters = [asyncio.create_task(hub.wait_for_terminal("t1", 5)) for _ in range(100)]
+        await asyncio.sleep(0)
+        assert hub.stats()["waiters"] == 100
+
+        hub.publish("t1", {"task_id": "t1", "task_status": "processing"})
+        await asyncio.sleep(0)
+        assert not any(w.done() for w in waiters)
+
+        hub.publish_callback({"task_id": "t1", "status": "succeed"})
+        events = await asyncio.gather(*waiters)
+        assert all(e is events[0] and e.data["task_status"] == "succeed" for e in events)
+        assert hub.stats()["waiters"] == 0
+
+        assert await hub.wait_for_terminal("t2", 0.01) is None
+        assert hub.stats()["waiters"] == 0
+
+    asyncio.run(scenario())
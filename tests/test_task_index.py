@@ -0,0 +1,133 @@
+import os
+import sys
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.task_index import TaskIndex, get_task_index
+
+
+def submit(index, task_id, created_at, endpoint="/videos/text2video", mode="std", status="submitted"):
+    return lambda: index.record_submission(
+        endpoint, {"task_id": task_id, "task_status": status, "created_at": created_at},
+        {"model_name": "kling-v1", "mode": mode}, "default"
+    )
+
+
+def feed(index, *updates):
+    """Calls the listeners on a running loop, then waits for the writer to store everything."""
+    async def scenario():
+        for update in updates:
+            update()
+        await index.stop()
+    asyncio.run(scenario())
+
+
+def ids(tasks):
+    return [task.task_id for task in tasks]
+
+
+def test_filters_follow_status_changes(tmp_path):
+    index = TaskIndex(str(tmp_path / "tasks.db"), max_entries=100)
+    feed(
+        index,
+        submit(index, "a", 1000, mode="pro"),
+        submit(index, "b", 2000, mode="std"),
+        submit(index, "c", 3000, mode="pro", endpoint="/images/generations"),
+        lambda: index.record_response(("videos", "text2video", "a"),
+                                      {"code": 0, "data": {"task_id": "a", "task_status": "failed"}}),
+        lambda: index.record_callback({"task_id": "c", "status": "failed"}),
+    )
+
+    assert ids(index.query({"status": "failed", "mode": "pro"})[0]) == ["c", "a"]
+    assert ids(index.query({"status": "failed", "endpoint": "/videos/text2video"})[0]) == ["a"]
+    assert ids(index.query({"family": "image_create"})[0]) == ["c"]
+    assert ids(index.query({"status": "submitted"})[0]) == ["b"]
+    assert ids(index.query(created_after=1500, created_before=3000)[0]) == ["b"]
+    # Callbacks carry no model details; the indexed ones are kept
+    assert index.get("c").model_name == "kling-v1"
+
+
+def test_cursor_pagination_and_selective_filters(tmp_path):
+    index = TaskIndex(str(tmp_path / "tasks.db"), max_entries=1000)
+    feed(index, *(submit(index, f"t{i:03d}", 1000 + i, mode="pro" if i % 10 == 0 else "std") for i in range(100)))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = index.query(limit=30, cursor=cursor)
+        seen += ids(page)
+        if cursor is None:
+            break
+    assert seen == [f"t{i:03d}" for i in range(99, -1, -1)]
+
+    first, cursor = index.query({"mode": "pro"}, limit=4)
+    second, last = index.query({"mode": "pro"}, limit=4, cursor=cursor)
+    assert ids(first) + ids(second) == ["t090", "t080", "t070", "t060", "t050", "t040", "t030", "t020"]
+    assert ids(index.query({"mode": "pro"}, created_before=1035)[0]) == ["t030", "t020", "t010", "t000"]
+
+    with pytest.raises(ValueError):
+        index.query(cursor="not-a-cursor")
+
+
+def test_oldest_tasks_are_evicted(tmp_path):
+    index = TaskIndex(str(tmp_path / "tasks.db"), max_entries=2)
+    feed(index, submit(index, "a", 1), submit(index, "b", 2), submit(index, "c", 3))
+    assert index.get("a") is None
+    assert ids(index.query({"status": "submitted"})[0]) == ["c", "b"]
+    assert index.stats()["evictions"] == 1
+
+
+def test_listeners_only_enqueue(tmp_path):
+    index = TaskIndex(str(tmp_path / "tasks.db"), max_entries=100, queue_size=2)
+
+    async def scenario():
+        for task_id in "abc":
+            index.record_callback({"task_id": task_id, "task_status": "processing"})
+        # Nothing is written on the caller's stack; the third update is shed
+        assert index.stats()["queued"] == 2 and index.get("a") is None
+        await index.stop()
+
+    asyncio.run(scenario())
+    assert ids(index.query()[0]) == ["b", "a"]
+    stats = index.stats()
+    assert (stats["dropped"], stats["batches"], stats["size"]) == (1, 1, 2)
+
+
+def test_index_survives_a_restart(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    index = TaskIndex(path, max_entries=3)
+    feed(
+        index,
+        *(submit(index, task_id, n, mode="pro" if task_id in "bd" else "std") for n, task_id in enumerate("abcd")),
+        lambda: index.record_callback({"task_id": "d", "task_status": "succeed"}),
+    )
+
+    reopened = TaskIndex(path, max_entries=3)
+    assert len(reopened) == 3
+    assert ids(reopened.query({"mode": "pro"})[0]) == ["d", "b"]
+    assert reopened.get("d").status == "succeed"
+    assert reopened.get("d").account == "default"
+    assert reopened.stats()["by_status"] == {"submitted": 2, "succeed": 1}
+    reopened.close()
+
+
+def test_list_endpoint(tmp_path):
+    index = TaskIndex(str(tmp_path / "tasks.db"), max_entries=100)
+    feed(index, submit(index, "a", 1000, mode="pro"), submit(index, "b", 2000))
+    app.dependency_overrides[get_task_index] = lambda: index
+    try:
+        client = TestClient(app)
+        response = client.get("/api/v1/tasks", params={"mode": "pro", "endpoint": "videos/text2video"})
+        assert response.status_code == 200
+        body = response.json()
+        assert [item["task_id"] for item in body["items"]] == ["a"]
+        assert body["items"][0]["account"] == "default"
+        assert body["next_cursor"] is None
+        assert client.get("/api/v1/tasks", params={"cursor": "???"}).status_code == 400
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import asyncio
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.task_list import TaskListError, iter_task_list, merge_task_lists
+
+
+class FakeLister:
+    """
+    Serves `totals[endpoint_base]` tasks, page by page, and records concurrency.
+    Pages after `hold_after` wait on `release`, which tests may never set.
+    """
+
+    def __init__(self, totals, fail_on_page=None, hold_after=None):
+        self.totals = totals
+        self.fail_on_page = fail_on_page
+        self.hold_after = hold_after
+        self.release = asyncio.Event()
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+
+    async def get_task_list(self, endpoint_base, page_num=1, page_size=30, deadline=None, account=None):
+        self.requested.append((endpoint_base, page_num))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001 * (page_num % 3))
+            if self.hold_after is not None and page_num > self.hold_after:
+                await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        if page_num == self.fail_on_page:
+            return {"code": 1303, "message": "too many requests"}
+        start = (page_num - 1) * page_size
+        end = min(start + page_size, self.totals[endpoint_base])
+        return {"code": 0, "data": [{"task_id": f"{endpoint_base}-{i}"} for i in range(start, end)]}
+
+
+def collect(iterator):
+    async def run():
+        return [item async for item in iterator]
+    return asyncio.run(run())
+
+
+def test_pages_are_prefetched_in_order_until_the_short_page():
+    lister = FakeLister({"/videos/text2video": 23})
+    tasks = collect(iter_task_list(lister, "/videos/text2video", page_size=5, prefetch=3))
+    assert [t["task_id"] for t in tasks] == [f"/videos/text2video-{i}" for i in range(23)]
+    assert lister.max_in_flight == 3
+    assert lister.in_flight == 0
+
+
+def test_exact_multiple_ends_on_empty_page():
+    lister = FakeLister({"/videos/text2video": 10})
+    tasks = collect(iter_task_list(lister, "/videos/text2video", page_size=5, prefetch=1))
+    assert len(tasks) == 10
+    assert [page for _, page in lister.requested] == [1, 2, 3]
+
+
+def test_early_exit_cancels_prefetched_pages():
+    async def scenario():
+        # Prefetched pages never finish on their own, so they are still running when the listing closes
+        lister = FakeLister({"/videos/text2video": 1000}, hold_after=1)
+        listing = iter_task_list(lister, "/videos/text2video", page_size=5, prefetch=4)
+        async for task in listing:
+            break
+        await listing.aclose()
+        assert lister.in_flight == 0
+        assert lister.cancelled == 3
+
+    asyncio.run(scenario())
+
+
+def test_merge_reports_failing_listing_and_keeps_others():
+    lister = FakeLister({"/videos/text2video": 12, "/images/generations": 7}, fail_on_page=2)
+    items = collect(merge_task_lists(lister, ["/videos/text2video", "/images/generations"], page_size=5, prefetch=2))
+    errors = [item for _, item in items if isinstance(item, Exception)]
+    tasks = [item for _, item in items if not isinstance(item, Exception)]
+    assert len(errors) == 2 and all(isinstance(e, TaskListError) for e in errors)
+    assert len(tasks) == 10  # the first page of each listing
+
+
+def test_export_endpoint_streams_ndjson():
+    mock_client = AsyncMock(spec=KlingClient)
+    lister = FakeLister({"/videos/text2video": 3, "/images/generations": 2})
+    mock_client.get_task_list.side_effect = lister.get_task_list
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    try:
+        client = TestClient(app)
+        response = client.get(
+            "/api/v1/tasks/export",
+            params=[("endpoint", "videos/text2video"), ("endpoint", "images/generations"), ("page_size", "2")]
+        )
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["task"]["task_id"] for line in lines) == sorted(
+            [f"/videos/text2video-{i}" for i in range(3)] + [f"/images/generations-{i}" for i in range(2)]
+        )
+        assert client.get("/api/v1/tasks/export", params={"endpoint": "videos/nope"}).status_code == 400
+    finally:
+        app.dependency_overrides = {}
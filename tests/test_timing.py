@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import logging
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.middleware import TimedRoute, TimingMiddleware
+from app.schemas.kling import Text2VideoRequest, TaskResponse
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.kling_client import get_kling_client
+from app.services.timing import current_timing, phase
+from tests.mock_kling_response import MOCK_TEXT2VIDEO_RESPONSE
+from tests.helpers import make_client
+
+
+def server_timing(response) -> dict:
+    phases = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, _, duration = entry.partition(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+
+def test_create_call_reports_its_phases():
+    client = make_client(lambda request: httpx.Response(200, json=MOCK_TEXT2VIDEO_RESPONSE))
+    app.dependency_overrides[get_kling_client] = lambda: client
+    app.dependency_overrides[get_idempotency_cache] = lambda: IdempotencyCache(enabled=False)
+    try:
+        response = TestClient(app).post("/api/v1/videos/text2video", json={"prompt": "a cat", "model_name": "kling-v1"})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    phases = server_timing(response)
+    for name in ("read", "validate", "endpoint", "media", "queue", "auth", "upstream", "decode", "serialize", "total"):
+        assert name in phases, name
+    assert phases["upstream"] <= phases["endpoint"] <= phases["total"]
+    assert list(phases)[-1] == "total"
+    # Nothing leaks into code running outside a request
+    assert current_timing() is None
+
+
+def test_slow_requests_are_logged_as_records(caplog):
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.post("/echo", response_model=TaskResponse)
+    async def echo(request: Text2VideoRequest, limit: int = 3):
+        with phase("upstream"):
+            pass
+        return TaskResponse(task_id=request.prompt, raw_data={"limit": limit})
+
+    mini = FastAPI()
+    mini.include_router(router)
+    mini.add_middleware(TimingMiddleware, slow_ms=1e-6)
+
+    with caplog.at_level(logging.WARNING, logger="app.middleware"):
+        response = TestClient(mini).post("/echo?limit=5", json={"prompt": "p"})
+
+    assert response.json()["raw_data"] == {"limit": 5}  # dependencies still resolved through the wrapper
+    record = caplog.records[-1].timing
+    assert record["route"] == "/echo" and record["status"] == 200
+    assert set(record["phases_ms"]) >= {"read", "validate", "endpoint", "upstream", "serialize"}
+    assert json.loads(caplog.records[-1].getMessage().split(": ", 1)[1]) == record
+    # The wrapped endpoint keeps its documented parameters
+    operation = mini.openapi()["paths"]["/echo"]["post"]
+    assert operation["parameters"][0]["name"] == "limit" and "requestBody" in operation
@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+import jwt
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.token_cache import TokenCache
+from app.services.kling_client import KlingClient
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_reused_until_safety_margin():
+    clock = FakeClock()
+    cache = TokenCache("ak", "sk", ttl=1800, safety_margin=60, refresh_ahead=60, clock=clock)
+
+    first = cache.get()
+    clock.now += 1000
+    assert cache.get() == first
+    assert cache.hits == 1 and cache.misses == 1
+
+    # Inside the safety margin the cached token is no longer handed out
+    clock.now += 1800 - 1000 - 30
+    second = cache.get()
+    assert second != first
+    assert cache.misses == 2
+
+    claims = jwt.decode(second, "sk", algorithms=["HS256"], options={"verify_exp": False, "verify_nbf": False})
+    assert claims["iss"] == "ak"
+    assert claims["exp"] == int(clock.now) + 1800
+
+
+def test_token_refreshed_in_background():
+    async def scenario():
+        clock = FakeClock()
+        cache = TokenCache("ak", "sk", ttl=1800, safety_margin=60, refresh_ahead=300, clock=clock)
+        first = cache.get()
+
+        clock.now += 1600  # inside refresh_ahead, outside safety_margin
+        assert cache.get() == first
+        await cache._refresh_task
+        await asyncio.sleep(0)
+
+        refreshed = cache.get()
+        assert refreshed != first
+        assert cache.refreshes == 1
+        assert cache.misses == 1
+
+    asyncio.run(scenario())
+
+
+def test_client_uses_cache(monkeypatch):
+    monkeypatch.delenv("KLING_AI_API_TOKEN", raising=False)
+    client = KlingClient(access_key="ak", secret_key="sk")
+    token = client._get_token()
+    assert client._get_token() == token
+    assert client.token_stats()["hits"] == 1
+    assert client.token_stats()["misses"] == 1
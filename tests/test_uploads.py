@@ -0,0 +1,122 @@
+import os
+import sys
+import io
+import json
+import base64
+import asyncio
+import httpx
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from main import app
+from app.services.idempotency import IdempotencyCache, get_idempotency_cache
+from app.services.kling_client import KlingClient, get_kling_client
+from app.services.uploads import StreamingJSONBody, iter_base64
+from tests.mock_kling_response import MOCK_IMAGE2VIDEO_RESPONSE
+from tests.helpers import fast_retries, make_client
+
+
+class AsyncBytes:
+    """Minimal async file over bytes, like Starlette's UploadFile."""
+
+    def __init__(self, data: bytes):
+        self._file = io.BytesIO(data)
+        self.size = len(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    async def seek(self, offset: int):
+        self._file.seek(offset)
+
+
+async def consume(body) -> bytes:
+    return b"".join([chunk async for chunk in body])
+
+
+def test_base64_chunks_match_one_shot_encoding():
+    async def scenario():
+        for size in range(0, 25):
+            data = os.urandom(size)
+            encoded = b"".join([c async for c in iter_base64(AsyncBytes(data), chunk_size=6)])
+            assert encoded == base64.b64encode(data)
+
+    asyncio.run(scenario())
+
+
+def test_streaming_body_is_reiterable_with_exact_length():
+    async def scenario():
+        image, tail = os.urandom(1000), os.urandom(7)
+        payload = {"prompt": "ünïcode", "image": "@upload:a", "image_tail": "@upload:b"}
+        body = StreamingJSONBody(payload, {"@upload:a": (AsyncBytes(image), 1000), "@upload:b": (AsyncBytes(tail), 7)})
+        first, second = await consume(body), await consume(body)
+        assert first == second
+        assert len(first) == body.content_length
+        document = json.loads(first)
+        assert base64.b64decode(document["image"]) == image
+        assert base64.b64decode(document["image_tail"]) == tail
+        assert document["prompt"] == "ünïcode"
+
+    asyncio.run(scenario())
+
+
+def test_client_streams_body_with_content_length_and_retries():
+    image = os.urandom(5000)
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.headers.get("content-length"), request.headers.get("transfer-encoding"),
+                     request.read()))
+        if len(seen) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json=MOCK_IMAGE2VIDEO_RESPONSE)
+
+    client = make_client(handler, retry_policy=fast_retries())
+    payload = {"image": "@upload:x", "external_task_id": "ext-1"}
+    body = StreamingJSONBody(payload, {"@upload:x": (AsyncBytes(image), len(image))})
+    result = asyncio.run(client.create_image2video(body))
+
+    assert result["code"] == 0
+    assert len(seen) == 2 and seen[0] == seen[1]
+    content_length, transfer_encoding, sent = seen[1]
+    assert int(content_length) == len(sent) and transfer_encoding is None
+    assert base64.b64decode(json.loads(sent)["image"]) == image
+
+
+def test_upload_route_streams_files_into_the_request():
+    mock_client = AsyncMock(spec=KlingClient)
+    received = {}
+
+    async def create(body, deadline=None):
+        received["body"] = json.loads(await consume(body))
+        return MOCK_IMAGE2VIDEO_RESPONSE
+
+    mock_client.create_multi_image2video.side_effect = create
+    app.dependency_overrides[get_kling_client] = lambda: mock_client
+    app.dependency_overrides[get_idempotency_cache] = lambda: IdempotencyCache()
+    images = [os.urandom(3000), os.urandom(10)]
+    try:
+        client = TestClient(app)
+        response = client.post(
+            "/api/v1/videos/multi-image2video:upload",
+            data={"request": json.dumps({"prompt": "two shots"})},
+            files=[("image_list", ("a.png", images[0])), ("image_list", ("b.png", images[1]))],
+        )
+        assert response.status_code == 200
+        assert response.json()["task_id"] == MOCK_IMAGE2VIDEO_RESPONSE["data"]["task_id"]
+        sent = received["body"]
+        assert [base64.b64decode(image) for image in sent["image_list"]] == images
+        assert sent["prompt"] == "two shots" and sent["external_task_id"].startswith("idem-")
+
+        rejected = client.post(
+            "/api/v1/videos/multi-image2video:upload",
+            data={"request": json.dumps({"prompt": "x"})},
+            files=[("prompt", ("a.txt", b"not media"))],
+        )
+        assert rejected.status_code == 422
+    finally:
+        app.dependency_overrides = {}